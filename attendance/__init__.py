@@ -8,6 +8,9 @@ from .routes import terminal, api
 from .routes import register_blueprints
 from .services import database, shift_manager
 from .services.face_recognition import face_service
+from .services.inference_scheduler import inference_scheduler
+from .services.presence import presence_service
+from .services.dashboard_events import dashboard_events
 
 def create_attendance_app(app):
     """Initialize attendance module with Flask app"""
@@ -15,6 +18,9 @@ def create_attendance_app(app):
     # Initialize services
     database.init_app(app)
     face_service.init_app(app)
+    inference_scheduler.init_app(app)
+    presence_service.init_app(app)
+    dashboard_events.init_app(app)
     shift_manager.init_app(app)
     
     # Register blueprints
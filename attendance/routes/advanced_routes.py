@@ -3,7 +3,7 @@ Advanced Enrollment and CCTV Management Routes
 Handles API endpoints for multi-angle enrollment and zone-based attendance
 """
 
-from flask import Blueprint, request, jsonify, render_template, session
+from flask import Blueprint, request, jsonify, render_template, session, Response, current_app
 from typing import Dict, Any, List
 import logging
 import time
@@ -13,6 +13,10 @@ from datetime import datetime
 from ..services.advanced_enrollment import AdvancedEnrollmentService
 from ..services.zone_attendance import ZoneAttendanceService
 from ..services.cctv_integration import CCTVIntegrationService
+from ..services.mjpeg_stream import MJPEGBroadcaster
+from ..services.pipeline_metrics import pipeline_metrics
+from ..services.inference_scheduler import inference_scheduler
+from ..services.dashboard_events import dashboard_events
 from ..services.database import DatabaseService
 from ..models.employee import Employee
 from ..models.attendance import AttendanceRecord
@@ -36,6 +40,7 @@ def init_advanced_services(database_service: DatabaseService):
     enrollment_service = AdvancedEnrollmentService()
     zone_service = ZoneAttendanceService(db_service, enrollment_service)
     cctv_service = CCTVIntegrationService(db_service, enrollment_service, zone_service)
+    cctv_service.add_detection_callback(dashboard_events.publish_recognition)
     
     logger.info("Advanced services initialized")
 
@@ -169,6 +174,34 @@ def configure_zones():
         logger.error(f"Error configuring zones: {e}")
         return jsonify({'error': 'Failed to configure zones'}), 500
 
+@advanced_bp.route('/zones/<zone_id>/coordinates', methods=['POST'])
+def set_zone_coordinates(zone_id):
+    """Limit a zone to a polygon of its cameras' view; detection ignores pixels outside it"""
+    try:
+        data = request.get_json()
+        polygon = data.get('polygon', [])
+        
+        if polygon and len(polygon) < 3:
+            return jsonify({'error': 'Polygon needs at least 3 points'}), 400
+        
+        if not zone_service.get_zone_by_id(zone_id):
+            return jsonify({'error': 'Zone not found'}), 404
+        
+        if polygon:
+            zone_service.set_zone_coordinates(zone_id, [tuple(int(v) for v in point) for point in polygon])
+        else:
+            zone_service.get_zone_by_id(zone_id).coordinates = None
+        
+        return jsonify({
+            'success': True,
+            'zone_id': zone_id,
+            'points': len(polygon)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error setting zone coordinates: {e}")
+        return jsonify({'error': 'Failed to set zone coordinates'}), 500
+
 @advanced_bp.route('/cameras/status')
 def get_camera_status():
     """Get status of all cameras"""
@@ -190,6 +223,7 @@ def get_camera_status():
 def start_camera_monitoring():
     """Start CCTV monitoring system"""
     try:
+        cctv_service.decode_in_subprocess = current_app.config.get('CAMERA_DECODE_PROCESS', False)
         cctv_service.start_camera_monitoring()
         return jsonify({
             'success': True,
@@ -217,17 +251,16 @@ def stop_camera_monitoring():
 def camera_stream(camera_id):
     """Get live stream from specific camera"""
     try:
-        # Get frame from camera
-        frame = cctv_service.get_live_frame(camera_id)
-        
-        if frame is None:
-            return jsonify({'error': 'Camera not available'}), 404
-        
         # Convert frame to base64 for web display
         import cv2
         import base64
         
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        # Encode the newest frame in place, without copying it out of the buffer
+        with cctv_service.latest_frame(camera_id) as frame_ref:
+            if frame_ref is None:
+                return jsonify({'error': 'Camera not available'}), 404
+            
+            _, buffer = cv2.imencode('.jpg', frame_ref.frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
         frame_base64 = base64.b64encode(buffer).decode('utf-8')
         
         return jsonify({
@@ -240,6 +273,42 @@ def camera_stream(camera_id):
         logger.error(f"Error getting camera stream: {e}")
         return jsonify({'error': 'Failed to get camera stream'}), 500
 
+@advanced_bp.route('/cameras/mjpeg/<camera_id>')
+def camera_mjpeg_stream(camera_id):
+    """Continuous multipart MJPEG stream from a camera, for use as an <img> source"""
+    broadcaster = cctv_service.get_mjpeg_stream(
+        camera_id,
+        quality=current_app.config.get('MJPEG_QUALITY', 80),
+        max_fps=current_app.config.get('MJPEG_MAX_FPS', 10)
+    )
+    if broadcaster is None:
+        return jsonify({'error': 'Camera not available'}), 404
+    
+    return Response(
+        broadcaster.stream(),
+        mimetype=f'multipart/x-mixed-replace; boundary={MJPEGBroadcaster.BOUNDARY}',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+@advanced_bp.route('/metrics/pipeline')
+def get_pipeline_metrics():
+    """Per-stage latency percentiles, counters and queue depths of all camera pipelines"""
+    try:
+        return jsonify({
+            'pipelines': pipeline_metrics.snapshot(),
+            'inference': inference_scheduler.get_stats(),
+            'timestamp': time.time()
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting pipeline metrics: {e}")
+        return jsonify({'error': 'Failed to get pipeline metrics'}), 500
+
+@advanced_bp.route('/metrics/pipeline/prometheus')
+def get_pipeline_metrics_prometheus():
+    """Camera pipeline metrics in Prometheus text format"""
+    return Response(pipeline_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @advanced_bp.route('/settings/threshold', methods=['POST'])
 def update_detection_threshold():
     """Update face detection threshold"""
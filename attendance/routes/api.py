@@ -4,7 +4,7 @@ API routes for Time Attendance System
 Handles REST API endpoints for RIS integration and external systems
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, date, timedelta
 import hmac
 import hashlib
@@ -12,6 +12,7 @@ import time
 
 from ..services.database import db
 from ..services.face_recognition import face_service
+from ..services.face_gallery import gallery_service
 from ..services.shift_manager import shift_manager
 from ..models import Employee, AttendanceRecord
 
@@ -382,22 +383,11 @@ def recognize_face():
         if not image_data:
             return jsonify({'error': 'image_data required'}), 400
         
-        # Get all employee encodings
-        employees = db.find('employees', {
-            'employment_status': 'active',
-            'face_recognition_enabled': True
-        })
-        
-        known_encodings = {}
-        for employee in employees:
-            if employee.face_encodings:
-                known_encodings[employee.employee_id] = employee.face_encodings
-        
-        # Recognize face
-        employee_id, confidence = face_service.recognize_face(image_data, known_encodings)
+        # Recognize face against the gallery of active enrolled employees
+        employee_id, confidence = face_service.recognize_face(image_data)
         
         if employee_id:
-            employee = db.get_employee_by_employee_id(employee_id)
+            employee = gallery_service.get_employee(employee_id) or db.get_employee_by_employee_id(employee_id)
             return jsonify({
                 'success': True,
                 'recognized': True,
@@ -415,6 +405,45 @@ def recognize_face():
         print(f"API face recognition error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@bp.route('/face_recognition/recognize_batch', methods=['POST'])
+def recognize_face_batch():
+    """Recognize every face in a batch of images"""
+    try:
+        if not verify_api_key():
+            return jsonify({'error': 'Unauthorized'}), 401
+        
+        data = request.get_json() or {}
+        images = data.get('images', [])
+        
+        if not images or not isinstance(images, list):
+            return jsonify({'error': 'images list required'}), 400
+        
+        max_images = current_app.config.get('FACE_BATCH_MAX_IMAGES', 32)
+        if len(images) > max_images:
+            return jsonify({'error': f'At most {max_images} images per batch'}), 400
+        
+        results = face_service.recognize_faces_batch(images)
+        
+        # Attach public employee details for recognized faces
+        for result in results:
+            for face in result['faces']:
+                face['face_location'] = list(face['face_location'])
+                if face.get('employee_id'):
+                    employee = (gallery_service.get_employee(face['employee_id'])
+                                or db.get_employee_by_employee_id(face['employee_id']))
+                    face['employee'] = employee.to_public_dict() if employee else None
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'faces': sum(len(result['faces']) for result in results),
+            'recognized': sum(1 for result in results for face in result['faces'] if face.get('recognized'))
+        })
+        
+    except Exception as e:
+        print(f"API batch face recognition error: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 @bp.route('/reports/summary')
 def get_reports_summary():
     """Get summary reports"""
@@ -91,6 +91,17 @@ def add_camera():
         
         logger.info(f"All required fields present: camera_id='{data['camera_id']}', name='{data['name']}', stream_url='{data['stream_url']}', zone_id='{data['zone_id']}'")
         
+        # Detection runs on the frame resized by detection_scale
+        try:
+            detection_scale = float(data.get('detection_scale', 1.0))
+        except (TypeError, ValueError):
+            detection_scale = None
+        if detection_scale is None or not 0 < detection_scale <= 1:
+            return jsonify({
+                'success': False,
+                'error': 'detection_scale must be a number greater than 0 and at most 1'
+            }), 400
+        
         # Check if camera ID already exists
         existing_cameras = live_camera_service.get_camera_status()
         if data['camera_id'] in existing_cameras:
@@ -108,7 +119,9 @@ def add_camera():
             enabled=data.get('enabled', True),
             recognition_interval=data.get('recognition_interval', 2.0),
             confidence_threshold=data.get('confidence_threshold', 0.7),
-            frame_skip=data.get('frame_skip', 5)
+            frame_skip=data.get('frame_skip', 5),
+            motion_gating=data.get('motion_gating', True),
+            detection_scale=detection_scale
         )
         
         logger.info(f"Created camera config: {camera_config}")
@@ -464,7 +477,7 @@ def get_camera_stream_info():
             'capabilities': {
                 'face_detection': True,
                 'face_recognition': True,
-                'motion_detection': False,
+                'motion_detection': True,
                 'night_vision': False
             }
         }
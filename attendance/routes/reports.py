@@ -4,6 +4,7 @@ Reports: attendance, department, overtime, summary, CSV export
 from flask import Blueprint, request, jsonify, render_template, redirect, url_for
 from datetime import datetime, date, timedelta
 from ..services.database import db
+from ..services.payroll import payroll_service, SUMMARY_FIELDS
 from ..utils.auth import is_admin_authenticated
 
 bp_reports = Blueprint('reports', __name__)
@@ -43,8 +44,12 @@ def attendance_records():
         employees = [{'employee_id': emp.employee_id, 'name': emp.full_name} for emp in all_employees]
         employees.sort(key=lambda x: x['name'])
         
-        # Get all attendance records
-        all_attendance_records = db.get_all('attendance_records')
+        # Get attendance records, only reading the requested date range when bounded
+        if date_from or date_to:
+            all_attendance_records = db.get_attendance_records_by_date_range(
+                date_from or '', date_to or '9999-12-31')
+        else:
+            all_attendance_records = db.get_all('attendance_records')
         
         # Apply filters
         filtered_records = []
@@ -207,8 +212,12 @@ def api_attendance_records():
         # Get all active employees for filtering
         all_employees = db.find('employees', {'employment_status': 'active'})
         
-        # Get all attendance records
-        all_attendance_records = db.get_all('attendance_records')
+        # Get attendance records, only reading the requested date range when bounded
+        if date_from or date_to:
+            all_attendance_records = db.get_attendance_records_by_date_range(
+                date_from or '', date_to or '9999-12-31')
+        else:
+            all_attendance_records = db.get_all('attendance_records')
         
         # Apply filters
         filtered_records = []
@@ -456,8 +465,12 @@ def api_export_attendance():
         # Get all active employees for filtering
         all_employees = db.get_all('employees')
         
-        # Get all attendance records
-        all_attendance_records = db.get_all('attendance_records')
+        # Get attendance records, only reading the requested date range when bounded
+        if date_from or date_to:
+            all_attendance_records = db.get_attendance_records_by_date_range(
+                date_from or '', date_to or '9999-12-31')
+        else:
+            all_attendance_records = db.get_all('attendance_records')
         
         # Apply filters
         filtered_records = []
@@ -527,3 +540,59 @@ def api_export_attendance():
         import traceback
         traceback.print_exc()
         return jsonify({'error': 'Failed to export attendance records'}), 500
+
+@bp_reports.route('/api/payroll_summary')
+def api_payroll_summary():
+    """Per employee hours, overtime and lateness for a pay period, as JSON or CSV"""
+    if not is_admin_authenticated():
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    try:
+        today = date.today()
+        date_from = date.fromisoformat(request.args.get('date_from') or today.replace(day=1).isoformat())
+        date_to = date.fromisoformat(request.args.get('date_to') or today.isoformat())
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    try:
+        # Records may carry the employee_id or the employee record id
+        employee_ids = None
+        employee_id = request.args.get('employee_id', '')
+        if employee_id:
+            employee_ids = [employee_id]
+            employee = db.get_employee_by_employee_id(employee_id)
+            if employee:
+                employee_ids.append(employee.id)
+        
+        summaries = payroll_service.summarize_period(date_from, date_to, employee_ids)
+        
+        if request.args.get('format') == 'csv':
+            import csv
+            import io
+            
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(SUMMARY_FIELDS)
+            for summary in summaries:
+                writer.writerow([summary[field] for field in SUMMARY_FIELDS])
+            csv_data = output.getvalue()
+            output.close()
+            
+            return jsonify({
+                'success': True,
+                'csv_data': csv_data,
+                'filename': f'payroll_{date_from.isoformat()}_{date_to.isoformat()}.csv'
+            })
+        
+        return jsonify({
+            'success': True,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'employees': summaries
+        })
+        
+    except Exception as e:
+        print(f"[ERROR] Failed to build payroll summary: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': 'Failed to build payroll summary'}), 500
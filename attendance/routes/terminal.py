@@ -9,8 +9,11 @@ import hashlib
 
 from ..services.database import db
 from ..services.face_recognition import face_service
+from ..services.face_gallery import gallery_service
 from ..services.shift_manager import shift_manager
-from ..models import Employee, AttendanceRecord, Terminal
+from ..services.dashboard_events import dashboard_events
+from ..services.clock_service import clock_service, audit_entry
+from ..models import Employee, Terminal
 
 bp = Blueprint('terminal', __name__)
 
@@ -175,43 +178,12 @@ def clock_in():
                 'existing_record': existing_record.to_dict()
             }, 400)
         
-        # Get employee's shift for today
-        shift = shift_manager.get_employee_shift_for_date(employee_id, today)
-        
-        # Create attendance record
-        attendance_data = {
-            'employee_id': employee_id,
-            'employee_name': employee.full_name,
-            'date': today.isoformat(),
-            'shift_id': shift.id if shift else '',
-            'scheduled_start': shift.start_time if shift else '',
-            'scheduled_end': shift.end_time if shift else '',
-            'is_weekend': today.weekday() >= 5,
-            'is_holiday': shift_manager.is_holiday(today)
-        }
-        
-        attendance = AttendanceRecord(**attendance_data)
-        attendance.clock_in(terminal_id, auth_method, request.remote_addr)
-        
-        # Calculate late status if shift exists
-        if shift:
-            late_status = shift_manager.calculate_late_early_status(attendance, shift)
-            attendance.is_late = late_status['is_late']
-        
-        # Save attendance record
-        attendance = db.create('attendance_records', attendance)
-        
-        # Update employee statistics
-        employee.last_clock_in = attendance.clock_in_time
-        db.update('employees', employee.id, {'last_clock_in': employee.last_clock_in})
-        
-        # Log audit event
-        log_audit_event('clock_in', {
-            'attendance_id': attendance.id,
-            'terminal_id': terminal_id,
-            'method': auth_method,
-            'is_late': attendance.is_late
-        }, employee_id, terminal_id)
+        # Create the attendance record, update the employee and log the audit
+        # event in one batch
+        attendance, shift = clock_service.clock_in(
+            employee, terminal_id, auth_method, request.remote_addr,
+            user_agent=request.headers.get('User-Agent', '')
+        )
         
         return jsonify({
             'success': True,
@@ -276,53 +248,18 @@ def clock_out():
                 'message': 'No active clock-in record found'
             }), 400
         
-        # Get shift for calculations
-        shift = None
-        if attendance.shift_id:
-            shift = db.get_by_id('shifts', attendance.shift_id)
-        
-        # Clock out
-        attendance.clock_out(terminal_id, auth_method, request.remote_addr)
-        
-        # Calculate work hours
-        hours_data = shift_manager.calculate_work_hours(attendance, shift)
-        attendance.regular_hours = hours_data['regular_hours']
-        attendance.overtime_hours = hours_data['overtime_hours']
-        attendance.total_hours = hours_data['total_hours']
-        
-        # Calculate early departure status
-        if shift:
-            early_status = shift_manager.calculate_late_early_status(attendance, shift)
-            attendance.is_early_departure = early_status['is_early_departure']
-        
-        # Update attendance record
-        db.update('attendance_records', attendance.id, attendance.to_dict())
-        
-        # Update employee statistics
-        employee = db.find('employees', {'employee_id': employee_id})[0]
-        employee.last_clock_out = attendance.clock_out_time
-        employee.update_statistics(attendance.total_hours, attendance.overtime_hours)
-        db.update('employees', employee.id, {
-            'last_clock_out': employee.last_clock_out,
-            'total_hours_worked': employee.total_hours_worked,
-            'total_overtime_hours': employee.total_overtime_hours
-        })
+        # Close the record with its hours, update the employee statistics and
+        # log the audit event in one batch
+        attendance = clock_service.clock_out(
+            attendance, terminal_id, auth_method, request.remote_addr,
+            user_agent=request.headers.get('User-Agent', '')
+        )
         
         # Remove from terminal's current users
         terminal = get_or_create_terminal(terminal_id)
         terminal.remove_user(employee_id)
         db.update('terminals', terminal.id, terminal.to_dict())
         
-        # Log audit event
-        log_audit_event('clock_out', {
-            'attendance_id': attendance.id,
-            'terminal_id': terminal_id,
-            'method': auth_method,
-            'total_hours': attendance.total_hours,
-            'overtime_hours': attendance.overtime_hours,
-            'is_early_departure': attendance.is_early_departure
-        }, employee_id, terminal_id)
-        
         return jsonify({
             'success': True,
             'message': f'Successfully clocked out at {datetime.now().strftime("%H:%M")}',
@@ -475,35 +412,9 @@ def handle_clock_in(employee_id, terminal_id, auth_method):
             'status': 'clocked_in'
         }, 400)
     
-    # Get employee's shift for today
-    shift = shift_manager.get_employee_shift_for_date(employee_id, today)
-    
-    # Create attendance record
-    attendance_data = {
-        'employee_id': employee_id,
-        'employee_name': employee.full_name,
-        'date': today.isoformat(),
-        'shift_id': shift.id if shift else '',
-        'scheduled_start': shift.start_time if shift else '',
-        'scheduled_end': shift.end_time if shift else '',
-        'is_weekend': today.weekday() >= 5,
-        'is_holiday': shift_manager.is_holiday(today)
-    }
-    
-    attendance = AttendanceRecord(**attendance_data)
-    attendance.clock_in(terminal_id, auth_method, request.remote_addr)
-    
-    # Calculate late status if shift exists
-    if shift:
-        late_status = shift_manager.calculate_late_early_status(attendance, shift)
-        attendance.is_late = late_status['is_late']
-    
-    # Save attendance record
-    attendance = db.create('attendance_records', attendance)
-    
-    # Update employee statistics
-    employee.last_clock_in = attendance.clock_in_time
-    db.update('employees', employee.id, {'last_clock_in': employee.last_clock_in})
+    # Create the attendance record and update the employee in one batch
+    attendance, shift = clock_service.clock_in(employee, terminal_id, auth_method, request.remote_addr,
+                                                audit=False)
     
     return jsonify({
         'success': True,
@@ -524,32 +435,10 @@ def handle_clock_out(employee_id, terminal_id, auth_method):
             'status': 'clocked_out'
         }, 400)
     
-    # Get shift for calculations
-    shift = None
-    if attendance.shift_id:
-        shift = db.get_by_id('shifts', attendance.shift_id)
-    
-    # Clock out
-    attendance.clock_out(terminal_id, auth_method, request.remote_addr)
-    
-    # Calculate work hours
-    hours_data = shift_manager.calculate_work_hours(attendance, shift)
-    attendance.regular_hours = hours_data['regular_hours']
-    attendance.overtime_hours = hours_data['overtime_hours']
-    attendance.total_hours = hours_data['total_hours']
-    
-    # Update attendance record
-    db.update('attendance_records', attendance.id, attendance.to_dict())
-    
-    # Update employee statistics
-    employee = db.find('employees', {'employee_id': employee_id})[0]
-    employee.last_clock_out = attendance.clock_out_time
-    employee.update_statistics(attendance.total_hours, attendance.overtime_hours)
-    db.update('employees', employee.id, {
-        'last_clock_out': employee.last_clock_out,
-        'total_hours_worked': employee.total_hours_worked,
-        'total_overtime_hours': employee.total_overtime_hours
-    })
+    # Close the record with its hours and update the employee in one batch;
+    # this path has never flagged early departures
+    attendance = clock_service.clock_out(attendance, terminal_id, auth_method, request.remote_addr,
+                                         audit=False, flag_early_departure=False)
     
     return jsonify({
         'success': True,
@@ -665,6 +554,7 @@ def get_or_create_terminal(terminal_id: str) -> Terminal:
         if terminals:
             terminal = terminals[0]
             terminal.heartbeat()
+            dashboard_events.publish_terminal(terminal)
             return terminal
         
         # Create new terminal
@@ -691,26 +581,11 @@ def authenticate_by_face(image_data: str) -> tuple:
         return None, 0.0
     
     try:
-        # Get all active employees with face encodings
-        employees = db.find('employees', {
-            'employment_status': 'active',
-            'face_recognition_enabled': True
-        })
-        
-        # Build known encodings dictionary
-        known_encodings = {}
-        for employee in employees:
-            if employee.face_encodings:
-                known_encodings[employee.employee_id] = employee.face_encodings
-        
-        if not known_encodings:
-            return None, 0.0
-        
-        # Recognize face
-        employee_id, confidence = face_service.recognize_face(image_data, known_encodings)
+        # Recognize face against the gallery of active enrolled employees
+        employee_id, confidence = face_service.recognize_face(image_data)
         
         if employee_id:
-            employee = db.get_employee_by_employee_id(employee_id)
+            employee = gallery_service.get_employee(employee_id) or db.get_employee_by_employee_id(employee_id)
             return employee, confidence
         
         return None, confidence
@@ -751,22 +626,8 @@ def authenticate_by_employee_id(employee_id: str) -> Optional[Employee]:
 def log_audit_event(event_type: str, event_data: dict, user_id: str = '', terminal_id: str = ''):
     """Log audit event"""
     try:
-        from ..models.admin import AuditLog
-        
-        audit_data = {
-            'event_type': event_type,
-            'event_description': f'{event_type} event',
-            'event_category': 'attendance',
-            'user_id': user_id,
-            'terminal_id': terminal_id,
-            'ip_address': request.remote_addr,
-            'user_agent': request.headers.get('User-Agent', ''),
-            'event_data': event_data,
-            'severity': 'info',
-            'success': True
-        }
-        
-        audit_log = AuditLog(**audit_data)
+        audit_log = audit_entry(event_type, event_data, user_id, terminal_id,
+                                request.remote_addr, request.headers.get('User-Agent', ''))
         db.create('audit_logs', audit_log)
         
     except Exception as e:
@@ -15,6 +15,10 @@ import json
 import logging
 from collections import defaultdict
 
+from .face_gallery import gallery_service
+from .face_index import FaceIndex, create_face_index
+from .face_tracker import location_iou
+
 @dataclass
 class EnrollmentCapture:
     timestamp: float
@@ -40,6 +44,125 @@ class EmployeeEmbeddingProfile:
     enrollment_complete: bool = False
     last_updated: float = 0
 
+class ProfileEmbeddingMatrix:
+    """Embeddings of all enrolled profiles stacked into one matrix
+    
+    Every row is tagged with its employee and the embedding set it came from
+    ('primary', or an angle/lighting/distance variation key). Rows are grouped
+    by set and then by employee, so the best match per employee within a set
+    is a single min-reduction over a contiguous slice.
+    
+    Large matrices can carry a nearest-neighbour index over the rows (see
+    build_index); matching then only scores the employees it shortlists.
+    """
+    
+    # Weight of each embedding set in the overall confidence
+    SET_WEIGHTS = (('primary', 0.5), ('angle', 0.2), ('lighting', 0.2), ('distance', 0.1))
+    
+    def __init__(self, profiles: Dict[str, EmployeeEmbeddingProfile], dim: int = 128):
+        rows_by_set = defaultdict(list)
+        self.employee_ids = []
+        self.employee_names = []
+        self.employee_rows = []  # Per employee: set -> (first row, end row)
+        self.index: Optional[FaceIndex] = None
+        
+        for employee_id, profile in profiles.items():
+            if not profile.enrollment_complete:
+                continue
+            position = len(self.employee_ids)
+            self.employee_ids.append(employee_id)
+            self.employee_names.append(profile.name)
+            self.employee_rows.append({})
+            
+            if len(profile.primary_embeddings):
+                rows_by_set[('primary', '')].append((position, profile.primary_embeddings))
+            for set_key, embeddings in profile.variation_embeddings.items():
+                kind, _, value = set_key.partition('_')
+                if kind in ('angle', 'lighting', 'distance') and len(embeddings):
+                    rows_by_set[(kind, value)].append((position, embeddings))
+        
+        # set -> (first row, end row, per-employee offsets within the slice, employee positions)
+        self.sets = {}
+        blocks = []
+        row = 0
+        for set_tag, members in rows_by_set.items():
+            offsets = []
+            owners = []
+            start = row
+            for position, embeddings in members:
+                block = np.asarray(embeddings, dtype=np.float32).reshape(-1, dim)
+                offsets.append(row - start)
+                owners.append(position)
+                blocks.append(block)
+                self.employee_rows[position][set_tag] = (row, row + len(block))
+                row += len(block)
+            self.sets[set_tag] = (start, row, np.asarray(offsets), np.asarray(owners))
+        
+        self.matrix = np.concatenate(blocks) if blocks else np.empty((0, dim), dtype=np.float32)
+        self.row_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+    
+    def distances(self, encodings) -> np.ndarray:
+        """Euclidean distance from every encoding (F, dim) to every row, shape (F, rows)"""
+        probes = np.asarray(encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        squared = (np.einsum('ij,ij->i', probes, probes)[:, None] + self.row_norms[None, :]
+                   - 2.0 * probes @ self.matrix.T)
+        return np.sqrt(np.maximum(squared, 0.0))
+    
+    def confidences(self, distances: np.ndarray, characteristics: Dict) -> np.ndarray:
+        """Weighted confidence of one face for every employee
+        
+        Uses the primary set plus the variation sets matching the face's
+        detected angle, lighting and distance; a set the employee lacks adds 0.
+        """
+        overall = np.zeros(len(self.employee_ids))
+        for kind, weight in self.SET_WEIGHTS:
+            entry = self.sets.get((kind, characteristics.get(kind, '') if kind != 'primary' else ''))
+            if entry is None:
+                continue
+            start, end, offsets, owners = entry
+            best = np.minimum.reduceat(distances[start:end], offsets)
+            overall[owners] += weight * (1 - best)
+        return overall
+    
+    def build_index(self, index_type: str, **options):
+        """Index every row under its employee's position"""
+        owners = np.zeros(len(self.matrix), dtype=np.int64)
+        for position, spans in enumerate(self.employee_rows):
+            for start, end in spans.values():
+                owners[start:end] = position
+        index = create_face_index(index_type, self.matrix.shape[1], **options)
+        index.build(self.matrix, owners.tolist())
+        self.index = index
+    
+    def candidates(self, encoding, radius: float, k: int = 64) -> Optional[List[int]]:
+        """Positions of the employees with an embedding within radius of encoding
+        
+        None without an index, or when all k nearest embeddings are within
+        radius and the shortlist may be incomplete.
+        """
+        if self.index is None:
+            return None
+        nearest = self.index.search(encoding, k=k)
+        if len(nearest) == k and nearest[-1][1] < radius:
+            return None
+        return sorted({position for position, distance in nearest if distance < radius})
+    
+    def candidate_confidences(self, encoding, characteristics: Dict, positions: List[int]) -> np.ndarray:
+        """confidences() of one face for the given employee positions only"""
+        probe = np.asarray(encoding, dtype=np.float32).reshape(-1)
+        probe_norm = float(probe @ probe)
+        overall = np.zeros(len(positions))
+        for i, position in enumerate(positions):
+            spans = self.employee_rows[position]
+            for kind, weight in self.SET_WEIGHTS:
+                span = spans.get((kind, characteristics.get(kind, '') if kind != 'primary' else ''))
+                if span is None:
+                    continue
+                start, end = span
+                squared = probe_norm + self.row_norms[start:end] - 2.0 * (self.matrix[start:end] @ probe)
+                overall[i] += weight * (1 - float(np.sqrt(max(float(squared.min()), 0.0))))
+        return overall
+
 class AdvancedEnrollmentService:
     """Advanced enrollment service for comprehensive face recognition"""
     
@@ -67,6 +190,11 @@ class AdvancedEnrollmentService:
         self.employee_profiles = {}
         self.enrollment_sessions = {}
         
+        # Stacked embeddings of completed profiles, rebuilt when profiles change
+        self._embedding_matrix: Optional[ProfileEmbeddingMatrix] = None
+        self._embedding_signature = None
+        self._embedding_lock = threading.Lock()
+        
         # Cameras for enrollment
         self.enrollment_cameras = {}
         self.active_enrollments = set()
@@ -514,75 +642,176 @@ class AdvancedEnrollmentService:
         }
         return instructions.get(phase, "Please follow the on-screen instructions.")
     
-    def recognize_employee(self, frame: np.ndarray, camera_id: str) -> Optional[Dict]:
-        """Recognize employee using advanced multi-angle embeddings"""
-        # Detect faces in frame
-        face_locations = face_recognition.face_locations(frame)
+    def _profiles_signature(self) -> tuple:
+        """Cheap fingerprint of the enrolled profiles"""
+        return tuple(
+            (employee_id, id(profile), profile.enrollment_complete, profile.last_updated,
+             len(profile.primary_embeddings), len(profile.variation_embeddings))
+            for employee_id, profile in self.employee_profiles.items()
+        )
+    
+    def get_embedding_matrix(self) -> ProfileEmbeddingMatrix:
+        """Get the stacked embeddings of completed profiles, rebuilding if profiles changed"""
+        signature = self._profiles_signature()
+        if self._embedding_matrix is not None and signature == self._embedding_signature:
+            return self._embedding_matrix
+        
+        with self._embedding_lock:
+            if self._embedding_matrix is None or signature != self._embedding_signature:
+                embedding_matrix = ProfileEmbeddingMatrix(dict(self.employee_profiles))
+                # Same index settings (FACE_INDEX_*) as the face gallery
+                if gallery_service.index_type != 'exact' and len(embedding_matrix.matrix) >= gallery_service.index_min_size:
+                    embedding_matrix.build_index(gallery_service.index_type, **gallery_service.index_options)
+                self._embedding_matrix = embedding_matrix
+                self._embedding_signature = signature
+            return self._embedding_matrix
+    
+    @staticmethod
+    def _detect_faces_scaled(image: np.ndarray, scale: float = 1.0) -> List[Tuple]:
+        """Face locations found on a resized copy, mapped back to image pixels"""
+        if scale >= 1.0:
+            return face_recognition.face_locations(np.ascontiguousarray(image))
+        
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        height, width = image.shape[:2]
+        return [
+            (max(0, int(top / scale)), min(width, int(right / scale)),
+             min(height, int(bottom / scale)), max(0, int(left / scale)))
+            for top, right, bottom, left in face_recognition.face_locations(small)
+        ]
+    
+    def _locate_faces(self, frame: np.ndarray, regions: Optional[List[Tuple]] = None,
+                      detection_scale: float = 1.0) -> List[Tuple]:
+        """Face locations in the frame, searching only the given regions if any"""
+        frame_area = frame.shape[0] * frame.shape[1]
+        region_area = sum((bottom - top) * (right - left) for top, right, bottom, left in regions or [])
+        if not regions or region_area > 0.6 * frame_area:
+            return self._detect_faces_scaled(frame, detection_scale)
+        
+        face_locations = []
+        for top, right, bottom, left in regions:
+            crop = frame[top:bottom, left:right]
+            for f_top, f_right, f_bottom, f_left in self._detect_faces_scaled(crop, detection_scale):
+                location = (f_top + top, f_right + left, f_bottom + top, f_left + left)
+                # Padded regions can overlap, keep one copy of each face
+                if all(location_iou(location, other) < 0.5 for other in face_locations):
+                    face_locations.append(location)
+        return face_locations
+    
+    def analyze_faces(self, frame: np.ndarray, camera_id: str, regions: Optional[List[Tuple]] = None,
+                      detection_scale: float = 1.0, known_locations: Optional[List[Tuple]] = None,
+                      timings: Optional[Dict] = None) -> List[Dict]:
+        """Detect, encode and characterize every face in the frame
+        
+        This is the expensive half of recognition and needs no enrolled
+        profiles, so it can run in a worker process (see analyze_frame_faces).
+        regions, as (top, right, bottom, left) boxes, limit where faces are
+        searched for, e.g. the areas a motion gate saw change. Detection runs
+        on the frame resized by detection_scale; encoding and the capture
+        analysis use the face boxes at full resolution. Faces overlapping
+        known_locations (faces a tracker has already identified) are returned
+        with their location only, without an encoding. Seconds spent on
+        detection, encoding and capture analysis are added to timings.
+        """
+        timings = timings if timings is not None else {}
+        started = time.perf_counter()
+        face_locations = self._locate_faces(frame, regions, detection_scale)
+        timings['detection'] = time.perf_counter() - started
         if not face_locations:
-            return None
-        
-        face_encodings = face_recognition.face_encodings(frame, face_locations)
-        if not face_encodings:
-            return None
+            return []
         
-        # For each detected face
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            # Analyze current capture characteristics
-            capture_analysis = self._analyze_capture(frame, face_location, face_encoding, camera_id)
-            
-            best_match = None
-            best_confidence = 0
+        tracked = [
+            any(location_iou(face_location, known) >= 0.5 for known in known_locations or [])
+            for face_location in face_locations
+        ]
+        to_encode = [face_location for face_location, is_tracked in zip(face_locations, tracked) if not is_tracked]
+        started = time.perf_counter()
+        face_encodings = iter(face_recognition.face_encodings(frame, to_encode) if to_encode else [])
+        timings['encoding'] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        faces = []
+        for face_location, is_tracked in zip(face_locations, tracked):
+            if is_tracked:
+                faces.append({'face_location': face_location, 'face_encoding': None,
+                              'detection_characteristics': None})
+                continue
+            face_encoding = next(face_encodings, None)
+            if face_encoding is None:
+                continue
+            faces.append({
+                'face_location': face_location,
+                'face_encoding': face_encoding,
+                'detection_characteristics': self._analyze_capture(frame, face_location, face_encoding, camera_id)
+            })
+        timings['analysis'] = time.perf_counter() - started
+        return faces
+    
+    def match_analyzed_faces(self, faces: List[Dict]) -> List[Dict]:
+        """Match faces from analyze_faces against the enrolled profiles"""
+        embedding_matrix = self.get_embedding_matrix()
+        if not embedding_matrix.employee_ids or not faces:
+            return []
+        
+        faces = [face for face in faces if face.get('face_encoding') is not None]
+        if not faces:
+            return []
+        
+        threshold = 0.6
+        
+        # The set weights sum to 1, so a confidence never exceeds 1 minus the
+        # employee's closest embedding distance: with an index, only employees
+        # with an embedding within 1 - threshold need scoring
+        shortlists = [embedding_matrix.candidates(face['face_encoding'], 1 - threshold + 1e-3) for face in faces]
+        
+        # Distances from the other faces to every enrolled embedding in one pass
+        scanned = [face_index for face_index, shortlist in enumerate(shortlists) if shortlist is None]
+        distances = embedding_matrix.distances([faces[face_index]['face_encoding'] for face_index in scanned]) \
+            if scanned else None
+        rows = {face_index: row for row, face_index in enumerate(scanned)}
+        
+        matches = []
+        for face_index, face in enumerate(faces):
+            capture_analysis = face['detection_characteristics']
+            shortlist = shortlists[face_index]
             
-            # Compare against all enrolled employees
-            for employee_id, profile in self.employee_profiles.items():
-                if not profile.enrollment_complete:
-                    continue
-                
-                # Calculate confidence using different embedding sets
-                confidences = []
-                
-                # Primary embeddings confidence
-                if profile.primary_embeddings:
-                    similarities = face_recognition.face_distance(profile.primary_embeddings, face_encoding)
-                    primary_confidence = 1 - np.min(similarities)  # Best match
-                    confidences.append(primary_confidence * 0.5)  # 50% weight
-                
-                # Variation embeddings confidence based on detected characteristics
-                variation_key = f"angle_{capture_analysis['angle']}"
-                if variation_key in profile.variation_embeddings:
-                    similarities = face_recognition.face_distance(profile.variation_embeddings[variation_key], face_encoding)
-                    angle_confidence = 1 - np.min(similarities)
-                    confidences.append(angle_confidence * 0.2)  # 20% weight
-                
-                lighting_key = f"lighting_{capture_analysis['lighting']}"
-                if lighting_key in profile.variation_embeddings:
-                    similarities = face_recognition.face_distance(profile.variation_embeddings[lighting_key], face_encoding)
-                    lighting_confidence = 1 - np.min(similarities)
-                    confidences.append(lighting_confidence * 0.2)  # 20% weight
-                
-                distance_key = f"distance_{capture_analysis['distance']}"
-                if distance_key in profile.variation_embeddings:
-                    similarities = face_recognition.face_distance(profile.variation_embeddings[distance_key], face_encoding)
-                    distance_confidence = 1 - np.min(similarities)
-                    confidences.append(distance_confidence * 0.1)  # 10% weight
-                
-                # Overall confidence
-                overall_confidence = sum(confidences) if confidences else 0
-                
-                # Update best match
-                if overall_confidence > best_confidence and overall_confidence > 0.6:  # Confidence threshold
-                    best_confidence = overall_confidence
-                    best_match = {
-                        'employee_id': employee_id,
-                        'employee_name': profile.name,
-                        'confidence': overall_confidence,
-                        'face_location': face_location,
-                        'detection_characteristics': capture_analysis
-                    }
+            if shortlist is None:
+                confidences = embedding_matrix.confidences(distances[rows[face_index]], capture_analysis)
+                best = int(np.argmax(confidences))
+                best_confidence = float(confidences[best])
+            elif shortlist:
+                confidences = embedding_matrix.candidate_confidences(face['face_encoding'], capture_analysis, shortlist)
+                top = int(np.argmax(confidences))
+                best, best_confidence = shortlist[top], float(confidences[top])
+            else:
+                continue
             
-            return best_match
-        
-        return None
+            if best_confidence > threshold:  # Confidence threshold
+                matches.append({
+                    'employee_id': embedding_matrix.employee_ids[best],
+                    'employee_name': embedding_matrix.employee_names[best],
+                    'confidence': best_confidence,
+                    'face_location': face['face_location'],
+                    'detection_characteristics': capture_analysis
+                })
+        
+        return matches
+    
+    def match_analyzed_employee(self, faces: List[Dict]) -> Optional[Dict]:
+        """Most confident match among faces from analyze_faces"""
+        matches = self.match_analyzed_faces(faces)
+        return max(matches, key=lambda match: match['confidence']) if matches else None
+    
+    def recognize_employees(self, frame: np.ndarray, camera_id: str) -> List[Dict]:
+        """Recognize every face in the frame using advanced multi-angle embeddings"""
+        if not self.get_embedding_matrix().employee_ids:
+            return []
+        return self.match_analyzed_faces(self.analyze_faces(frame, camera_id))
+    
+    def recognize_employee(self, frame: np.ndarray, camera_id: str) -> Optional[Dict]:
+        """Recognize the most confident employee in the frame"""
+        matches = self.recognize_employees(frame, camera_id)
+        return max(matches, key=lambda match: match['confidence']) if matches else None
     
     def add_employee_photos_batch(self, employee_id: str, employee_name: str, 
                                  photo_paths: List[str]) -> Dict:
@@ -803,3 +1032,34 @@ def initialize_enrollment_service(data_dir: str = "enrollment_data"):
     global enrollment_service
     enrollment_service = AdvancedEnrollmentService(data_dir)
     return enrollment_service
+
+# Per-process service used by inference workers, which only analyze faces
+_analysis_services = {}
+
+def analyze_frame_faces(data_dir: str, frame: np.ndarray, camera_id: str,
+                        regions: Optional[List[Tuple]] = None, detection_scale: float = 1.0,
+                        origin: Tuple[int, int] = (0, 0),
+                        known_locations: Optional[List[Tuple]] = None) -> Dict:
+    """Run AdvancedEnrollmentService.analyze_faces in an inference worker
+    
+    frame may be a crop of the camera frame whose top-left corner is at
+    origin (top, left); face locations, including known_locations, are in
+    camera frame pixels. Returns {'faces': [...], 'timings': {stage: seconds}}.
+    """
+    service = _analysis_services.get(data_dir)
+    if service is None:
+        service = _analysis_services[data_dir] = AdvancedEnrollmentService(data_dir)
+    
+    origin_top, origin_left = origin
+    if known_locations and (origin_top or origin_left):
+        known_locations = [(top - origin_top, right - origin_left, bottom - origin_top, left - origin_left)
+                           for top, right, bottom, left in known_locations]
+    
+    timings = {}
+    faces = service.analyze_faces(frame, camera_id, regions, detection_scale, known_locations, timings)
+    if origin_top or origin_left:
+        for face in faces:
+            top, right, bottom, left = face['face_location']
+            face['face_location'] = (top + origin_top, right + origin_left,
+                                     bottom + origin_top, left + origin_left)
+    return {'faces': faces, 'timings': timings}
@@ -6,14 +6,24 @@ Handles live camera feeds, face detection, and coordinates all camera-based serv
 import cv2
 import threading
 import time
-import queue
 import numpy as np
-from typing import Dict, List, Optional, Callable, Tuple
+from typing import Dict, List, Optional, Callable, Tuple, Iterator
 from dataclasses import dataclass
-from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import logging
 from pathlib import Path
 
+from .advanced_enrollment import analyze_frame_faces
+from .inference_scheduler import InferenceJob, inference_scheduler
+from .frame_buffer import FrameRef, FrameRingBuffer
+from .motion_gate import MotionGate
+from .face_tracker import FaceTracker
+from .mjpeg_stream import MJPEGBroadcaster
+from .pipeline_metrics import pipeline_metrics
+from .stream_supervisor import stream_supervisor
+from .decode_process import DecoderProcess
+from .replay_source import is_replay_url
+
 @dataclass
 class CameraConfig:
     camera_id: str
@@ -25,6 +35,9 @@ class CameraConfig:
     resolution: Tuple[int, int] = (1280, 720)
     detection_enabled: bool = True
     recording_enabled: bool = False
+    motion_gating: bool = True  # Only run face detection on frames with motion
+    detection_scale: float = 1.0  # Resize factor for face detection, e.g. 0.5 for 1080p streams
+    decode_process: bool = False  # Capture and decode in a separate process, frames shared via shared memory
 
 @dataclass
 class DetectionResult:
@@ -47,6 +60,7 @@ class CCTVIntegrationService:
         # Camera management
         self.cameras = {}
         self.camera_threads = {}
+        self.camera_stop_events: Dict[str, threading.Event] = {}  # Ends one camera's thread
         self.camera_queues = {}
         self.camera_stats = {}
         
@@ -55,10 +69,26 @@ class CCTVIntegrationService:
         self.max_detection_distance = 0.6  # Maximum face distance for recognition
         self.min_confidence_threshold = 0.6
         
-        # Processing
+        # Processing: detection for all cameras shares one worker pool
         self.running = False
-        self.detection_executor = ThreadPoolExecutor(max_workers=4)
-        self.frame_queues = {}
+        self.inference_scheduler = inference_scheduler
+        self.frame_buffers: Dict[str, FrameRingBuffer] = {}
+        self.frame_buffer_slots = 4
+        self.stream_supervisor = stream_supervisor
+        self.max_read_failures = 30  # Consecutive failed reads before reconnecting
+        self.decode_in_subprocess = False  # Decoder processes for all cameras, see CameraConfig.decode_process
+        self.decoders: Dict[str, DecoderProcess] = {}
+        self.decoder_hang_timeout = 60.0  # Seconds without a decoder heartbeat before it is killed
+        self.motion_gates: Dict[str, MotionGate] = {}
+        self.detection_rois: Dict[str, Tuple] = {}  # camera_id -> (key, roi)
+        self.face_trackers: Dict[str, FaceTracker] = {}
+        self.mjpeg_streams: Dict[str, MJPEGBroadcaster] = {}
+        self.mjpeg_lock = threading.Lock()
+        
+        # Per-stage timings, exported by the metrics endpoints
+        self.metrics = pipeline_metrics
+        self.metrics.add_gauge_source(self._metric_gauges)
+        self.last_detection_times = {}
         
         # Callbacks
         self.detection_callbacks = []
@@ -178,9 +208,6 @@ class CCTVIntegrationService:
         # Stop zone tracking
         self.zone_service.stop_zone_tracking()
         
-        # Shutdown executor
-        self.detection_executor.shutdown(wait=True)
-        
         self.logger.info("Stopped camera monitoring")
     
     def _start_camera_thread(self, camera_config: CameraConfig):
@@ -188,8 +215,21 @@ class CCTVIntegrationService:
         if camera_config.camera_id in self.camera_threads:
             return
         
-        # Create frame queue
-        self.frame_queues[camera_config.camera_id] = queue.Queue(maxsize=10)
+        # Create frame buffer shared by live view and detection; in decoder
+        # process mode it lives in shared memory written by that process
+        decode_process = camera_config.decode_process or self.decode_in_subprocess
+        if decode_process:
+            decoder = DecoderProcess(
+                camera_config.camera_id, self._capture_source(camera_config), camera_config.resolution,
+                camera_config.fps, self.frame_buffer_slots, self.max_read_failures
+            )
+            self.decoders[camera_config.camera_id] = decoder
+            self.frame_buffers[camera_config.camera_id] = decoder.ring
+        else:
+            self.frame_buffers[camera_config.camera_id] = FrameRingBuffer(self.frame_buffer_slots)
+        if camera_config.motion_gating:
+            self.motion_gates[camera_config.camera_id] = MotionGate()
+        self.face_trackers[camera_config.camera_id] = FaceTracker()
         
         # Initialize camera stats
         self.camera_stats[camera_config.camera_id] = {
@@ -198,189 +238,416 @@ class CCTVIntegrationService:
             'frame_count': 0,
             'detection_count': 0,
             'last_detection': None,
-            'errors': 0
+            'errors': 0,
+            'reconnects': 0,
+            'stalls': 0
         }
+        if decode_process:
+            self.camera_stats[camera_config.camera_id]['decoder_restarts'] = 0
         
         # Start camera thread
+        stop = threading.Event()
+        self.camera_stop_events[camera_config.camera_id] = stop
         thread = threading.Thread(
-            target=self._camera_loop,
-            args=(camera_config,),
+            target=self._decoder_loop if decode_process else self._camera_loop,
+            args=(camera_config, stop),
             daemon=True
         )
         thread.start()
         self.camera_threads[camera_config.camera_id] = thread
         
-        # Start detection thread for this camera
-        detection_thread = threading.Thread(
-            target=self._detection_loop,
-            args=(camera_config.camera_id,),
-            daemon=True
-        )
-        detection_thread.start()
-        
         self.logger.info(f"Started camera thread for {camera_config.name}")
     
     def _stop_camera_thread(self, camera_id: str):
         """Stop monitoring thread for a specific camera"""
+        stop = self.camera_stop_events.pop(camera_id, None)
+        if stop is not None:
+            stop.set()
         if camera_id in self.camera_threads:
-            # Thread will stop when self.running becomes False
             self.camera_threads[camera_id].join(timeout=5)
             del self.camera_threads[camera_id]
         
-        if camera_id in self.frame_queues:
-            del self.frame_queues[camera_id]
+        decoder = self.decoders.pop(camera_id, None)
+        if decoder is not None:
+            decoder.stop()
+        if camera_id in self.frame_buffers:
+            del self.frame_buffers[camera_id]
+        self.motion_gates.pop(camera_id, None)
+        self.detection_rois.pop(camera_id, None)
+        self.face_trackers.pop(camera_id, None)
         
         self.logger.info(f"Stopped camera thread for {camera_id}")
     
-    def _camera_loop(self, camera_config: CameraConfig):
-        """Main loop for camera frame capture"""
+    def _capture_source(self, camera_config: CameraConfig):
+        """URL or device index to open for a camera"""
+        # For demo purposes, use webcam (0) instead of non-RTSP URLs;
+        # replay:// URLs play recordings for benchmarks
+        if camera_config.url.startswith('rtsp://') or is_replay_url(camera_config.url):
+            return camera_config.url
+        return 0
+    
+    def _camera_loop(self, camera_config: CameraConfig, stop: threading.Event):
+        """Main loop for camera frame capture, reconnecting whenever the stream drops"""
         camera_id = camera_config.camera_id
         stats = self.camera_stats[camera_id]
         
-        # Try to connect to camera
-        cap = None
-        retry_count = 0
-        max_retries = 5
+        source = self._capture_source(camera_config)
         
-        while self.running and retry_count < max_retries:
+        frame_count = 0
+        last_fps_time = time.time()
+        frame_buffer = self.frame_buffers[camera_id]
+        frame_interval = 1.0 / camera_config.fps
+        connected_before = False
+        
+        while self.running and not stop.is_set():
+            # Retries with backoff until the camera answers or monitoring stops
+            connection = self.stream_supervisor.connect(camera_id, [source],
+                                                        lambda: not self.running or stop.is_set())
+            if connection is None:
+                break
+            cap, _ = connection
+            
+            stats['connected'] = True
+            if connected_before:
+                stats['reconnects'] += 1
+                self.metrics.count('cctv', camera_id, 'reconnects')
+                motion_gate = self.motion_gates.get(camera_id)
+                if motion_gate is not None:
+                    motion_gate.reset()
+            connected_before = True
+            self.logger.info(f"Connected to camera {camera_config.name}")
+            
+            # Set camera properties
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, camera_config.resolution[0])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_config.resolution[1])
+            cap.set(cv2.CAP_PROP_FPS, camera_config.fps)
+            
+            # The watchdog flags the capture as stalled if frames stop arriving
+            watch = self.stream_supervisor.watch(camera_id, cap)
+            read_failures = 0
+            
             try:
-                # For demo purposes, use webcam (0) instead of RTSP
-                # In production, use: cap = cv2.VideoCapture(camera_config.url)
-                if camera_config.url.startswith('rtsp://'):
-                    cap = cv2.VideoCapture(camera_config.url)
-                else:
-                    # Use webcam for demo
-                    cap = cv2.VideoCapture(0)
-                
-                if cap and cap.isOpened():
-                    stats['connected'] = True
-                    self.logger.info(f"Connected to camera {camera_config.name}")
-                    break
-                else:
-                    raise Exception("Could not open camera")
+                while self.running and not stop.is_set() and not watch.stalled:
+                    read_start = time.time()
+                    
+                    # Grab, then decode straight into a reusable slot of the frame buffer
+                    slot, slot_frame = frame_buffer.writable()
+                    with self.metrics.time('cctv', camera_id, 'capture'):
+                        ret = cap.grab()
+                    if ret:
+                        with self.metrics.time('cctv', camera_id, 'decode'):
+                            ret, frame = cap.retrieve(slot_frame) if slot_frame is not None else cap.retrieve()
+                    
+                    if not ret:
+                        self.logger.warning(f"Failed to read frame from {camera_config.name}")
+                        stats['errors'] += 1
+                        self.metrics.count('cctv', camera_id, 'read_errors')
+                        read_failures += 1
+                        if read_failures >= self.max_read_failures:
+                            break
+                        time.sleep(frame_interval)
+                        continue
+                    
+                    read_failures = 0
+                    watch.frame_received()
+                    self.metrics.count('cctv', camera_id, 'frames')
+                    frame_count += 1
+                    stats['frame_count'] = frame_count
+                    
+                    # Calculate FPS
+                    current_time = time.time()
+                    if current_time - last_fps_time >= 1.0:
+                        stats['fps'] = frame_count - stats.get('last_frame_count', 0)
+                        stats['last_frame_count'] = frame_count
+                        last_fps_time = current_time
+                    
+                    # Publish as the newest frame for live view and detection
+                    frame_buffer.publish(slot, frame, current_time)
+                    
+                    # Hand the newest frame to the shared inference pool once the
+                    # previous frame from this camera is done
+                    if camera_config.detection_enabled and \
+                            current_time - self.last_detection_times.get(camera_id, 0) >= self.detection_interval and \
+                            not self.inference_scheduler.is_busy(camera_id):
+                        self._submit_frame_for_detection(camera_config, frame_buffer)
+                    
+                    # Cap the frame rate for sources that deliver faster than configured
+                    remaining = frame_interval - (time.time() - read_start)
+                    if remaining > 0:
+                        time.sleep(remaining)
                     
             except Exception as e:
-                retry_count += 1
-                self.logger.error(f"Failed to connect to camera {camera_config.name}: {e}")
-                time.sleep(5)  # Wait before retry
-        
-        if not cap or not cap.isOpened():
-            self.logger.error(f"Could not connect to camera {camera_config.name} after {max_retries} attempts")
-            stats['connected'] = False
-            return
+                self.logger.error(f"Error in camera loop for {camera_config.name}: {e}")
+                stats['errors'] += 1
+            
+            finally:
+                self.stream_supervisor.unwatch(watch)
+                cap.release()
+                stats['connected'] = False
+            
+            if watch.stalled:
+                stats['stalls'] += 1
+                self.metrics.count('cctv', camera_id, 'stalls')
+            if self.running and not stop.is_set():
+                self.logger.warning(f"Lost connection to camera {camera_config.name}, reconnecting")
+        
+        stats['connected'] = False
+        self.logger.info(f"Camera loop ended for {camera_config.name}")
+    
+    def _decoder_loop(self, camera_config: CameraConfig, stop: threading.Event):
+        """Watch a camera's decoder process and feed its frames to detection
         
-        # Set camera properties
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, camera_config.resolution[0])
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, camera_config.resolution[1])
-        cap.set(cv2.CAP_PROP_FPS, camera_config.fps)
+        The decoder connects, reconnects and decodes on its own; this thread
+        restarts it with backoff if it dies or stops sending heartbeats, and
+        submits new frames from the shared ring for detection.
+        """
+        camera_id = camera_config.camera_id
+        stats = self.camera_stats[camera_id]
+        decoder = self.decoders[camera_id]
+        ring = decoder.ring
+        frame_interval = 1.0 / camera_config.fps
         
-        frame_count = 0
+        last_sequence = 0
+        last_counters = ring.counters()
         last_fps_time = time.time()
+        last_fps_frames = 0
+        restart_attempt = 0
         
+        decoder.start()
+        self.logger.info(f"Started decoder process for camera {camera_config.name}")
         try:
-            while self.running and cap.isOpened():
-                ret, frame = cap.read()
-                
-                if not ret:
-                    self.logger.warning(f"Failed to read frame from {camera_config.name}")
-                    stats['errors'] += 1
+            while self.running and not stop.is_set():
+                counters = ring.counters()
+                hung = counters['heartbeat'] and time.time() - counters['heartbeat'] > self.decoder_hang_timeout
+                if not decoder.is_alive() or hung:
+                    self.logger.error(f"Decoder process for {camera_config.name} "
+                                      f"{'hung' if hung else f'exited with code {decoder.exitcode}'}, restarting")
+                    stats['decoder_restarts'] += 1
+                    self.metrics.count('cctv', camera_id, 'decoder_restarts')
+                    stop_at = time.time() + self.stream_supervisor.backoff_delay(restart_attempt)
+                    restart_attempt += 1
+                    while self.running and not stop.is_set() and time.time() < stop_at:
+                        time.sleep(0.2)
+                    if not self.running or stop.is_set() or not decoder.restart():
+                        break
+                    motion_gate = self.motion_gates.get(camera_id)
+                    if motion_gate is not None:
+                        motion_gate.reset()
                     continue
                 
-                frame_count += 1
-                stats['frame_count'] = frame_count
+                # Mirror the decoder's counters into stats and metrics
+                stats['connected'] = counters['connected']
+                stats['frame_count'] = counters['frames']
+                stats['errors'] = counters['read_errors']
+                stats['reconnects'] = counters['reconnects']
+                stats['stalls'] = counters['stalls']
+                for name in ('frames', 'read_errors', 'reconnects', 'stalls'):
+                    if counters[name] > last_counters[name]:
+                        self.metrics.count('cctv', camera_id, name, counters[name] - last_counters[name])
+                if counters['reconnects'] > last_counters['reconnects']:
+                    motion_gate = self.motion_gates.get(camera_id)
+                    if motion_gate is not None:
+                        motion_gate.reset()
+                last_counters = counters
                 
-                # Calculate FPS
                 current_time = time.time()
                 if current_time - last_fps_time >= 1.0:
-                    stats['fps'] = frame_count - stats.get('last_frame_count', 0)
-                    stats['last_frame_count'] = frame_count
+                    stats['fps'] = counters['frames'] - last_fps_frames
+                    last_fps_frames = counters['frames']
                     last_fps_time = current_time
                 
-                # Add frame to queue for detection (non-blocking)
-                if camera_config.detection_enabled:
-                    try:
-                        self.frame_queues[camera_id].put_nowait((current_time, frame.copy()))
-                    except queue.Full:
-                        # Queue is full, skip this frame
-                        pass
-                
-                # Small delay to control frame rate
-                time.sleep(1.0 / camera_config.fps)
+                sequence = ring.sequence
+                if sequence != last_sequence:
+                    last_sequence = sequence
+                    restart_attempt = 0
+                    self.metrics.observe('cctv', camera_id, 'decode', counters['decode_seconds'])
+                    
+                    if camera_config.detection_enabled and \
+                            current_time - self.last_detection_times.get(camera_id, 0) >= self.detection_interval and \
+                            not self.inference_scheduler.is_busy(camera_id):
+                        self._submit_frame_for_detection(camera_config, ring)
                 
+                time.sleep(frame_interval)
+        
         except Exception as e:
-            self.logger.error(f"Error in camera loop for {camera_config.name}: {e}")
+            self.logger.error(f"Error in decoder loop for {camera_config.name}: {e}")
             stats['errors'] += 1
         
         finally:
-            if cap:
-                cap.release()
             stats['connected'] = False
-            self.logger.info(f"Camera loop ended for {camera_config.name}")
+            self.logger.info(f"Decoder loop ended for {camera_config.name}")
     
-    def _detection_loop(self, camera_id: str):
-        """Detection loop for processing frames from a camera"""
-        last_detection_time = 0
-        frame_queue = self.frame_queues[camera_id]
-        stats = self.camera_stats[camera_id]
+    def _get_detection_roi(self, camera_id: str, frame_shape: Tuple) -> Optional[Dict]:
+        """Mask and bounding box of the zone polygons drawn on a camera, None for the whole view"""
+        polygons = self.zone_service.get_camera_roi(camera_id)
+        motion_gate = self.motion_gates.get(camera_id)
+        if not polygons:
+            if self.detection_rois.pop(camera_id, None) is not None and motion_gate is not None:
+                motion_gate.set_mask(None)
+            return None
         
-        while self.running:
-            try:
-                # Get frame from queue (blocking with timeout)
-                timestamp, frame = frame_queue.get(timeout=1.0)
-                
-                # Skip if too soon since last detection
-                if timestamp - last_detection_time < self.detection_interval:
-                    continue
-                
-                # Process frame for face detection and recognition
-                detection_result = self._process_frame_for_detection(camera_id, frame, timestamp)
-                
-                if detection_result:
-                    last_detection_time = timestamp
-                    stats['detection_count'] += 1
-                    stats['last_detection'] = timestamp
-                    
-                    # Process the detection
-                    self._handle_detection_result(detection_result)
-                
-            except queue.Empty:
-                # No frames in queue, continue
-                continue
-            except Exception as e:
-                self.logger.error(f"Error in detection loop for {camera_id}: {e}")
-                time.sleep(1)
+        key = (tuple(tuple(map(tuple, polygon)) for polygon in polygons), frame_shape[:2])
+        cached = self.detection_rois.get(camera_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        mask = np.zeros(frame_shape[:2], dtype=np.uint8)
+        cv2.fillPoly(mask, [np.array(polygon, dtype=np.int32) for polygon in polygons], 255)
+        x, y, width, height = cv2.boundingRect(mask)
+        roi = {'mask': mask, 'box': (y, x + width, y + height, x)}
+        
+        self.detection_rois[camera_id] = (key, roi)
+        if motion_gate is not None:
+            motion_gate.set_mask(mask)
+        return roi
+    
+    def _submit_frame_for_detection(self, camera_config: CameraConfig, frame_buffer: FrameRingBuffer):
+        """Queue the newest frame for face analysis on the shared inference pool
+        
+        Frames without motion are dropped here when the camera is motion
+        gated, and only the part of the frame covered by the camera's zone
+        polygons is sent for detection. The frame stays pinned in the buffer
+        until the result is handled.
+        """
+        camera_id = camera_config.camera_id
+        frame_ref = frame_buffer.read()
+        if frame_ref is None:
+            return
+        
+        frame = frame_ref.frame
+        roi = self._get_detection_roi(camera_id, frame.shape)
+        if roi is not None and roi['box'][2] <= roi['box'][0]:
+            frame_buffer.release(frame_ref)  # Zones lie outside the picture
+            return
+        
+        regions = None
+        motion_gate = self.motion_gates.get(camera_id)
+        if motion_gate is not None:
+            with self.metrics.time('cctv', camera_id, 'motion'):
+                has_motion, regions = motion_gate.check(frame)
+            if not has_motion:
+                frame_buffer.release(frame_ref)
+                self.metrics.count('cctv', camera_id, 'motion_skipped')
+                return
+        
+        origin = (0, 0)
+        if roi is not None:
+            # Crop to the zones and move the motion regions into crop coordinates
+            top, right, bottom, left = roi['box']
+            frame = frame[top:bottom, left:right]
+            origin = (top, left)
+            regions = [
+                (max(r_top, top) - top, min(r_right, right) - left,
+                 min(r_bottom, bottom) - top, max(r_left, left) - left)
+                for r_top, r_right, r_bottom, r_left in regions or []
+                if r_top < bottom and r_bottom > top and r_left < right and r_right > left
+            ]
+        
+        # Faces on confirmed tracks are located but not encoded again
+        face_tracker = self.face_trackers.get(camera_id)
+        known_locations = face_tracker.confirmed_locations(frame_ref.timestamp) if face_tracker else None
+        
+        self.metrics.count('cctv', camera_id, 'submitted')
+        self.inference_scheduler.submit(
+            camera_id,
+            analyze_frame_faces,
+            (str(self.enrollment_service.data_dir), frame, camera_id, regions,
+             camera_config.detection_scale, origin, known_locations),
+            self._on_frame_analyzed,
+            context={'frame_ref': frame_ref, 'frame_buffer': frame_buffer}
+        )
+    
+    def _on_frame_analyzed(self, job: InferenceJob, result: Optional[Dict], error: Optional[Exception]):
+        """Match the analyzed faces of a frame and handle the detection"""
+        camera_id = job.camera_id
+        frame_ref: FrameRef = job.context['frame_ref']
+        try:
+            if job.started_at is not None:
+                self.metrics.observe('cctv', camera_id, 'queue_wait', job.started_at - job.submitted_at)
+                self.metrics.observe('cctv', camera_id, 'inference', job.finished_at - job.started_at)
+            for stage, seconds in (result or {}).get('timings', {}).items():
+                self.metrics.observe('cctv', camera_id, stage, seconds)
+            
+            self._handle_analyzed_frame(camera_id, frame_ref, result['faces'] if result else None, error)
+            self.metrics.observe('cctv', camera_id, 'end_to_end', time.time() - frame_ref.timestamp)
+        finally:
+            job.context['frame_buffer'].release(frame_ref)
+    
+    def _handle_analyzed_frame(self, camera_id: str, frame_ref: FrameRef,
+                               faces: Optional[List[Dict]], error: Optional[Exception]):
+        stats = self.camera_stats.get(camera_id)
+        if stats is None:
+            return
+        
+        if error is not None:
+            stats['errors'] += 1
+            return
+        
+        # Ignore faces whose centre falls outside the camera's zone polygons
+        cached_roi = self.detection_rois.get(camera_id)
+        if cached_roi is not None and faces:
+            mask = cached_roi[1]['mask']
+            faces = [
+                face for face in faces
+                if mask[min((face['face_location'][0] + face['face_location'][2]) // 2, mask.shape[0] - 1),
+                        min((face['face_location'][1] + face['face_location'][3]) // 2, mask.shape[1] - 1)]
+            ]
+        
+        timestamp = frame_ref.timestamp
+        face_tracker = self.face_trackers.get(camera_id)
+        with self.metrics.time('cctv', camera_id, 'matching'):
+            if face_tracker is not None:
+                matches = face_tracker.process(faces, timestamp, self.enrollment_service.match_analyzed_faces)
+                recognition_result = max(matches, key=lambda match: match['confidence']) if matches else None
+            else:
+                recognition_result = self.enrollment_service.match_analyzed_employee(faces)
+        detection_result = self._create_detection_result(camera_id, frame_ref.frame, timestamp, recognition_result)
+        
+        if detection_result:
+            self.last_detection_times[camera_id] = timestamp
+            stats['detection_count'] += 1
+            stats['last_detection'] = timestamp
+            self.metrics.count('cctv', camera_id, 'detections')
+            
+            # Process the detection
+            with self.metrics.time('cctv', camera_id, 'zone_write'):
+                self._handle_detection_result(detection_result)
     
     def _process_frame_for_detection(self, camera_id: str, frame: np.ndarray, timestamp: float) -> Optional[DetectionResult]:
         """Process frame for face detection and recognition"""
         try:
             # Use the advanced enrollment service for recognition
             recognition_result = self.enrollment_service.recognize_employee(frame, camera_id)
-            
-            if recognition_result:
-                # Create detection result
-                detection = DetectionResult(
-                    camera_id=camera_id,
-                    timestamp=timestamp,
-                    employee_id=recognition_result['employee_id'],
-                    employee_name=recognition_result['employee_name'],
-                    confidence=recognition_result['confidence'],
-                    face_location=recognition_result['face_location'],
-                    frame_with_detection=self._draw_detection_box(frame, recognition_result)
-                )
-                
-                self.total_detections += 1
-                if recognition_result['confidence'] > self.min_confidence_threshold:
-                    self.successful_recognitions += 1
-                else:
-                    self.failed_recognitions += 1
-                
-                return detection
-            
+            return self._create_detection_result(camera_id, frame, timestamp, recognition_result)
         except Exception as e:
             self.logger.error(f"Error processing frame for detection: {e}")
         
         return None
     
+    def _create_detection_result(self, camera_id: str, frame: np.ndarray, timestamp: float,
+                                 recognition_result: Optional[Dict]) -> Optional[DetectionResult]:
+        """Build a detection result from a recognition match"""
+        if not recognition_result:
+            return None
+        
+        detection = DetectionResult(
+            camera_id=camera_id,
+            timestamp=timestamp,
+            employee_id=recognition_result['employee_id'],
+            employee_name=recognition_result['employee_name'],
+            confidence=recognition_result['confidence'],
+            face_location=recognition_result['face_location'],
+            frame_with_detection=self._draw_detection_box(frame, recognition_result)
+        )
+        
+        self.total_detections += 1
+        if recognition_result['confidence'] > self.min_confidence_threshold:
+            self.successful_recognitions += 1
+        else:
+            self.failed_recognitions += 1
+        
+        return detection
+    
     def _draw_detection_box(self, frame: np.ndarray, recognition_result: Dict) -> np.ndarray:
         """Draw detection box and employee info on frame"""
         frame_copy = frame.copy()
@@ -437,7 +704,38 @@ class CCTVIntegrationService:
     
     def get_camera_stats(self) -> Dict:
         """Get statistics for all cameras"""
-        return self.camera_stats.copy()
+        camera_stats = {camera_id: dict(stats) for camera_id, stats in self.camera_stats.items()}
+        for camera_id, motion_gate in list(self.motion_gates.items()):
+            if camera_id in camera_stats:
+                camera_stats[camera_id]['motion'] = motion_gate.get_stats()
+        for camera_id, face_tracker in list(self.face_trackers.items()):
+            if camera_id in camera_stats:
+                camera_stats[camera_id]['tracking'] = face_tracker.get_stats()
+        for camera_id, broadcaster in list(self.mjpeg_streams.items()):
+            if camera_id in camera_stats:
+                camera_stats[camera_id]['stream'] = broadcaster.get_stats()
+        return camera_stats
+    
+    def _metric_gauges(self):
+        """Queue depths and drop counts per camera for the pipeline metrics"""
+        inference_cameras = self.inference_scheduler.get_stats()['cameras']
+        rows = []
+        for camera_id, stats in list(self.camera_stats.items()):
+            inference = inference_cameras.get(camera_id, {})
+            broadcaster = self.mjpeg_streams.get(camera_id)
+            rows.extend([
+                ('cctv', camera_id, 'connected', float(bool(stats.get('connected')))),
+                ('cctv', camera_id, 'fps', stats.get('fps', 0)),
+                ('cctv', camera_id, 'inference_waiting', inference.get('waiting', 0)),
+                ('cctv', camera_id, 'inference_running', inference.get('running', 0)),
+                ('cctv', camera_id, 'inference_dropped', inference.get('dropped', 0)),
+                ('cctv', camera_id, 'stream_viewers', broadcaster.get_stats()['viewers'] if broadcaster else 0)
+            ])
+        return rows
+    
+    def get_pipeline_metrics(self) -> Dict:
+        """Per-stage latency percentiles, counters and queue depths of the CCTV cameras"""
+        return self.metrics.snapshot().get('cctv', {})
     
     def get_detection_stats(self) -> Dict:
         """Get overall detection statistics"""
@@ -447,21 +745,43 @@ class CCTVIntegrationService:
             'failed_recognitions': self.failed_recognitions,
             'success_rate': (self.successful_recognitions / max(self.total_detections, 1)) * 100,
             'cameras_active': len([c for c in self.camera_stats.values() if c['connected']]),
-            'total_cameras': len(self.cameras)
+            'total_cameras': len(self.cameras),
+            'inference': self.inference_scheduler.get_stats()
         }
     
-    def get_live_frame(self, camera_id: str) -> Optional[np.ndarray]:
-        """Get latest frame from a camera"""
-        if camera_id not in self.frame_queues:
-            return None
+    @contextmanager
+    def latest_frame(self, camera_id: str) -> Iterator[Optional[FrameRef]]:
+        """Pin the newest frame of a camera without copying it
+        
+        The frame is shared with detection and other viewers and must not be
+        modified or kept after the with block.
+        """
+        frame_buffer = self.frame_buffers.get(camera_id)
+        if frame_buffer is None:
+            yield None
+            return
         
-        try:
-            # Get the most recent frame (non-blocking)
-            while not self.frame_queues[camera_id].empty():
-                timestamp, frame = self.frame_queues[camera_id].get_nowait()
-            return frame
-        except queue.Empty:
+        with frame_buffer.latest() as frame_ref:
+            yield frame_ref
+    
+    def get_mjpeg_stream(self, camera_id: str, quality: int = 80, max_fps: float = 10.0) -> Optional[MJPEGBroadcaster]:
+        """Shared MJPEG encoder for a running camera, None if it is not running"""
+        if camera_id not in self.frame_buffers:
             return None
+        
+        with self.mjpeg_lock:
+            broadcaster = self.mjpeg_streams.get(camera_id)
+            if broadcaster is None:
+                broadcaster = MJPEGBroadcaster(lambda: self.latest_frame(camera_id), quality, max_fps)
+                self.mjpeg_streams[camera_id] = broadcaster
+            else:
+                broadcaster.quality, broadcaster.max_fps = quality, max_fps
+            return broadcaster
+    
+    def get_live_frame(self, camera_id: str) -> Optional[np.ndarray]:
+        """Get a copy of the latest frame from a camera"""
+        with self.latest_frame(camera_id) as frame_ref:
+            return frame_ref.frame.copy() if frame_ref is not None else None
     
     def start_enrollment_session(self, employee_id: str, employee_name: str) -> str:
         """Start employee enrollment session across all cameras"""
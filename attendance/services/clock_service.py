@@ -0,0 +1,125 @@
+"""
+Clock-in and clock-out service operations for the terminals
+Each action reads indexed state and commits its writes as one database batch
+"""
+
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from ..models import AttendanceRecord, AuditLog, Employee, Shift
+from .database import db
+from .shift_manager import shift_manager
+
+def audit_entry(event_type: str, event_data: Dict[str, Any], user_id: str = '', terminal_id: str = '',
+                ip_address: str = '', user_agent: str = '') -> AuditLog:
+    """Attendance audit log entry"""
+    return AuditLog(
+        event_type=event_type,
+        event_description=f'{event_type} event',
+        event_category='attendance',
+        user_id=user_id,
+        terminal_id=terminal_id,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        event_data=event_data,
+        severity='info',
+        success=True
+    )
+
+class ClockService:
+    """Clock-in and clock-out as single operations
+
+    Lookups go through the employee_id and (employee_id, status) indexes, so
+    their cost does not grow with attendance history. The attendance record,
+    the employee's clock and hour statistics and the audit entry are written
+    with one db.batch(): with attendance_records, employees and audit_logs
+    stored as change logs that is a single fsync'd journal line instead of
+    three collection rewrites.
+    """
+
+    def clock_in(self, employee: Employee, terminal_id: str, auth_method: str, ip_address: str,
+                 user_agent: str = '', audit: bool = True) -> Tuple[AttendanceRecord, Optional[Shift]]:
+        """Create today's attendance record, returns (record, shift)
+
+        The caller checks the employee is active, allowed on the terminal and
+        not clocked in already.
+        """
+        today = date.today()
+        shift = shift_manager.get_employee_shift_for_date(employee.employee_id, today)
+
+        attendance = AttendanceRecord(
+            employee_id=employee.employee_id,
+            employee_name=employee.full_name,
+            date=today.isoformat(),
+            shift_id=shift.id if shift else '',
+            scheduled_start=shift.start_time if shift else '',
+            scheduled_end=shift.end_time if shift else '',
+            is_weekend=today.weekday() >= 5,
+            is_holiday=shift_manager.is_holiday(today)
+        )
+        attendance.clock_in(terminal_id, auth_method, ip_address)
+
+        # Calculate late status if shift exists
+        if shift:
+            late_status = shift_manager.calculate_late_early_status(attendance, shift)
+            attendance.is_late = late_status['is_late']
+
+        with db.batch() as batch:
+            batch.create('attendance_records', attendance)
+            batch.update('employees', employee.id, {'last_clock_in': attendance.clock_in_time})
+            if audit:
+                batch.create('audit_logs', audit_entry('clock_in', {
+                    'attendance_id': attendance.id,
+                    'terminal_id': terminal_id,
+                    'method': auth_method,
+                    'is_late': attendance.is_late
+                }, employee.employee_id, terminal_id, ip_address, user_agent))
+
+        employee.last_clock_in = attendance.clock_in_time
+        return attendance, shift
+
+    def clock_out(self, attendance: AttendanceRecord, terminal_id: str, auth_method: str, ip_address: str,
+                  user_agent: str = '', audit: bool = True,
+                  flag_early_departure: bool = True) -> AttendanceRecord:
+        """Close an active attendance record with its worked hours"""
+        shift = db.get_by_id('shifts', attendance.shift_id) if attendance.shift_id else None
+
+        attendance.clock_out(terminal_id, auth_method, ip_address)
+
+        # Calculate work hours
+        hours_data = shift_manager.calculate_work_hours(attendance, shift)
+        attendance.regular_hours = hours_data['regular_hours']
+        attendance.overtime_hours = hours_data['overtime_hours']
+        attendance.total_hours = hours_data['total_hours']
+
+        # Calculate early departure status
+        if shift and flag_early_departure:
+            early_status = shift_manager.calculate_late_early_status(attendance, shift)
+            attendance.is_early_departure = early_status['is_early_departure']
+
+        employee = db.get_employee_by_employee_id(attendance.employee_id)
+
+        with db.batch() as batch:
+            batch.update('attendance_records', attendance.id, attendance.to_dict())
+            if employee:
+                employee.last_clock_out = attendance.clock_out_time
+                employee.update_statistics(attendance.total_hours, attendance.overtime_hours)
+                batch.update('employees', employee.id, {
+                    'last_clock_out': employee.last_clock_out,
+                    'total_hours_worked': employee.total_hours_worked,
+                    'total_overtime_hours': employee.total_overtime_hours
+                })
+            if audit:
+                batch.create('audit_logs', audit_entry('clock_out', {
+                    'attendance_id': attendance.id,
+                    'terminal_id': terminal_id,
+                    'method': auth_method,
+                    'total_hours': attendance.total_hours,
+                    'overtime_hours': attendance.overtime_hours,
+                    'is_early_departure': attendance.is_early_departure
+                }, attendance.employee_id, terminal_id, ip_address, user_agent))
+
+        return attendance
+
+# Global instance for the application
+clock_service = ClockService()
@@ -0,0 +1,162 @@
+"""
+In-memory secondary indexes for JSON collections
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Any, Tuple
+
+
+class CollectionIndex:
+    """Hash and sorted secondary indexes over one collection's records
+
+    Hash indexes map a tuple of field values to the records holding them and
+    answer equality filters. Sorted indexes keep string fields (e.g. ISO dates)
+    ordered so range queries are bisect lookups. Records are keyed by their
+    'id' so they can be replaced or removed incrementally.
+    """
+
+    def __init__(self, hash_fields: List[Tuple[str, ...]], sorted_fields: List[str]):
+        self.hash_fields = [tuple(fields) for fields in hash_fields]
+        self.sorted_fields = list(sorted_fields)
+        self._hash: Dict[Tuple[str, ...], Dict[tuple, Dict[Any, Dict]]] = {
+            fields: {} for fields in self.hash_fields
+        }
+        self._sorted: Dict[str, Tuple[List[str], List[Dict]]] = {
+            field: ([], []) for field in self.sorted_fields
+        }
+
+    @staticmethod
+    def _record_key(record: Dict) -> Any:
+        """Identity of a record inside the index"""
+        return record.get('id') or id(record)
+
+    @staticmethod
+    def _hash_key(record: Dict, fields: Tuple[str, ...]) -> Optional[tuple]:
+        """Index key for record, or None when a field is missing or unhashable"""
+        try:
+            key = tuple(record[field] for field in fields)
+            hash(key)
+        except (KeyError, TypeError):
+            return None
+        return key
+
+    def build(self, records: List[Dict]):
+        """Index all records from scratch"""
+        for fields, buckets in self._hash.items():
+            for record in records:
+                key = self._hash_key(record, fields)
+                if key is not None:
+                    buckets.setdefault(key, {})[self._record_key(record)] = record
+
+        for field in self._sorted:
+            ordered = sorted(
+                (record for record in records if isinstance(record.get(field), str)),
+                key=lambda record: record[field]
+            )
+            self._sorted[field] = ([record[field] for record in ordered], ordered)
+
+    def add(self, record: Dict):
+        """Add a record to every index"""
+        record_key = self._record_key(record)
+        for fields, buckets in self._hash.items():
+            key = self._hash_key(record, fields)
+            if key is not None:
+                buckets.setdefault(key, {})[record_key] = record
+
+        for field in self._sorted:
+            self._add_sorted(field, record)
+
+    def remove(self, record: Dict):
+        """Remove a record from every index"""
+        record_key = self._record_key(record)
+        for fields, buckets in self._hash.items():
+            key = self._hash_key(record, fields)
+            bucket = buckets.get(key) if key is not None else None
+            if bucket is not None:
+                bucket.pop(record_key, None)
+                if not bucket:
+                    del buckets[key]
+
+        for field in self._sorted:
+            self._remove_sorted(field, record)
+
+    def replace(self, old: Optional[Dict], new: Optional[Dict]):
+        """Apply a single create (old=None), update or delete (new=None)"""
+        if old is not None and new is not None:
+            # Keep bucket order stable when the indexed values did not change
+            record_key = self._record_key(new)
+            for fields, buckets in self._hash.items():
+                old_key = self._hash_key(old, fields)
+                new_key = self._hash_key(new, fields)
+                if old_key == new_key and old_key is not None and record_key in buckets.get(old_key, {}):
+                    buckets[old_key][record_key] = new
+                    continue
+                if old_key is not None and old_key in buckets:
+                    buckets[old_key].pop(self._record_key(old), None)
+                    if not buckets[old_key]:
+                        del buckets[old_key]
+                if new_key is not None:
+                    buckets.setdefault(new_key, {})[record_key] = new
+
+            for field in self._sorted:
+                self._remove_sorted(field, old)
+                self._add_sorted(field, new)
+            return
+
+        if old is not None:
+            self.remove(old)
+        if new is not None:
+            self.add(new)
+
+    def _add_sorted(self, field: str, record: Dict):
+        """Insert a record into one sorted index"""
+        keys, records = self._sorted[field]
+        value = record.get(field)
+        if isinstance(value, str):
+            position = bisect_right(keys, value)
+            keys.insert(position, value)
+            records.insert(position, record)
+
+    def _remove_sorted(self, field: str, record: Dict):
+        """Remove a record from one sorted index"""
+        keys, records = self._sorted[field]
+        value = record.get(field)
+        if not isinstance(value, str):
+            return
+        record_key = self._record_key(record)
+        position = bisect_left(keys, value)
+        while position < len(keys) and keys[position] == value:
+            if self._record_key(records[position]) == record_key:
+                del keys[position]
+                del records[position]
+                return
+            position += 1
+
+    def lookup(self, filters: Dict[str, Any]) -> Optional[List[Dict]]:
+        """Candidate records for an equality filter, or None if no index applies
+
+        The widest hash index whose fields are all filtered on is used; callers
+        still apply the full filter to the candidates.
+        """
+        best = None
+        for fields in self.hash_fields:
+            if all(field in filters for field in fields):
+                if best is None or len(fields) > len(best):
+                    best = fields
+
+        if best is None:
+            return None
+
+        key = tuple(filters[field] for field in best)
+        try:
+            bucket = self._hash[best].get(key)
+        except TypeError:
+            return None
+        return list(bucket.values()) if bucket else []
+
+    def range(self, field: str, start: str, end: str) -> Optional[List[Dict]]:
+        """Records with start <= field <= end in field order, or None if not indexed"""
+        if field not in self._sorted:
+            return None
+        keys, records = self._sorted[field]
+        return records[bisect_left(keys, start):bisect_right(keys, end)]
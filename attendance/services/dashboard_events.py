@@ -0,0 +1,214 @@
+"""
+Server-pushed dashboard updates
+Attendance changes, camera recognitions and terminal heartbeats fanned out to every open dashboard
+"""
+
+import json
+import threading
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .database import db
+from .presence import presence_service
+
+logger = logging.getLogger(__name__)
+
+class DashboardEvents:
+    """Event log shared by every dashboard connection
+
+    Sources publish into a bounded in-memory log with increasing ids and
+    each connection waits on one condition for ids it has not sent yet, so
+    an event costs one append however many dashboards are open and an idle
+    dashboard costs nothing but its keepalive. A client reconnecting with
+    Last-Event-ID resumes where it left off; one that fell further behind
+    than the log reaches gets a 'resync' event and reloads its lists.
+
+    Events:
+        snapshot     roster counts and system status, first event of a connection
+        presence     an employee's attendance state, record or zone changed
+        resync       the roster was rebuilt or events were missed; reload
+        recognition  a camera recognized an employee
+        terminal     a terminal checked in or its status changed
+    """
+
+    def __init__(self, max_events: int = 500, keepalive: float = 15.0):
+        self.keepalive = keepalive
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=max_events)  # (id, type, data)
+        self._last_id = 0
+        self._subscribed = False
+        self.clients = 0
+
+    def init_app(self, app):
+        """Subscribe to the roster, terminal writes and camera recognitions"""
+        if self._subscribed:
+            return
+        from .live_camera_recognition import live_camera_service
+
+        presence_service.add_listener(self._on_presence_change)
+        db.add_write_callback('terminals', self._on_terminal_write)
+        live_camera_service.add_recognition_callback(self.publish_recognition)
+        self._subscribed = True
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, event_type: str, data: Dict) -> int:
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, event_type, data))
+            self._condition.notify_all()
+            return self._last_id
+
+    def _since(self, last_id: int) -> List[Tuple[int, str, Dict]]:
+        """Events after last_id, or a resync if some of them already left the log"""
+        if self._events and last_id < self._events[0][0] - 1:
+            return [(self._last_id, 'resync', {'reason': 'missed_events'})]
+        return [event for event in self._events if event[0] > last_id]
+
+    def wait(self, last_id: int, timeout: float) -> List[Tuple[int, str, Dict]]:
+        """Events after last_id, waiting up to timeout for one to arrive"""
+        with self._condition:
+            if self._last_id == last_id:
+                self._condition.wait(timeout)
+            events = self._since(last_id)
+        if not events:
+            # Quiet period: the cheap version check picks up a new day or
+            # changes from other processes, which publish a resync
+            presence_service.get_counts()
+        return events
+
+    # Sources
+
+    def _on_presence_change(self, change: Dict):
+        if change['type'] == 'rebuild':
+            self.publish('resync', {'reason': 'rebuild', 'counts': change['counts']})
+            return
+        employee = change['employee'] or {}
+        record = change['record'] or {}
+        self.publish('presence', {
+            'change': change['type'],
+            'employee': {
+                'employee_id': change['employee_id'],
+                'name': employee.get('name'),
+                'department': employee.get('department')
+            },
+            'action': _action(record, change['previous_states'], change['states']),
+            'states': change['states'],
+            'previous_states': change['previous_states'],
+            'clock_in_time': record.get('clock_in_time'),
+            'clock_out_time': record.get('clock_out_time'),
+            'is_late': bool(record.get('is_late')),
+            'ip_address': record.get('clock_out_ip') or record.get('clock_in_ip'),
+            'terminal': record.get('clock_in_terminal'),
+            'location': change['location']['zone_name'] if change['location'] else None,
+            'counts': change['counts']
+        })
+
+    def _on_terminal_write(self, collection: str, record_id: str, model):
+        if model is not None:
+            self.publish_terminal(model)
+
+    def publish_terminal(self, terminal):
+        """Terminal heartbeat or status change"""
+        self.publish('terminal', {
+            'terminal_id': terminal.terminal_id,
+            'name': terminal.name,
+            'is_online': terminal.is_online,
+            'is_active': terminal.is_active,
+            'last_heartbeat': terminal.last_heartbeat
+        })
+
+    def publish_recognition(self, event):
+        """Recognition from a live camera (RecognitionEvent) or a CCTV camera (DetectionResult)"""
+        if not event.employee_id:
+            return
+        timestamp = event.timestamp
+        if isinstance(timestamp, datetime):
+            timestamp = timestamp.timestamp()
+        self.publish('recognition', {
+            'camera_id': event.camera_id,
+            'employee_id': event.employee_id,
+            'employee_name': event.employee_name,
+            'confidence': round(float(event.confidence), 3),
+            'zone_id': getattr(event, 'zone_id', None),
+            'timestamp': timestamp
+        })
+
+    # Delivery
+
+    def _needs_snapshot(self, last_id: Optional[int]) -> bool:
+        # A new client, or one whose id is from before a server restart
+        return last_id is None or last_id > self._last_id
+
+    def snapshot(self) -> Dict:
+        return {
+            'counts': presence_service.get_counts(),
+            'status': system_status(),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def stream(self, last_id: Optional[int] = None) -> Iterator[str]:
+        """text/event-stream body for one dashboard"""
+        with self._condition:
+            self.clients += 1
+        try:
+            yield "retry: 5000\n\n"
+            if self._needs_snapshot(last_id):
+                last_id = self._last_id
+                yield _format(last_id, 'snapshot', self.snapshot())
+            while True:
+                events = self.wait(last_id, self.keepalive)
+                if not events:
+                    yield ': keepalive\n\n'  # Also how a closed connection is noticed
+                    continue
+                for event in events:
+                    yield _format(*event)
+                last_id = events[-1][0]
+        finally:
+            with self._condition:
+                self.clients -= 1
+
+    def poll(self, last_id: Optional[int], timeout: float) -> Dict:
+        """Long-poll fallback: events after last_id, waiting up to timeout"""
+        if self._needs_snapshot(last_id):
+            last_id = self._last_id
+            events = [(last_id, 'snapshot', self.snapshot())]
+        else:
+            events = self.wait(last_id, timeout)
+        return {
+            'events': [{'id': event_id, 'type': event_type, 'data': data}
+                       for event_id, event_type, data in events],
+            'last_id': events[-1][0] if events else last_id
+        }
+
+def _action(record: Dict, previous_states: List[str], states: List[str]) -> Optional[str]:
+    """What the employee just did, from the state change"""
+    if 'on_break' in states and 'on_break' not in previous_states:
+        return 'break_start'
+    if 'on_break' in previous_states and 'on_break' not in states and 'present' in states:
+        return 'break_end'
+    if 'present' in states and 'present' not in previous_states:
+        return 'clock_in'
+    if 'present' in previous_states and 'present' not in states and record.get('clock_out_time'):
+        return 'clock_out'
+    return None
+
+def _format(event_id: int, event_type: str, data: Dict) -> str:
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def system_status() -> Dict:
+    """Status shown on the dashboard; also returned by /api/system-status"""
+    return {
+        'status': 'healthy',
+        'database': 'connected',
+        'face_recognition': 'active',
+        'cameras': 'operational',
+        'timestamp': datetime.now().isoformat()
+    }
+
+# Global instance for the application
+dashboard_events = DashboardEvents()
@@ -2,27 +2,133 @@
 JSON-based database service for Time Attendance System
 """
 
+import gzip
 import json
 import os
+import re
 import shutil
 from datetime import datetime, timedelta
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Type
-from threading import Lock
+from typing import Dict, List, Optional, Any, Type, Callable
+from threading import Lock, RLock
 import uuid
 import logging
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 from ..models.base import BaseModel
 from ..models import (
     Employee, AttendanceRecord, Shift, ShiftAssignment, 
     Terminal, Admin, SystemConfig, AuditLog, Camera, LeaveRequest
 )
 from ..models.employee_terminal_assignment import EmployeeTerminalAssignment
+from .collection_index import CollectionIndex
+
+
+def _clone_json(value: Any) -> Any:
+    """Copy JSON-shaped data (dicts/lists of scalars) without deepcopy overhead"""
+    if isinstance(value, dict):
+        return {key: _clone_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone_json(item) for item in value]
+    return value
+
+
+class _FileLock:
+    """Reentrant lock shared by threads and processes through an OS lock on a file"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = RLock()
+        self._depth = 0
+        self._file = None
+    
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, 'a+b')
+                if fcntl:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._file.seek(0)
+                    while True:
+                        try:
+                            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                            break
+                        except OSError:
+                            continue  # LK_LOCK gives up after 10 seconds
+            except BaseException:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                if fcntl:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+                else:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                self._file.close()
+                self._file = None
+        self._lock.release()
+
+
+class WriteBatch:
+    """Creates and updates collected by DatabaseService.batch() and committed together"""
+    
+    def __init__(self):
+        self.writes: List[tuple] = []
+    
+    def create(self, collection: str, model: BaseModel) -> BaseModel:
+        self.writes.append(('create', collection, model))
+        return model
+    
+    def update(self, collection: str, record_id: str, updates: Dict[str, Any]):
+        self.writes.append(('update', collection, record_id, updates))
+
 
 class DatabaseService:
     """JSON-based database service with backup support"""
     
-    def __init__(self, data_dir: str = 'attendance_data'):
+    LOG_SUFFIX = '.log.jsonl'
+    BATCH_JOURNAL = 'batches.journal.jsonl'
+    WRITE_LOCK = '.write.lock'
+    PARTITION_FIELD = 'date'
+    UNDATED_PARTITION = '_undated'
+    PARTITION_SUMMARY_LIMIT = 16  # Distinct values of an indexed field kept per partition in the manifest
+    
+    # Secondary indexes maintained over resident collections
+    HASH_INDEXES = {
+        'attendance_records': [('employee_id',), ('employee_id', 'status'), ('date',), ('status',)],
+        'employees': [('employee_id',), ('pin',)],
+        'employee_terminal_assignments': [('employee_id',), ('terminal_id',)],
+        'shift_assignments': [('employee_id',)],
+    }
+    SORTED_INDEXES = {
+        'attendance_records': ['date'],
+    }
+    
+    # Serializes batch commits against journal checkpoints, across instances.
+    # Lock order: _batch_lock, then _write_lock, then _lock.
+    _batch_lock = RLock()
+    
+    def __init__(self, data_dir: str = 'attendance_data', cache_enabled: bool = True,
+                 log_collections: List[str] = None, log_fsync: bool = True,
+                 partitioned_collections: List[str] = None):
         self.data_dir = Path(data_dir)
         self.backup_dir = self.data_dir / 'backups'
         self.daily_backup_dir = self.backup_dir / 'daily'
@@ -31,6 +137,33 @@ class DatabaseService:
         # Thread safety
         self._lock = Lock()
         
+        # Held, across processes, while change logs or the batch journal are
+        # appended to, compacted or truncated
+        self._write_lock = _FileLock(self.data_dir / self.WRITE_LOCK)
+        
+        # Write callbacks per collection
+        self._write_callbacks: Dict[str, List[Callable]] = {}
+        
+        # Resident collection cache: collection -> (file signature, parsed records).
+        # Entries are refreshed whenever the file's mtime/size changes on disk and
+        # written through by _save_collection, so reads skip JSON parsing entirely.
+        self.cache_enabled = cache_enabled
+        self._cache: Dict[str, tuple] = {}
+        self._versions: Dict[str, int] = {}
+        self._disk_signatures: Dict[str, Optional[tuple]] = {}
+        
+        # Append-only change log storage: collection -> resident replay state
+        self.log_fsync = log_fsync
+        self._log_state: Dict[str, Dict[str, Any]] = {}
+        
+        # Date-partitioned storage: collection -> manifest and loaded partitions
+        self._partition_state: Dict[str, Dict[str, Any]] = {}
+        
+        # Secondary indexes, only used while a collection is resident in memory
+        self.hash_indexes = {name: list(fields) for name, fields in self.HASH_INDEXES.items()}
+        self.sorted_indexes = {name: list(fields) for name, fields in self.SORTED_INDEXES.items()}
+        self._indexes: Dict[str, CollectionIndex] = {}
+        
         # Logger setup
         self.logger = logging.getLogger(__name__)
         
@@ -54,6 +187,24 @@ class DatabaseService:
         
         self._init_directories()
         self._init_default_data()
+        
+        # Collections stored as snapshot + change log. A collection that already
+        # has a log on disk is always treated as logged so its tail is never lost.
+        self.log_collections = set(log_collections or [])
+        for collection in self.models.keys():
+            if self._get_log_path(collection).exists():
+                self.log_collections.add(collection)
+        
+        # Collections stored as monthly partition files. Partitioning takes
+        # precedence over the change log; any log tail is folded in on migration.
+        self.partitioned_collections = set(partitioned_collections or [])
+        for collection in self.models.keys():
+            if self._get_manifest_path(collection).exists():
+                self.partitioned_collections.add(collection)
+        self.log_collections -= self.partitioned_collections
+        
+        # Re-apply batches a crash cut short between journal and collection logs
+        self._recover_batches()
     
     def _init_directories(self):
         """Initialize data directories"""
@@ -74,17 +225,61 @@ class DatabaseService:
         """Get file path for collection"""
         return self.data_dir / f"{collection}.json"
     
+    def _file_signature(self, file_path: Path) -> Optional[tuple]:
+        """Get (mtime, size) signature used to detect external file changes"""
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
     def _load_collection(self, collection: str) -> List[Dict]:
-        """Load collection from JSON file"""
+        """Load collection from JSON file
+        
+        With the cache enabled the returned list is shared and must be treated
+        as read-only; writers copy it before modifying.
+        """
+        if collection in self.log_collections:
+            return self._load_logged_view(collection)
+        if collection in self.partitioned_collections:
+            return self._load_partitioned_view(collection)
+        
         file_path = self._get_file_path(collection)
+        
+        if self.cache_enabled:
+            signature = self._file_signature(file_path)
+            cached = self._cache.get(collection)
+            if cached and signature is not None and cached[0] == signature:
+                return cached[1]
+        
         try:
             with open(file_path, 'r') as f:
-                return json.load(f)
+                data = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
             return []
+        
+        if self.cache_enabled and signature is not None:
+            with self._lock:
+                self._cache[collection] = (signature, data)
+                self._indexes.pop(collection, None)
+                self._versions[collection] = self._versions.get(collection, 0) + 1
+        
+        return data
     
-    def _save_collection(self, collection: str, data: List[Dict]):
-        """Save collection to JSON file"""
+    def _save_collection(self, collection: str, data: List[Dict],
+                         changes: List[tuple] = None, base: List[Dict] = None):
+        """Save collection to JSON file
+        
+        changes lists the (old, new) record pairs that turn base into data so
+        indexes can be updated in place instead of being rebuilt.
+        """
+        if collection in self.log_collections:
+            self._rewrite_logged_collection(collection, data)
+            return
+        if collection in self.partitioned_collections:
+            self._rewrite_partitioned_collection(collection, data)
+            return
+        
         file_path = self._get_file_path(collection)
         with self._lock:
             # Create backup before saving
@@ -93,8 +288,915 @@ class DatabaseService:
                 shutil.copy2(file_path, backup_path)
             
             # Save new data
-            with open(file_path, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
+            try:
+                with open(file_path, 'w') as f:
+                    json.dump(data, f, indent=2, default=str)
+            except Exception:
+                self._cache.pop(collection, None)
+                self._indexes.pop(collection, None)
+                raise
+            
+            # Keep indexes in step when data was derived from the resident copy
+            index = self._indexes.get(collection)
+            cached = self._cache.get(collection)
+            if index is not None:
+                if changes is not None and base is not None and cached and cached[1] is base:
+                    for old, new in changes:
+                        index.replace(old, new)
+                else:
+                    self._indexes.pop(collection, None)
+            
+            # Write through to the resident cache
+            if self.cache_enabled:
+                signature = self._file_signature(file_path)
+                if signature is not None:
+                    self._cache[collection] = (signature, data)
+                else:
+                    self._cache.pop(collection, None)
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+    
+    def _hydrate(self, collection: str, model_class: Type[BaseModel], record: Dict) -> BaseModel:
+        """Build a model from a stored record without sharing cached containers"""
+        if self.cache_enabled or collection in self.log_collections or collection in self.partitioned_collections:
+            record = _clone_json(record)
+        return model_class.from_dict(record)
+    
+    def get_collection_version(self, collection: str) -> int:
+        """Get a counter that changes whenever the collection is written or reloaded
+        
+        Changes made on disk by other service instances or processes are picked
+        up first, so callers can use the version to invalidate derived caches.
+        """
+        if collection in self.log_collections:
+            self._get_log_state(collection)
+        elif collection in self.partitioned_collections:
+            self._get_partition_state(collection)
+        elif self.cache_enabled:
+            self._load_collection(collection)
+        else:
+            signature = self._file_signature(self._get_file_path(collection))
+            with self._lock:
+                if self._disk_signatures.get(collection) != signature:
+                    self._disk_signatures[collection] = signature
+                    self._versions[collection] = self._versions.get(collection, 0) + 1
+        return self._versions.get(collection, 0)
+    
+    def add_write_callback(self, collection: str, callback: Callable[[str, str, Optional[BaseModel]], None]):
+        """Add callback(collection, record_id, model) run after every create, update
+        and delete in collection; model is None for deletes"""
+        self._write_callbacks.setdefault(collection, []).append(callback)
+    
+    def _notify_write(self, collection: str, record_id: str, model: Optional[BaseModel]):
+        """Run the write callbacks registered for collection"""
+        for callback in self._write_callbacks.get(collection, []):
+            try:
+                callback(collection, record_id, model)
+            except Exception as e:
+                self.logger.error(f"Error in write callback for {collection}: {e}")
+    
+    def invalidate_cache(self, collection: str = None):
+        """Drop cached collections so the next read goes to disk"""
+        with self._lock:
+            if collection:
+                self._cache.pop(collection, None)
+                self._log_state.pop(collection, None)
+                self._partition_state.pop(collection, None)
+                self._indexes.pop(collection, None)
+            else:
+                self._cache.clear()
+                self._log_state.clear()
+                self._partition_state.clear()
+                self._indexes.clear()
+    
+    # Append-only change log storage
+    def _get_log_path(self, collection: str) -> Path:
+        """Get change log path for collection"""
+        return self.data_dir / f"{collection}{self.LOG_SUFFIX}"
+    
+    def _replay_log(self, log_path: Path, records: Dict[str, Dict], offset: int) -> tuple:
+        """Apply change log entries from offset onwards, returns (new offset, entries applied)"""
+        applied = 0
+        try:
+            with open(log_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Torn or in-progress write; pick it up on the next read
+                        break
+                    offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        self.logger.warning(f"Skipping corrupt change log entry in {log_path}")
+                        continue
+                    
+                    if entry.get('op') == 'put':
+                        records[entry['id']] = entry['record']
+                    elif entry.get('op') == 'delete':
+                        records.pop(entry['id'], None)
+                    applied += 1
+        except FileNotFoundError:
+            pass
+        return offset, applied
+    
+    def _get_log_state(self, collection: str) -> Dict[str, Any]:
+        """Get resident state for a logged collection, replaying snapshot plus log tail"""
+        file_path = self._get_file_path(collection)
+        log_path = self._get_log_path(collection)
+        snapshot_signature = self._file_signature(file_path)
+        log_signature = self._file_signature(log_path)
+        log_size = log_signature[1] if log_signature else 0
+        
+        with self._lock:
+            state = self._log_state.get(collection)
+            
+            if state is None or state['snapshot'] != snapshot_signature or log_size < state['offset']:
+                # Snapshot replaced (compaction/restore) or first access: full replay
+                try:
+                    with open(file_path, 'r') as f:
+                        snapshot = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    snapshot = []
+                
+                records = {}
+                for record in snapshot:
+                    records[record.get('id') or str(uuid.uuid4())] = record
+                
+                offset, applied = self._replay_log(log_path, records, 0)
+                state = {
+                    'snapshot': snapshot_signature,
+                    'records': records,
+                    'offset': offset,
+                    'entries': applied,
+                    'view': None
+                }
+                self._log_state[collection] = state
+                self._indexes.pop(collection, None)
+                self._versions[collection] = self._versions.get(collection, 0) + 1
+            elif log_size > state['offset']:
+                # Another writer appended to the log: replay just the tail
+                state['offset'], applied = self._replay_log(log_path, state['records'], state['offset'])
+                if applied:
+                    state['entries'] += applied
+                    state['view'] = None
+                    self._indexes.pop(collection, None)
+                    self._versions[collection] = self._versions.get(collection, 0) + 1
+            
+            return state
+    
+    def _load_logged_view(self, collection: str) -> List[Dict]:
+        """Get the current records of a logged collection as a shared read-only list"""
+        state = self._get_log_state(collection)
+        view = state['view']
+        if view is None:
+            with self._lock:
+                view = state['view'] = list(state['records'].values())
+        return view
+    
+    def _append_changes(self, collection: str, entries: List[Dict[str, Any]], fsync: bool = None):
+        """Durably append change entries to the collection log and apply them in memory
+        
+        fsync=False leaves durability to the caller (a batch already made the
+        entries durable in the batch journal).
+        """
+        payload = b''.join(
+            json.dumps(entry, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+            for entry in entries
+        )
+        log_path = self._get_log_path(collection)
+        
+        with self._write_lock:
+            # Picks up a compaction by another process before appending
+            state = self._get_log_state(collection)
+            with self._lock:
+                with open(log_path, 'ab') as f:
+                    start = f.tell()
+                    f.write(payload)
+                    f.flush()
+                    if self.log_fsync if fsync is None else fsync:
+                        os.fsync(f.fileno())
+                
+                # Only advance past bytes we know about; otherwise the next read
+                # replays the unseen tail (entries are idempotent puts/deletes)
+                if start == state['offset']:
+                    state['offset'] = start + len(payload)
+                
+                index = self._indexes.get(collection)
+                for entry in entries:
+                    if entry['op'] == 'put':
+                        old = state['records'].get(entry['id'])
+                        state['records'][entry['id']] = new = entry['record']
+                    else:
+                        old = state['records'].pop(entry['id'], None)
+                        new = None
+                    if index is not None:
+                        index.replace(old, new)
+                state['entries'] += len(entries)
+                state['view'] = None
+                self._versions[collection] = self._versions.get(collection, 0) + 1
+    
+    def _write_temp_snapshot(self, file_path: Path, data: List[Dict]) -> Path:
+        """Write a snapshot next to file_path, ready to be swapped in with os.replace"""
+        temp_path = file_path.with_suffix('.json.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        return temp_path
+    
+    def _rewrite_logged_collection(self, collection: str, data: List[Dict]):
+        """Replace a logged collection wholesale with a new snapshot and an empty log"""
+        self._checkpoint_batches()
+        file_path = self._get_file_path(collection)
+        with self._write_lock, self._lock:
+            os.replace(self._write_temp_snapshot(file_path, data), file_path)
+            with open(self._get_log_path(collection), 'wb'):
+                pass
+            self._log_state.pop(collection, None)
+            self._indexes.pop(collection, None)
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+    
+    def compact_collection(self, collection: str) -> bool:
+        """Fold a collection's change log into its snapshot
+        
+        The snapshot is serialized outside the lock so writers are only blocked
+        while the files are swapped; entries appended meanwhile, by this or any
+        other process, are carried over into the new log.
+        """
+        if collection not in self.log_collections:
+            return False
+        
+        # Journaled batches must not outlive the log entries they are checked against
+        self._checkpoint_batches()
+        state = self._get_log_state(collection)
+        with self._lock:
+            records = list(state['records'].values())
+            offset = state['offset']
+            entries = state['entries']
+        
+        file_path = self._get_file_path(collection)
+        log_path = self._get_log_path(collection)
+        temp_path = self._write_temp_snapshot(file_path, records)
+        
+        with self._write_lock, self._lock:
+            if self._log_state.get(collection) is not state or \
+                    self._file_signature(file_path) != state['snapshot']:
+                # Collection was reloaded, rewritten or compacted elsewhere meanwhile; try again later
+                temp_path.unlink(missing_ok=True)
+                return False
+            
+            try:
+                with open(log_path, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+            except FileNotFoundError:
+                tail = b''
+            
+            # Snapshot first, then log: a crash in between only replays
+            # already-folded idempotent entries on top of the new snapshot
+            os.replace(temp_path, file_path)
+            log_temp_path = log_path.with_suffix('.tmp')
+            with open(log_temp_path, 'wb') as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(log_temp_path, log_path)
+            
+            # Tail entries this instance has not replayed yet stay unread
+            state['snapshot'] = self._file_signature(file_path)
+            state['offset'] -= offset
+            state['entries'] = max(state['entries'] - entries, 0)
+        
+        self.logger.info(f"Compacted {collection}: {len(records)} records, {entries} log entries folded")
+        return True
+    
+    def compact_logs(self, min_entries: int = 0):
+        """Compact every logged collection whose log holds at least min_entries entries"""
+        self._checkpoint_batches()
+        for collection in sorted(self.log_collections):
+            try:
+                state = self._get_log_state(collection)
+                if state['entries'] >= max(min_entries, 1):
+                    self.compact_collection(collection)
+            except Exception as e:
+                self.logger.error(f"Error compacting {collection}: {e}", exc_info=True)
+    
+    # Batched writes
+    def _get_journal_path(self) -> Path:
+        return self.data_dir / self.BATCH_JOURNAL
+    
+    def _recover_batches(self):
+        """Append journaled batch entries missing from their collection logs
+        
+        Runs before any collection is loaded. Each logged entry carries its
+        batch id, so a batch is only re-applied to logs that lack it and a
+        later update or delete of the same record is never overwritten.
+        """
+        journal_path = self._get_journal_path()
+        if not journal_path.exists():
+            return
+        with self._batch_lock, self._write_lock:
+            try:
+                with open(journal_path, 'rb') as f:
+                    lines = f.readlines()
+            except FileNotFoundError:
+                return
+            
+            logs: Dict[str, bytes] = {}
+            recovered = 0
+            for line in lines:
+                if not line.endswith(b'\n'):
+                    break  # Torn write: the batch never committed
+                try:
+                    batch = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                marker = f'"batch":"{batch["batch"]}"'.encode('utf-8')
+                for collection, entries in batch['collections'].items():
+                    log_path = self._get_log_path(collection)
+                    if collection not in logs:
+                        try:
+                            logs[collection] = log_path.read_bytes()
+                        except FileNotFoundError:
+                            logs[collection] = b''
+                    if marker in logs[collection]:
+                        continue
+                    payload = b''.join(
+                        json.dumps(entry, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+                        for entry in entries
+                    )
+                    with open(log_path, 'ab') as f:
+                        f.write(payload)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    logs[collection] += payload
+                    recovered += 1
+            
+            if recovered:
+                self.logger.warning(f"Recovered {recovered} interrupted batch writes from {journal_path.name}")
+            self._checkpoint_batches()
+    
+    def _checkpoint_batches(self):
+        """Make batched log appends durable and empty the journal"""
+        journal_path = self._get_journal_path()
+        with self._batch_lock, self._write_lock:
+            signature = self._file_signature(journal_path)
+            if not signature or not signature[1]:
+                return
+            for collection in self.models:
+                log_path = self._get_log_path(collection)
+                if log_path.exists():
+                    with open(log_path, 'ab') as f:
+                        os.fsync(f.fileno())
+            with open(journal_path, 'wb') as f:
+                f.flush()
+                os.fsync(f.fileno())
+    
+    @contextmanager
+    def batch(self):
+        """Collect creates and updates and commit them together on exit
+        
+            with db.batch() as batch:
+                batch.create('attendance_records', record)
+                batch.update('employees', employee.id, {'last_clock_in': ...})
+        
+        Nothing is written if the block raises.
+        """
+        write_batch = WriteBatch()
+        yield write_batch
+        self.commit_batch(write_batch)
+    
+    def commit_batch(self, write_batch: WriteBatch) -> List[BaseModel]:
+        """Commit a batch, returns the created/updated models in order
+        
+        Every record is validated before anything is written. Writes to
+        logged collections are committed with a single fsync'd line in the
+        batch journal, then appended to each collection log without another
+        fsync; the journal is replayed on startup and emptied whenever the
+        logs are compacted, so the batch survives a crash as a whole. Writes
+        to single-file or partitioned collections are applied directly, one
+        rewrite per collection.
+        """
+        with self._batch_lock:
+            # Resolve every write to its (old, new) record first
+            pending: Dict[tuple, Dict] = {}
+            changes: Dict[str, List[tuple]] = {}
+            models = []
+            for write in write_batch.writes:
+                collection = write[1]
+                model_class = self.models.get(collection)
+                if write[0] == 'create':
+                    model = write[2]
+                    if not model.validate():
+                        raise ValueError("Model validation failed")
+                    if not model.id or (collection, model.id) in pending or \
+                            self._id_in_use(collection, model.to_dict()):
+                        model.id = str(uuid.uuid4())
+                    old = None
+                else:
+                    _, _, record_id, updates = write
+                    old = pending.get((collection, record_id)) or self._find_record(collection, record_id)
+                    if old is None or model_class is None:
+                        raise KeyError(f"{collection} record {record_id} not found")
+                    record = _clone_json(old)
+                    record.update(updates)
+                    record['updated_at'] = datetime.now().isoformat()
+                    model = model_class.from_dict(record)
+                    if not model.validate():
+                        raise ValueError("Updated model validation failed")
+                new = _clone_json(model.to_dict())
+                pending[(collection, model.id)] = new
+                changes.setdefault(collection, []).append((old, new))
+                models.append((collection, model))
+            
+            logged = {collection: collection_changes for collection, collection_changes in changes.items()
+                      if collection in self.log_collections}
+            if logged:
+                batch_id = uuid.uuid4().hex
+                entries = {
+                    collection: [{'op': 'put', 'id': new['id'], 'record': new, 'batch': batch_id}
+                                 for _, new in collection_changes]
+                    for collection, collection_changes in logged.items()
+                }
+                line = json.dumps({'batch': batch_id, 'collections': entries},
+                                  separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+                # A checkpoint in another process must not empty the journal
+                # before the batch has reached every log
+                with self._write_lock:
+                    with open(self._get_journal_path(), 'ab') as f:
+                        f.write(line)
+                        f.flush()
+                        if self.log_fsync:
+                            os.fsync(f.fileno())
+                    for collection, collection_entries in entries.items():
+                        self._append_changes(collection, collection_entries, fsync=False)
+            
+            for collection, collection_changes in changes.items():
+                if collection in logged:
+                    continue
+                if collection in self.partitioned_collections:
+                    self._write_partitions(collection, collection_changes)
+                    continue
+                base = self._load_collection(collection)
+                data = list(base)
+                positions = {record.get('id'): i for i, record in enumerate(data)}
+                for old, new in collection_changes:
+                    if old is not None and new['id'] in positions:
+                        data[positions[new['id']]] = new
+                    else:
+                        positions[new['id']] = len(data)
+                        data.append(new)
+                self._save_collection(collection, data, changes=collection_changes, base=base)
+        
+        for collection, model in models:
+            self._notify_write(collection, model.id, model)
+        return [model for _, model in models]
+    
+    def _find_record(self, collection: str, record_id: str) -> Optional[Dict]:
+        """Stored record by id, without hydrating a model"""
+        if collection in self.log_collections:
+            return self._get_log_state(collection)['records'].get(record_id)
+        if collection in self.partitioned_collections:
+            key = self._find_partition_of(collection, record_id)
+            return self._partition_state[collection]['partitions'][key].get(record_id) if key else None
+        for record in self._load_collection(collection):
+            if record.get('id') == record_id:
+                return record
+        return None
+    
+    def _id_in_use(self, collection: str, record: Dict) -> bool:
+        """Whether the id of a record about to be created is already taken
+        
+        A partitioned record is only checked against the partition its date
+        routes it to: ids are uuid4s, and searching every other partition
+        would load (and gunzip) the whole collection on each create.
+        """
+        if collection in self.partitioned_collections:
+            key = self._partition_key(record)
+            state = self._load_partitions(collection, [key])
+            return record.get('id') in state['partitions'].get(key, {})
+        return self._find_record(collection, record.get('id')) is not None
+    
+    # Date-partitioned storage
+    def _get_partition_dir(self, collection: str) -> Path:
+        """Get directory holding a collection's monthly partitions"""
+        return self.data_dir / collection
+    
+    def _get_manifest_path(self, collection: str) -> Path:
+        """Get partition manifest path for collection"""
+        return self._get_partition_dir(collection) / 'manifest.json'
+    
+    def _partition_key(self, record: Dict) -> str:
+        """Partition ('YYYY-MM') a record belongs to, by its date field"""
+        value = record.get(self.PARTITION_FIELD)
+        if isinstance(value, str) and re.match(r'\d{4}-\d{2}', value):
+            return value[:7]
+        return self.UNDATED_PARTITION
+    
+    def _partition_path(self, collection: str, key: str, archived: bool = False) -> Path:
+        """Get file path of one partition"""
+        suffix = '.json.gz' if archived else '.json'
+        return self._get_partition_dir(collection) / f"{key}{suffix}"
+    
+    def _partition_summary(self, collection: str, records: List[Dict]) -> Dict[str, List]:
+        """Distinct values of the low-cardinality indexed fields of a partition
+        
+        Kept in the manifest so lookups can skip partitions (archived ones in
+        particular) that cannot hold a match without reading them.
+        """
+        fields = sorted({field for fields in self.hash_indexes.get(collection, []) for field in fields})
+        summary = {}
+        for field in fields:
+            values = set()
+            for record in records:
+                if field not in record:
+                    continue
+                value = record[field]
+                if value is not None and not isinstance(value, (str, int, float, bool)):
+                    break
+                values.add(value)
+                if len(values) > self.PARTITION_SUMMARY_LIMIT:
+                    break
+            else:
+                summary[field] = sorted(values, key=repr)
+        return summary
+    
+    def _partition_may_match(self, info: Dict[str, Any], filters: Dict[str, Any]) -> bool:
+        """False when a partition's manifest summary rules out any match for filters"""
+        summary = info.get('values', {})
+        return all(field not in summary or value in summary[field] for field, value in filters.items())
+    
+    def _read_partition(self, path: Path) -> List[Dict]:
+        """Read a (possibly gzip-archived) partition file"""
+        try:
+            opener = gzip.open if path.suffix == '.gz' else open
+            with opener(path, 'rt') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+    
+    def _write_atomic(self, path: Path, data: Any, compress: bool = False, indent: int = 2):
+        """Write JSON to path via a temporary file and rename"""
+        temp_path = path.with_name(path.name + '.tmp')
+        opener = gzip.open if compress else open
+        with opener(temp_path, 'wt') as f:
+            json.dump(data, f, indent=indent, default=str)
+        os.replace(temp_path, path)
+    
+    def _read_flat_collection(self, collection: str) -> List[Dict]:
+        """Read a single-file collection including any change-log tail"""
+        try:
+            with open(self._get_file_path(collection), 'r') as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            snapshot = []
+        
+        log_path = self._get_log_path(collection)
+        if not log_path.exists():
+            return snapshot
+        
+        records = {record.get('id') or str(uuid.uuid4()): record for record in snapshot}
+        self._replay_log(log_path, records, 0)
+        return list(records.values())
+    
+    def _migrate_to_partitions(self, collection: str):
+        """Split an existing single-file collection into monthly partitions"""
+        records = self._read_flat_collection(collection)
+        partitions: Dict[str, List[Dict]] = {}
+        for record in records:
+            partitions.setdefault(self._partition_key(record), []).append(record)
+        
+        partition_dir = self._get_partition_dir(collection)
+        partition_dir.mkdir(parents=True, exist_ok=True)
+        manifest = {'field': self.PARTITION_FIELD, 'version': 0, 'partitions': {}}
+        for key, partition in partitions.items():
+            self._write_atomic(self._partition_path(collection, key), partition)
+            manifest['partitions'][key] = {'records': len(partition), 'archived': False,
+                                           'values': self._partition_summary(collection, partition)}
+        self._write_atomic(self._get_manifest_path(collection), manifest)
+        
+        # The flat file stays as an empty placeholder; the log has been folded in
+        self._write_atomic(self._get_file_path(collection), [])
+        self._get_log_path(collection).unlink(missing_ok=True)
+        self.logger.info(f"Partitioned {collection}: {len(records)} records into {len(partitions)} partitions")
+    
+    def _get_partition_state(self, collection: str) -> Dict[str, Any]:
+        """Get the manifest and loaded partitions, reloading if another writer changed them"""
+        manifest_path = self._get_manifest_path(collection)
+        if not manifest_path.exists():
+            with self._lock:
+                if not manifest_path.exists():
+                    self._migrate_to_partitions(collection)
+        
+        signature = self._file_signature(manifest_path)
+        state = self._partition_state.get(collection)
+        if state is not None and state['signature'] == signature:
+            return state
+        
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            manifest = {'field': self.PARTITION_FIELD, 'version': 0, 'partitions': {}}
+        
+        with self._lock:
+            state = {'signature': signature, 'manifest': manifest, 'partitions': {}, 'indexes': {}, 'view': None}
+            self._partition_state[collection] = state
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+        return state
+    
+    def _load_partitions(self, collection: str, keys: List[str]) -> Dict[str, Any]:
+        """Make sure the given partitions are resident, returns the partition state"""
+        state = self._get_partition_state(collection)
+        for key in keys:
+            if key in state['partitions']:
+                continue
+            info = state['manifest']['partitions'].get(key)
+            if info is None:
+                continue
+            records = self._read_partition(self._partition_path(collection, key, info.get('archived', False)))
+            with self._lock:
+                if key not in state['partitions']:
+                    state['partitions'][key] = {
+                        record.get('id') or str(uuid.uuid4()): record for record in records
+                    }
+        return state
+    
+    def _partition_keys_for_range(self, state: Dict[str, Any], start: str, end: str) -> List[str]:
+        """Partitions that can hold dates in [start, end] (undated is always checked)"""
+        return [
+            key for key in sorted(state['manifest']['partitions'])
+            if key == self.UNDATED_PARTITION or start[:7] <= key <= end[:7]
+        ]
+    
+    def _partition_index(self, collection: str, state: Dict[str, Any], key: str) -> Optional[CollectionIndex]:
+        """Indexes over one resident partition, building them on first use
+        
+        Partitioned collections are indexed partition by partition, so using
+        an index never loads partitions a query does not need.
+        """
+        if collection not in self.hash_indexes and collection not in self.sorted_indexes:
+            return None
+        with self._lock:
+            if key not in state['partitions']:
+                return None
+            index = state['indexes'].get(key)
+            if index is None:
+                index = CollectionIndex(self.hash_indexes.get(collection, []),
+                                        self.sorted_indexes.get(collection, []))
+                index.build(list(state['partitions'][key].values()))
+                state['indexes'][key] = index
+        return index
+    
+    def _load_partitioned_view(self, collection: str) -> List[Dict]:
+        """All records of a partitioned collection, partitions in date order"""
+        state = self._get_partition_state(collection)
+        view = state['view']
+        if view is None:
+            keys = sorted(state['manifest']['partitions'])
+            state = self._load_partitions(collection, keys)
+            with self._lock:
+                view = []
+                for key in keys:
+                    view.extend(state['partitions'].get(key, {}).values())
+                state['view'] = view
+        return view
+    
+    def _find_partition_of(self, collection: str, record_id: str) -> Optional[str]:
+        """Find which partition holds record_id, loading partitions newest first"""
+        state = self._get_partition_state(collection)
+        for key in sorted(state['partitions'], reverse=True):
+            if record_id in state['partitions'][key]:
+                return key
+        for key in sorted(state['manifest']['partitions'], reverse=True):
+            if key not in state['partitions']:
+                state = self._load_partitions(collection, [key])
+                if record_id in state['partitions'].get(key, {}):
+                    return key
+        return None
+    
+    def _write_partitions(self, collection: str, changes: List[tuple]):
+        """Apply (old, new) record changes and rewrite only the touched partitions"""
+        touched = set()
+        for old, new in changes:
+            if old is not None:
+                touched.add(self._partition_key(old))
+            if new is not None:
+                touched.add(self._partition_key(new))
+        state = self._load_partitions(collection, sorted(touched))
+        
+        with self._lock:
+            manifest = state['manifest']
+            indexes = state['indexes']
+            for old, new in changes:
+                old_key = self._partition_key(old) if old is not None else None
+                new_key = self._partition_key(new) if new is not None else None
+                if old is not None:
+                    state['partitions'].get(old_key, {}).pop(old.get('id'), None)
+                if new is not None:
+                    state['partitions'].setdefault(new_key, {})[new['id']] = new
+                if old_key == new_key:
+                    if new_key in indexes:
+                        indexes[new_key].replace(old, new)
+                else:
+                    if old_key in indexes:
+                        indexes[old_key].remove(old)
+                    if new_key in indexes:
+                        indexes[new_key].add(new)
+            
+            for key in touched:
+                records = list(state['partitions'].get(key, {}).values())
+                info = manifest['partitions'].setdefault(key, {'records': 0, 'archived': False})
+                archived = info.get('archived', False)
+                self._write_atomic(self._partition_path(collection, key, archived), records, compress=archived)
+                info['records'] = len(records)
+                info['values'] = self._partition_summary(collection, records)
+            
+            # Rewriting the manifest on every write lets other processes notice the change
+            manifest['version'] = manifest.get('version', 0) + 1
+            manifest_path = self._get_manifest_path(collection)
+            self._write_atomic(manifest_path, manifest)
+            state['signature'] = self._file_signature(manifest_path)
+            state['view'] = None
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+    
+    def _rewrite_partitioned_collection(self, collection: str, data: List[Dict]):
+        """Replace a partitioned collection wholesale"""
+        with self._lock:
+            partition_dir = self._get_partition_dir(collection)
+            if partition_dir.exists():
+                shutil.rmtree(partition_dir)
+            self._write_atomic(self._get_file_path(collection), data)
+            self._get_log_path(collection).unlink(missing_ok=True)
+            self._migrate_to_partitions(collection)
+            self._partition_state.pop(collection, None)
+            self._versions[collection] = self._versions.get(collection, 0) + 1
+    
+    def archive_partitions(self, collection: str, keep_months: int = 12) -> List[str]:
+        """Gzip partitions older than keep_months; returns the archived partition keys
+        
+        Archived partitions stay queryable; they are simply read through gzip.
+        """
+        if collection not in self.partitioned_collections:
+            return []
+        
+        today = datetime.now().date()
+        month_index = today.year * 12 + today.month - 1 - keep_months
+        cutoff = f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+        
+        state = self._get_partition_state(collection)
+        archived = []
+        with self._lock:
+            manifest = state['manifest']
+            for key, info in sorted(manifest['partitions'].items()):
+                if key == self.UNDATED_PARTITION or key >= cutoff or info.get('archived'):
+                    continue
+                source = self._partition_path(collection, key)
+                records = self._read_partition(source)
+                self._write_atomic(self._partition_path(collection, key, archived=True), records,
+                                   compress=True, indent=None)
+                info['archived'] = True
+                info['values'] = self._partition_summary(collection, records)
+                source.unlink(missing_ok=True)
+                archived.append(key)
+            
+            if archived:
+                manifest['version'] = manifest.get('version', 0) + 1
+                manifest_path = self._get_manifest_path(collection)
+                self._write_atomic(manifest_path, manifest)
+                state['signature'] = self._file_signature(manifest_path)
+        
+        if archived:
+            self.logger.info(f"Archived {collection} partitions: {', '.join(archived)}")
+        return archived
+    
+    # Secondary indexes
+    def declare_index(self, collection: str, *fields: str, sorted_index: bool = False):
+        """Declare a hash index over fields (or a sorted index over one field)"""
+        with self._lock:
+            if sorted_index:
+                self.sorted_indexes.setdefault(collection, []).extend(fields)
+            else:
+                self.hash_indexes.setdefault(collection, []).append(tuple(fields))
+            self._indexes.pop(collection, None)
+            state = self._partition_state.get(collection)
+            if state is not None:
+                state['indexes'].clear()
+    
+    def _resident_data(self, collection: str) -> Optional[List[Dict]]:
+        """Currently cached record list for collection, without touching disk"""
+        if collection in self.log_collections:
+            state = self._log_state.get(collection)
+            return state['view'] if state else None
+        cached = self._cache.get(collection)
+        return cached[1] if cached else None
+    
+    def _get_index(self, collection: str) -> Optional[CollectionIndex]:
+        """Get the collection's indexes, building them on first use
+        
+        Partitioned collections have per-partition indexes instead, see
+        _partition_index.
+        """
+        if collection in self.partitioned_collections:
+            return None
+        resident = collection in self.log_collections
+        if not (self.cache_enabled or resident):
+            return None
+        if collection not in self.hash_indexes and collection not in self.sorted_indexes:
+            return None
+        
+        # Pick up external changes (which drop the index) before using it
+        if collection in self.log_collections:
+            self._get_log_state(collection)
+        else:
+            self._load_collection(collection)
+        
+        index = self._indexes.get(collection)
+        if index is not None:
+            return index
+        
+        data = self._load_collection(collection)
+        index = CollectionIndex(self.hash_indexes.get(collection, []),
+                                self.sorted_indexes.get(collection, []))
+        index.build(data)
+        with self._lock:
+            # Only keep the index if nothing was written while it was built
+            if self._resident_data(collection) is data:
+                self._indexes[collection] = index
+        return index
+    
+    def _match_records(self, collection: str, filters: Dict[str, Any]) -> List[Dict]:
+        """Records matching all equality filters, using an index when one applies"""
+        if collection in self.partitioned_collections and filters:
+            # A date filter only needs its own partition, and partitions whose
+            # manifest summary rules out a match are not read at all; each
+            # partition searched answers from its own indexes
+            value = filters.get(self.PARTITION_FIELD)
+            state = self._get_partition_state(collection)
+            if isinstance(value, str):
+                keys = [self._partition_key({self.PARTITION_FIELD: value})]
+            else:
+                keys = sorted(state['manifest']['partitions'])
+            keys = [key for key in keys if key in state['manifest']['partitions']
+                    and self._partition_may_match(state['manifest']['partitions'][key], filters)]
+            state = self._load_partitions(collection, keys)
+            matches = []
+            for key in keys:
+                index = self._partition_index(collection, state, key)
+                candidates = index.lookup(filters) if index is not None else None
+                if candidates is None:
+                    candidates = list(state['partitions'].get(key, {}).values())
+                matches.extend(
+                    record for record in candidates
+                    if all(k in record and record[k] == v for k, v in filters.items())
+                )
+            return matches
+        
+        index = self._get_index(collection) if filters else None
+        candidates = index.lookup(filters) if index is not None else None
+        data = candidates if candidates is not None else self._load_collection(collection)
+        
+        if not filters:
+            return data
+        
+        return [
+            record for record in data
+            if all(key in record and record[key] == value for key, value in filters.items())
+        ]
+    
+    def find_range(self, collection: str, field: str, start: str, end: str) -> List[BaseModel]:
+        """Find records with start <= field <= end (string comparison)"""
+        model_class = self.models.get(collection)
+        if not model_class:
+            return []
+        
+        if collection in self.partitioned_collections and field == self.PARTITION_FIELD:
+            # Only open the partitions overlapping the range
+            state = self._get_partition_state(collection)
+            keys = self._partition_keys_for_range(state, start, end)
+            state = self._load_partitions(collection, keys)
+            records = []
+            for key in keys:
+                index = self._partition_index(collection, state, key)
+                in_range = index.range(field, start, end) if index is not None else None
+                if in_range is None:
+                    in_range = [
+                        record for record in state['partitions'].get(key, {}).values()
+                        if isinstance(record.get(field), str) and start <= record[field] <= end
+                    ]
+                records.extend(in_range)
+            records.sort(key=lambda record: record[field])
+            return [self._hydrate(collection, model_class, record) for record in records]
+        
+        index = self._get_index(collection)
+        records = index.range(field, start, end) if index is not None else None
+        if records is None:
+            records = [
+                record for record in self._load_collection(collection)
+                if isinstance(record.get(field), str) and start <= record[field] <= end
+            ]
+        
+        return [self._hydrate(collection, model_class, record) for record in records]
     
     # CRUD Operations
     def create(self, collection: str, model: BaseModel) -> BaseModel:
@@ -102,7 +1204,25 @@ class DatabaseService:
         if not model.validate():
             raise ValueError("Model validation failed")
         
-        data = self._load_collection(collection)
+        if collection in self.log_collections:
+            records = self._get_log_state(collection)['records']
+            if not model.id or model.id in records:
+                model.id = str(uuid.uuid4())
+            self._append_changes(collection, [
+                {'op': 'put', 'id': model.id, 'record': _clone_json(model.to_dict())}
+            ])
+            self._notify_write(collection, model.id, model)
+            return model
+        
+        if collection in self.partitioned_collections:
+            if not model.id or self._id_in_use(collection, model.to_dict()):
+                model.id = str(uuid.uuid4())
+            self._write_partitions(collection, [(None, _clone_json(model.to_dict()))])
+            self._notify_write(collection, model.id, model)
+            return model
+        
+        base = self._load_collection(collection)
+        data = list(base)
         
         # Ensure unique ID
         if not model.id:
@@ -112,22 +1232,35 @@ class DatabaseService:
         if any(record.get('id') == model.id for record in data):
             model.id = str(uuid.uuid4())
         
-        data.append(model.to_dict())
-        self._save_collection(collection, data)
+        record = _clone_json(model.to_dict())
+        data.append(record)
+        self._save_collection(collection, data, changes=[(None, record)], base=base)
+        self._notify_write(collection, model.id, model)
         
         return model
     
     def get_by_id(self, collection: str, record_id: str) -> Optional[BaseModel]:
         """Get record by ID"""
-        data = self._load_collection(collection)
         model_class = self.models.get(collection)
         
         if not model_class:
             return None
         
+        if collection in self.log_collections:
+            record = self._get_log_state(collection)['records'].get(record_id)
+            return self._hydrate(collection, model_class, record) if record else None
+        
+        if collection in self.partitioned_collections:
+            key = self._find_partition_of(collection, record_id)
+            if key is None:
+                return None
+            record = self._partition_state[collection]['partitions'][key].get(record_id)
+            return self._hydrate(collection, model_class, record) if record else None
+        
+        data = self._load_collection(collection)
         for record in data:
             if record.get('id') == record_id:
-                return model_class.from_dict(record)
+                return self._hydrate(collection, model_class, record)
         
         return None
     
@@ -139,29 +1272,21 @@ class DatabaseService:
         if not model_class:
             return []
         
-        return [model_class.from_dict(record) for record in data]
+        return [self._hydrate(collection, model_class, record) for record in data]
     
     def find(self, collection: str, filters: Dict[str, Any] = None, 
              limit: int = None, skip: int = 0) -> List[BaseModel]:
-        """Find records with filters"""
-        data = self._load_collection(collection)
+        """Find records with filters
+        
+        Equality filters covering a declared index are answered from it.
+        """
         model_class = self.models.get(collection)
         
         if not model_class:
             return []
         
         # Apply filters
-        if filters:
-            filtered_data = []
-            for record in data:
-                match = True
-                for key, value in filters.items():
-                    if key not in record or record[key] != value:
-                        match = False
-                        break
-                if match:
-                    filtered_data.append(record)
-            data = filtered_data
+        data = self._match_records(collection, filters)
         
         # Apply skip and limit
         if skip > 0:
@@ -169,19 +1294,55 @@ class DatabaseService:
         if limit:
             data = data[:limit]
         
-        return [model_class.from_dict(record) for record in data]
+        return [self._hydrate(collection, model_class, record) for record in data]
     
     def update(self, collection: str, record_id: str, updates: Dict[str, Any]) -> Optional[BaseModel]:
         """Update record by ID"""
-        data = self._load_collection(collection)
         model_class = self.models.get(collection)
         
         if not model_class:
             return None
         
+        if collection in self.log_collections:
+            record = self._get_log_state(collection)['records'].get(record_id)
+            if record is None:
+                return None
+            record = _clone_json(record)
+            record.update(updates)
+            record['updated_at'] = datetime.now().isoformat()
+            
+            model = model_class.from_dict(record)
+            if not model.validate():
+                raise ValueError("Updated model validation failed")
+            self._append_changes(collection, [
+                {'op': 'put', 'id': record_id, 'record': _clone_json(model.to_dict())}
+            ])
+            self._notify_write(collection, record_id, model)
+            return model
+        
+        if collection in self.partitioned_collections:
+            key = self._find_partition_of(collection, record_id)
+            if key is None:
+                return None
+            old = self._partition_state[collection]['partitions'][key][record_id]
+            record = _clone_json(old)
+            record.update(updates)
+            record['updated_at'] = datetime.now().isoformat()
+            
+            model = model_class.from_dict(record)
+            if not model.validate():
+                raise ValueError("Updated model validation failed")
+            self._write_partitions(collection, [(old, _clone_json(model.to_dict()))])
+            self._notify_write(collection, record_id, model)
+            return model
+        
+        base = self._load_collection(collection)
+        data = list(base)
         for i, record in enumerate(data):
             if record.get('id') == record_id:
                 # Update record
+                old = record
+                record = _clone_json(record)
                 record.update(updates)
                 record['updated_at'] = datetime.now().isoformat()
 
@@ -189,42 +1350,46 @@ class DatabaseService:
                 model = model_class.from_dict(record)
                 if not model.validate():
                     raise ValueError("Updated model validation failed")
-                data[i] = model.to_dict()
-                self._save_collection(collection, data)
+                data[i] = _clone_json(model.to_dict())
+                self._save_collection(collection, data, changes=[(old, data[i])], base=base)
+                self._notify_write(collection, record_id, model)
                 return model
         
         return None
 
     def delete(self, collection: str, record_id: str) -> bool:
         """Delete record by ID"""
-        data = self._load_collection(collection)
+        if collection in self.log_collections:
+            if record_id not in self._get_log_state(collection)['records']:
+                return False
+            self._append_changes(collection, [{'op': 'delete', 'id': record_id}])
+            self._notify_write(collection, record_id, None)
+            return True
+        
+        if collection in self.partitioned_collections:
+            key = self._find_partition_of(collection, record_id)
+            if key is None:
+                return False
+            old = self._partition_state[collection]['partitions'][key][record_id]
+            self._write_partitions(collection, [(old, None)])
+            self._notify_write(collection, record_id, None)
+            return True
+        
+        base = self._load_collection(collection)
+        data = list(base)
         
         for i, record in enumerate(data):
             if record.get('id') == record_id:
                 del data[i]
-                self._save_collection(collection, data)
+                self._save_collection(collection, data, changes=[(record, None)], base=base)
+                self._notify_write(collection, record_id, None)
                 return True
         
         return False
 
     def count(self, collection: str, filters: Dict[str, Any] = None) -> int:
         """Count records in collection"""
-        data = self._load_collection(collection)
-        
-        if not filters:
-            return len(data)
-        
-        count = 0
-        for record in data:
-            match = True
-            for key, value in filters.items():
-                if key not in record or record[key] != value:
-                    match = False
-                    break
-            if match:
-                count += 1
-        
-        return count
+        return len(self._match_records(collection, filters))
     
     def save(self, model_or_collection, model=None) -> BaseModel:
         """Save a model (create or update based on ID existence)
@@ -321,15 +1486,8 @@ class DatabaseService:
         return None
     
     def get_attendance_records_by_date_range(self, start_date: str, end_date: str) -> List[AttendanceRecord]:
-        """Get attendance records within date range"""
-        all_records = self.get_all('attendance_records')
-        filtered_records = []
-        
-        for record in all_records:
-            if start_date <= record.date <= end_date:
-                filtered_records.append(record)
-        
-        return filtered_records
+        """Get attendance records within date range, ordered by date"""
+        return self.find_range('attendance_records', 'date', start_date, end_date)
     
     def backup_database(self, backup_type: str = 'daily'):
         """Create database backup"""
@@ -338,8 +1496,17 @@ class DatabaseService:
         backup_subdir = backup_dir / f"backup_{timestamp}"
         backup_subdir.mkdir(exist_ok=True)
         
-        # Copy all data files
+        # Copy all data files (change logs before snapshots so a concurrent
+        # compaction can never leave the backup with a truncated log)
         for collection in self.models.keys():
+            log_file = self._get_log_path(collection)
+            if log_file.exists():
+                shutil.copy2(log_file, backup_subdir / log_file.name)
+            
+            partition_dir = self._get_partition_dir(collection)
+            if partition_dir.is_dir():
+                shutil.copytree(partition_dir, backup_subdir / collection, dirs_exist_ok=True)
+            
             source_file = self._get_file_path(collection)
             if source_file.exists():
                 target_file = backup_subdir / source_file.name
@@ -366,7 +1533,9 @@ class DatabaseService:
         if not backup_dir.exists():
             raise FileNotFoundError(f"Backup directory not found: {backup_path}")
         
-        with self._lock:
+        # Pending batches belong to the logs being replaced
+        self._checkpoint_batches()
+        with self._write_lock, self._lock:
             # Create current backup before restore
             self.backup_database('restore_backup')
             
@@ -375,6 +1544,34 @@ class DatabaseService:
                 target_file = self.data_dir / backup_file.name
                 shutil.copy2(backup_file, target_file)
             
+            # Restore change logs; a log newer than the backup must not be
+            # replayed on top of the restored snapshot
+            for collection in self.models.keys():
+                log_file = self._get_log_path(collection)
+                backup_log = backup_dir / log_file.name
+                if backup_log.exists():
+                    shutil.copy2(backup_log, log_file)
+                    self.log_collections.add(collection)
+                elif log_file.exists():
+                    log_file.unlink()
+                
+                partition_dir = self._get_partition_dir(collection)
+                backup_partitions = backup_dir / collection
+                if backup_partitions.is_dir():
+                    if partition_dir.exists():
+                        shutil.rmtree(partition_dir)
+                    shutil.copytree(backup_partitions, partition_dir)
+                    self.partitioned_collections.add(collection)
+                    self.log_collections.discard(collection)
+                elif partition_dir.exists():
+                    # Backup predates partitioning; re-split from its flat file
+                    shutil.rmtree(partition_dir)
+            
+            self._cache.clear()
+            self._log_state.clear()
+            self._partition_state.clear()
+            self._indexes.clear()
+            
             print(f"Database restored from backup: {backup_path}")
 
     # Terminal management methods
@@ -478,13 +1675,13 @@ class DatabaseService:
     
     def get_assignments_for_employee(self, employee_id: str) -> List[EmployeeTerminalAssignment]:
         """Get all terminal assignments for a specific employee"""
-        assignments = self.get_all('employee_terminal_assignments')
-        return [a for a in assignments if a.employee_id == employee_id and a.is_active]
+        assignments = self.find('employee_terminal_assignments', {'employee_id': employee_id})
+        return [a for a in assignments if a.is_active]
     
     def get_assignments_for_terminal(self, terminal_id: str) -> List[EmployeeTerminalAssignment]:
         """Get all employee assignments for a specific terminal"""
-        assignments = self.get_all('employee_terminal_assignments')
-        return [a for a in assignments if a.terminal_id == terminal_id and a.is_active]
+        assignments = self.find('employee_terminal_assignments', {'terminal_id': terminal_id})
+        return [a for a in assignments if a.is_active]
     
     def save_employee_terminal_assignment(self, assignment: EmployeeTerminalAssignment) -> bool:
         """Save an employee-terminal assignment"""
@@ -988,11 +2185,47 @@ class DatabaseService:
 # Global database instance
 db = DatabaseService()
 
+def configure_database_service(service: DatabaseService, config) -> DatabaseService:
+    """(Re)initialize service in place as the backend selected by DB_BACKEND ('json' or 'sqlite')
+    
+    Routes and services bind the module-level db when they are imported,
+    before init_app runs, so the configured backend replaces that object's
+    state instead of the global name; every importer then shares it. Write
+    callbacks registered so far are kept.
+    """
+    data_dir = config.get('DATA_DIR', 'attendance_data')
+    callbacks = service.__dict__.get('_write_callbacks', {})
+    
+    if config.get('DB_BACKEND', 'json') == 'sqlite':
+        from .sqlite_database import SQLiteDatabaseService
+        db_path = Path(config.get('DB_SQLITE_PATH') or Path(data_dir) / 'attendance.db')
+        is_new = not db_path.exists()
+        service.__dict__.clear()
+        service.__class__ = SQLiteDatabaseService
+        SQLiteDatabaseService.__init__(service, data_dir, db_path)
+        service._write_callbacks = callbacks
+        if is_new:
+            # One-shot import of the existing JSON collections
+            service.migrate_from_json(data_dir)
+        return service
+    
+    service.__dict__.clear()
+    service.__class__ = DatabaseService
+    DatabaseService.__init__(service, data_dir,
+                             cache_enabled=config.get('DB_CACHE_ENABLED', True),
+                             log_collections=config.get('DB_LOG_COLLECTIONS', []),
+                             log_fsync=config.get('DB_LOG_FSYNC', True),
+                             partitioned_collections=config.get('DB_PARTITIONED_COLLECTIONS', []))
+    service._write_callbacks = callbacks
+    return service
+
+def create_database_service(config) -> DatabaseService:
+    """Create the database service selected by DB_BACKEND ('json' or 'sqlite')"""
+    return configure_database_service(DatabaseService.__new__(DatabaseService), config)
+
 def init_app(app):
-    """Initialize database service with Flask app"""
-    global db
-    data_dir = app.config.get('DATA_DIR', 'attendance_data')
-    db = DatabaseService(data_dir)
+    """Configure the shared database service from the Flask app config"""
+    configure_database_service(db, app.config)
     
     # Schedule daily backups
     if app.config.get('BACKUP_ENABLED', True):
@@ -1009,6 +2242,28 @@ def init_app(app):
         
         backup_thread = threading.Thread(target=backup_scheduler, daemon=True)
         backup_thread.start()
+    
+    # Fold change logs into snapshots and archive old partitions in the background
+    if db.log_collections or db.partitioned_collections:
+        import threading
+        import time
+        
+        def storage_maintenance():
+            while True:
+                time.sleep(app.config.get('DB_COMPACT_INTERVAL', 300))
+                db.compact_logs(min_entries=app.config.get('DB_COMPACT_MIN_ENTRIES', 1000))
+                
+                keep_months = app.config.get('DB_ARCHIVE_AFTER_MONTHS', 12)
+                for collection in sorted(db.partitioned_collections):
+                    if not keep_months:
+                        break
+                    try:
+                        db.archive_partitions(collection, keep_months=keep_months)
+                    except Exception as e:
+                        db.logger.error(f"Error archiving {collection} partitions: {e}", exc_info=True)
+        
+        maintenance_thread = threading.Thread(target=storage_maintenance, daemon=True)
+        maintenance_thread.start()
 
 # Global database service instance - using the same instance as db
 db_service = db
@@ -1016,7 +2271,7 @@ db_service = db
 # Initialize Flask app with database
 def init_db(app):
     """Initialize database with Flask app"""
-    app.db = DatabaseService(app.config.get('DATA_DIR', 'attendance_data'))
+    app.db = create_database_service(app.config)
     
     # Set default system configuration
     config = app.db.get_system_config()
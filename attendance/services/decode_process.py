@@ -0,0 +1,317 @@
+"""
+Camera decoding in a separate process
+The decoder writes frames into a shared-memory ring the web server reads without copying
+"""
+
+import multiprocessing
+import signal
+import time
+import logging
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterator, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from .frame_buffer import FrameRef
+from .stream_supervisor import StreamSupervisor
+
+logger = logging.getLogger(__name__)
+
+# Slots of the int64 header shared with the decoder
+LATEST, SEQUENCE, CONNECTED, FRAMES, READ_ERRORS, RECONNECTS, STALLS = range(7)
+HEADER_FIELDS = 8
+# Float fields after the per-slot timestamps
+HEARTBEAT, DECODE_SECONDS = range(2)
+
+def _decoder_context():
+    # forkserver forks decoders from a clean process that imported this module
+    # once, instead of a copy of the threaded web server; spawn where it is
+    # not available
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+class SharedFrameRing:
+    """FrameRingBuffer over shared memory, written by a decoder process
+
+    The segment holds an int64 header (latest slot, sequence, decoder
+    counters, per-slot sequences and pin counts), float64 timestamps and the
+    frame slots, all frames with the configured (height, width, 3) shape.
+    Slot selection, publishing and pinning go through a process-shared lock;
+    the frame data itself is written and read without it. Like
+    FrameRingBuffer, the writer skips the newest and pinned slots, but the
+    ring cannot grow, so the decoder drops a frame when every slot is pinned.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int,
+                 shape: Tuple[int, int, int], lock, owner: bool):
+        self.shm = shm
+        self.slots = slots
+        self.shape = shape
+        self.lock = lock
+        self.owner = owner
+
+        header_size = HEADER_FIELDS + 2 * slots
+        self._header = np.ndarray((header_size,), dtype=np.int64, buffer=shm.buf)
+        self._sequences = self._header[HEADER_FIELDS:HEADER_FIELDS + slots]
+        self._pins = self._header[HEADER_FIELDS + slots:]
+        self._floats = np.ndarray((slots + 2,), dtype=np.float64, buffer=shm.buf, offset=header_size * 8)
+        self._timestamps = self._floats[:slots]
+
+        frames_offset = self._frames_offset(slots)
+        frame_size = int(np.prod(shape))
+        self._frames = []
+        for slot in range(slots):
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=frames_offset + slot * frame_size)
+            frame.flags.writeable = not owner  # The web server only reads
+            self._frames.append(frame)
+
+    @staticmethod
+    def _frames_offset(slots: int) -> int:
+        offset = (HEADER_FIELDS + 2 * slots) * 8 + (slots + 2) * 8
+        return (offset + 63) // 64 * 64
+
+    @classmethod
+    def create(cls, slots: int, shape: Tuple[int, int, int], lock) -> 'SharedFrameRing':
+        size = cls._frames_offset(slots) + slots * int(np.prod(shape))
+        ring = cls(shared_memory.SharedMemory(create=True, size=size), slots, shape, lock, owner=True)
+        ring._header[:] = 0
+        ring._header[LATEST] = -1
+        ring._floats[:] = 0.0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, slots: int, shape: Tuple[int, int, int], lock) -> 'SharedFrameRing':
+        return cls(shared_memory.SharedMemory(name=name), slots, shape, lock, owner=False)
+
+    def __len__(self) -> int:
+        return self.slots
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def sequence(self) -> int:
+        return int(self._header[SEQUENCE])
+
+    def counters(self) -> dict:
+        return {
+            'connected': bool(self._header[CONNECTED]),
+            'frames': int(self._header[FRAMES]),
+            'read_errors': int(self._header[READ_ERRORS]),
+            'reconnects': int(self._header[RECONNECTS]),
+            'stalls': int(self._header[STALLS]),
+            'heartbeat': float(self._floats[self.slots + HEARTBEAT]),
+            'decode_seconds': float(self._floats[self.slots + DECODE_SECONDS])
+        }
+
+    # Decoder side
+
+    def writable(self) -> Tuple[Optional[int], Optional[np.ndarray]]:
+        """Next slot to decode into, (None, None) if every other slot is pinned"""
+        with self.lock:
+            latest = int(self._header[LATEST])
+            for step in range(1, self.slots + 1):
+                slot = (latest + step) % self.slots
+                if slot != latest and not self._pins[slot]:
+                    return slot, self._frames[slot]
+        return None, None
+
+    def publish(self, slot: int, timestamp: float, decode_seconds: float) -> int:
+        with self.lock:
+            self._header[SEQUENCE] += 1
+            self._sequences[slot] = self._header[SEQUENCE]
+            self._timestamps[slot] = timestamp
+            self._header[LATEST] = slot
+            self._header[FRAMES] += 1
+            self._floats[self.slots + DECODE_SECONDS] = decode_seconds
+            return int(self._header[SEQUENCE])
+
+    def count(self, field: int, amount: int = 1):
+        self._header[field] += amount
+
+    def set_connected(self, connected: bool):
+        self._header[CONNECTED] = int(connected)
+
+    def beat(self):
+        self._floats[self.slots + HEARTBEAT] = time.time()
+
+    # Reader side, same interface as FrameRingBuffer
+
+    def read(self) -> Optional[FrameRef]:
+        """Pin and return the newest frame, None before the first frame or if the decoder holds the lock"""
+        if not self.lock.acquire(timeout=0.5):
+            return None  # The decoder died holding the lock; it is restarted with a new one
+        try:
+            slot = int(self._header[LATEST])
+            if slot < 0:
+                return None
+            self._pins[slot] += 1
+            return FrameRef(int(self._sequences[slot]), float(self._timestamps[slot]), self._frames[slot], slot)
+        finally:
+            self.lock.release()
+
+    def release(self, ref: FrameRef):
+        if not self.lock.acquire(timeout=0.5):
+            return
+        try:
+            self._pins[ref.slot] -= 1
+        finally:
+            self.lock.release()
+
+    @contextmanager
+    def latest(self) -> Iterator[Optional[FrameRef]]:
+        ref = self.read()
+        try:
+            yield ref
+        finally:
+            if ref is not None:
+                self.release(ref)
+
+    def close(self):
+        """Detach; the owner also frees the segment"""
+        if self.owner:
+            self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Frames are still referenced; the mapping goes when they do
+
+def _decoder_main(camera_id: str, source: Union[str, int], shm_name: str, slots: int,
+                  shape: Tuple[int, int, int], fps: int, lock, stop_event, max_read_failures: int):
+    """Decoder process: keep the camera connected and publish frames into the ring"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The server shuts decoders down itself
+    ring = SharedFrameRing.attach(shm_name, slots, shape, lock)
+    supervisor = StreamSupervisor()
+    frame_interval = 1.0 / fps
+    connected_before = False
+
+    def should_stop():
+        ring.beat()
+        return stop_event.is_set()
+
+    try:
+        while not should_stop():
+            connection = supervisor.connect(camera_id, [source], should_stop)
+            if connection is None:
+                break
+            cap, _ = connection
+            ring.set_connected(True)
+            if connected_before:
+                ring.count(RECONNECTS)
+            connected_before = True
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, shape[1])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, shape[0])
+            cap.set(cv2.CAP_PROP_FPS, fps)
+
+            watch = supervisor.watch(camera_id, cap)
+            read_failures = 0
+            try:
+                while not should_stop() and not watch.stalled:
+                    read_start = time.time()
+                    ok = cap.grab()
+                    slot, target = ring.writable() if ok else (None, None)
+                    if ok and slot is not None:
+                        decode_start = time.perf_counter()
+                        ok, frame = cap.retrieve(target)
+                        if ok and not np.shares_memory(frame, target):
+                            # Resolution differs from the configured one
+                            cv2.resize(frame, (shape[1], shape[0]), dst=target)
+
+                    if not ok:
+                        ring.count(READ_ERRORS)
+                        read_failures += 1
+                        if read_failures >= max_read_failures:
+                            break
+                        time.sleep(frame_interval)
+                        continue
+
+                    read_failures = 0
+                    watch.frame_received()
+                    if slot is not None:
+                        ring.publish(slot, time.time(), time.perf_counter() - decode_start)
+
+                    remaining = frame_interval - (time.time() - read_start)
+                    if remaining > 0:
+                        time.sleep(remaining)
+            finally:
+                supervisor.unwatch(watch)
+                cap.release()
+                ring.set_connected(False)
+
+            if watch.stalled:
+                ring.count(STALLS)
+    finally:
+        ring.close()
+
+class DecoderProcess:
+    """A camera's decoder process and the shared ring it writes to
+
+    A crash of the decoder (including a segfault in the video backend) only
+    ends that process; the ring outlives it and restart() starts a new
+    decoder on the same ring with a fresh lock, in case the old one died
+    holding it. Once stop() has closed the ring the decoder cannot be
+    restarted.
+    """
+
+    def __init__(self, camera_id: str, source: Union[str, int], resolution: Tuple[int, int],
+                 fps: int, slots: int = 4, max_read_failures: int = 30):
+        self.camera_id = camera_id
+        self.source = source
+        self.fps = fps
+        self.max_read_failures = max_read_failures
+        self._context = _decoder_context()
+        self.ring = SharedFrameRing.create(slots, (resolution[1], resolution[0], 3), self._context.Lock())
+        self._stop_event = self._context.Event()
+        self._process: Optional[multiprocessing.Process] = None
+        self._stopped = False
+        self.restarts = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._process = self._context.Process(
+            target=_decoder_main,
+            args=(self.camera_id, self.source, self.ring.name, self.ring.slots, self.ring.shape,
+                  self.fps, self.ring.lock, self._stop_event, self.max_read_failures),
+            daemon=True,
+            name=f"Decoder-{self.camera_id}"
+        )
+        self._process.start()
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    @property
+    def exitcode(self) -> Optional[int]:
+        return self._process.exitcode if self._process is not None else None
+
+    def restart(self) -> bool:
+        """Replace the decoder process, False if the decoder was stopped"""
+        if self._stopped:
+            return False
+        self._terminate()
+        self.ring.lock = self._context.Lock()
+        self.ring.set_connected(False)
+        self.restarts += 1
+        self.start()
+        return True
+
+    def _terminate(self, timeout: float = 5.0):
+        if self._process is None:
+            return
+        self._stop_event.set()
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join(timeout)
+        self._process = None
+
+    def stop(self):
+        self._stopped = True
+        self._terminate()
+        self.ring.close()
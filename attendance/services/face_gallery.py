@@ -0,0 +1,396 @@
+"""
+Vectorized face gallery for matching encodings against enrolled employees
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Tuple, Optional
+
+from ..models import Employee
+from .database import db, _clone_json
+from .face_index import FaceIndex, create_face_index
+
+logger = logging.getLogger(__name__)
+
+
+class FaceGallery:
+    """Enrolled face encodings packed into one contiguous matrix
+
+    Rows of ``matrix`` are float32 encodings grouped by employee; ``owners``
+    holds the index into ``employee_ids`` for every row and ``starts`` the
+    first row of each employee, so a probe is matched with one distance
+    computation followed by a per-employee min-reduction. Large galleries can
+    carry a nearest-neighbour ``index`` over the same rows, which match uses
+    instead of the full scan.
+    """
+
+    def __init__(self, matrix: np.ndarray, owners: np.ndarray, employee_ids: List[str],
+                 index: Optional[FaceIndex] = None):
+        self.matrix = matrix
+        self.owners = owners
+        self.employee_ids = employee_ids
+        self.index = index
+        self.row_norms = None
+        self.starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]]) if len(owners) else owners
+
+    @classmethod
+    def from_encodings(cls, known_encodings: Dict[str, List[List[float]]], dim: int = 128) -> 'FaceGallery':
+        """Build a gallery from a mapping of employee_id to face encodings"""
+        rows = []
+        owners = []
+        employee_ids = []
+        for employee_id, encodings in known_encodings.items():
+            valid = [encoding for encoding in encodings or [] if len(encoding) == dim]
+            if not valid:
+                continue
+            owners.extend([len(employee_ids)] * len(valid))
+            employee_ids.append(employee_id)
+            rows.extend(valid)
+
+        matrix = np.asarray(rows, dtype=np.float32).reshape(len(rows), dim)
+        return cls(np.ascontiguousarray(matrix), np.asarray(owners, dtype=np.int32), employee_ids)
+
+    def __len__(self) -> int:
+        return len(self.employee_ids)
+
+    @property
+    def size(self) -> int:
+        """Number of encodings in the gallery"""
+        return self.matrix.shape[0]
+
+    def employee_distances(self, encoding) -> np.ndarray:
+        """Smallest distance from encoding to each employee's encodings"""
+        probe = np.asarray(encoding, dtype=np.float32)
+        distances = np.linalg.norm(self.matrix - probe, axis=1)
+        return np.minimum.reduceat(distances, self.starts)
+
+    def employee_distances_many(self, encodings) -> np.ndarray:
+        """Smallest distance from each of F encodings to each employee, shape (F, employees)"""
+        probes = np.asarray(encodings, dtype=np.float32).reshape(-1, self.matrix.shape[1])
+        if self.row_norms is None:
+            self.row_norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        squared = (np.einsum('ij,ij->i', probes, probes)[:, None] + self.row_norms[None, :]
+                   - 2.0 * probes @ self.matrix.T)
+        return np.minimum.reduceat(np.sqrt(np.maximum(squared, 0.0)), self.starts, axis=1)
+
+    def match_many(self, encodings, threshold: float) -> List[Tuple[Optional[str], float]]:
+        """Best matching employee for each encoding, as match() returns for one"""
+        if not self.size or not len(encodings):
+            return [(None, 0.0) for _ in range(len(encodings))]
+        if self.index is not None:
+            return [self.match(encoding, threshold) for encoding in encodings]
+
+        per_employee = self.employee_distances_many(encodings)
+        best = np.argmin(per_employee, axis=1)
+        results = []
+        for face, employee in enumerate(best):
+            confidence = 1.0 - float(per_employee[face, employee])
+            if confidence < threshold:
+                results.append((None, 0.0))
+            else:
+                results.append((self.employee_ids[employee], confidence))
+        return results
+
+    def match(self, encoding, threshold: float) -> Tuple[Optional[str], float]:
+        """Best matching employee for encoding as (employee_id, confidence)
+
+        Confidence is 1 - distance; matches below threshold give (None, 0.0).
+        """
+        if not self.size:
+            return None, 0.0
+
+        if self.index is not None:
+            nearest = self.index.search(encoding, k=1)
+            if not nearest:
+                return None, 0.0
+            employee_id, distance = nearest[0]
+        else:
+            per_employee = self.employee_distances(encoding)
+            best = int(np.argmin(per_employee))
+            employee_id, distance = self.employee_ids[best], float(per_employee[best])
+
+        confidence = 1.0 - distance
+        if confidence < threshold:
+            return None, 0.0
+        return employee_id, confidence
+
+
+class FaceGalleryService:
+    """Process-wide gallery of recognizable employees and their encodings
+
+    Active, face-enabled employees are kept as an employee_id -> record map
+    next to their encodings, so recognition neither re-reads employees.json nor
+    rescans it to look the match up. Employee writes are applied incrementally
+    through the database write callbacks; the compiled matrix is persisted as a
+    .npy file and memory-mapped on the next start when it is still current.
+    """
+
+    GALLERY_DIR = 'face_gallery'
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self._lock = threading.RLock()
+        self._records: Dict[str, Dict] = {}     # employee_id -> employee record
+        self._rows: Dict[str, np.ndarray] = {}  # employee_id -> (k, dim) encodings
+        self._employee_ids: Dict[str, str] = {}  # record id -> employee_id
+        self._gallery: Optional[FaceGallery] = None
+        self._version = None
+        self._subscribed = False
+
+        # Nearest-neighbour index used once the gallery holds index_min_size encodings
+        self.index_type = 'exact'
+        self.index_min_size = 20000
+        self.index_options: Dict = {}
+        self._index: Optional[FaceIndex] = None
+
+    def init_app(self, app):
+        """Configure the gallery index and subscribe to employee writes"""
+        self.index_type = app.config.get('FACE_INDEX_TYPE', self.index_type)
+        self.index_min_size = app.config.get('FACE_INDEX_MIN_SIZE', self.index_min_size)
+        if self.index_type == 'ivf':
+            self.index_options = {
+                'n_lists': app.config.get('FACE_IVF_LISTS', 0),
+                'n_probe': app.config.get('FACE_IVF_PROBES', 8)
+            }
+        self._index = None
+        self._gallery = None
+        self._ensure_subscribed()
+
+    def _ensure_subscribed(self):
+        if not self._subscribed:
+            with self._lock:
+                if not self._subscribed:
+                    db.add_write_callback('employees', self._on_employee_write)
+                    self._subscribed = True
+
+    def _eligible(self, record: Dict) -> bool:
+        """Whether the employee can be recognized by face"""
+        return (record.get('employment_status') == 'active'
+                and record.get('face_recognition_enabled', True)
+                and bool(record.get('face_encodings')))
+
+    def _encoding_rows(self, record: Dict) -> np.ndarray:
+        valid = [encoding for encoding in record.get('face_encodings') or [] if len(encoding) == self.dim]
+        return np.asarray(valid, dtype=np.float32).reshape(len(valid), self.dim)
+
+    def _drop(self, employee_id: str):
+        self._records.pop(employee_id, None)
+        self._rows.pop(employee_id, None)
+        if self._index is not None:
+            self._index.remove(employee_id)
+
+    def _put(self, record: Dict):
+        """Add or refresh one employee, dropping it when no longer recognizable"""
+        previous = self._employee_ids.pop(record.get('id'), None)
+        if previous is not None:
+            self._drop(previous)
+
+        if self._eligible(record):
+            rows = self._encoding_rows(record)
+            if len(rows):
+                employee_id = record['employee_id']
+                self._records[employee_id] = record
+                self._rows[employee_id] = rows
+                self._employee_ids[record.get('id')] = employee_id
+                if self._index is not None:
+                    self._index.add(rows, employee_id)
+        self._gallery = None
+
+    def _on_employee_write(self, collection: str, record_id: str, model):
+        """Apply a single employee create, update or delete"""
+        with self._lock:
+            if self._version is None:
+                return  # Not loaded yet, the first sync reads everything
+
+            if model is None:
+                employee_id = self._employee_ids.pop(record_id, None)
+                if employee_id is not None:
+                    self._drop(employee_id)
+                    self._gallery = None
+            else:
+                self._put(_clone_json(model.to_dict()))
+
+            # This write moved the version by one; if it moved further, writes
+            # by another instance were picked up without being applied here
+            version = db.get_collection_version('employees')
+            self._version = version if version == self._version + 1 else None
+
+    def _valid_count(self, record: Dict) -> int:
+        return sum(1 for encoding in record.get('face_encodings') or [] if len(encoding) == self.dim)
+
+    def _fingerprint(self) -> str:
+        """Identity of the current gallery contents"""
+        stamps = [
+            (employee_id, record.get('id'), record.get('updated_at'), self._valid_count(record))
+            for employee_id, record in sorted(self._records.items())
+        ]
+        return hashlib.sha1(json.dumps(stamps).encode()).hexdigest()
+
+    def _sync(self, db, version):
+        """Reload every recognizable employee after an out-of-band change"""
+        employees = db.find('employees', {
+            'employment_status': 'active',
+            'face_recognition_enabled': True
+        })
+        previous_records, previous_rows = self._records, self._rows
+
+        self._records = {}
+        for employee in employees:
+            record = employee.to_dict()
+            if self._eligible(record) and self._valid_count(record):
+                self._records[employee.employee_id] = record
+        self._employee_ids = {record.get('id'): employee_id for employee_id, record in self._records.items()}
+        self._rows = {}
+        self._gallery = None
+        self._index = None
+        self._version = version
+
+        if not previous_records:
+            self._gallery = self._load_persisted(db)
+            if self._gallery is not None:
+                return
+
+        for employee_id, record in self._records.items():
+            old = previous_records.get(employee_id)
+            if (old is not None and old.get('id') == record.get('id')
+                    and old.get('updated_at') == record.get('updated_at')):
+                # Unchanged since the last sync, keep its rows
+                self._rows[employee_id] = previous_rows[employee_id]
+            else:
+                self._rows[employee_id] = self._encoding_rows(record)
+
+    def _gallery_dir(self, db) -> Path:
+        return Path(db.data_dir) / self.GALLERY_DIR
+
+    def _load_persisted(self, db) -> Optional[FaceGallery]:
+        """Memory-map the persisted gallery if it matches the loaded employees"""
+        index_path = self._gallery_dir(db) / self.INDEX_FILE
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            if index.get('fingerprint') != self._fingerprint() or sorted(index['employee_ids']) != sorted(self._records):
+                return None
+            matrix = np.load(self._gallery_dir(db) / index['file'], mmap_mode='r')
+        except (OSError, ValueError, KeyError):
+            return None
+
+        counts = index.get('counts', [])
+        if matrix.shape != (sum(counts), self.dim):
+            return None
+        owners = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        gallery = FaceGallery(matrix, owners, list(index['employee_ids']))
+        for position, employee_id in enumerate(gallery.employee_ids):
+            start = gallery.starts[position]
+            self._rows[employee_id] = matrix[start:start + counts[position]]
+        gallery.index = self._build_index(gallery)
+        logger.info(f"Face gallery memory-mapped from {index['file']}")
+        return gallery
+
+    def _persist(self, db, gallery: FaceGallery, fingerprint: str):
+        """Write the compiled gallery so the next start can memory-map it"""
+        gallery_dir = self._gallery_dir(db)
+        file_name = f"encodings-{fingerprint[:16]}.npy"
+        try:
+            gallery_dir.mkdir(parents=True, exist_ok=True)
+            matrix_path = gallery_dir / file_name
+            if not matrix_path.exists():
+                temp_path = gallery_dir / f"{file_name}.tmp"
+                with open(temp_path, 'wb') as f:
+                    np.save(f, gallery.matrix)
+                os.replace(temp_path, matrix_path)
+
+            index = {
+                'file': file_name,
+                'fingerprint': fingerprint,
+                'dim': self.dim,
+                'employee_ids': gallery.employee_ids,
+                'counts': [len(self._rows[employee_id]) for employee_id in gallery.employee_ids]
+            }
+            temp_path = gallery_dir / f"{self.INDEX_FILE}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(temp_path, gallery_dir / self.INDEX_FILE)
+
+            # Older matrices may still be mapped by another process; retry next time
+            for stale in gallery_dir.glob('encodings-*.npy'):
+                if stale.name != file_name:
+                    try:
+                        stale.unlink()
+                    except OSError:
+                        pass
+        except OSError as e:
+            logger.warning(f"Could not persist face gallery: {e}")
+
+    def _compile(self, db) -> FaceGallery:
+        """Stack the per-employee rows into one gallery and persist it"""
+        employee_ids = list(self._rows)
+        counts = [len(self._rows[employee_id]) for employee_id in employee_ids]
+        if employee_ids:
+            matrix = np.ascontiguousarray(np.concatenate([self._rows[e] for e in employee_ids]), dtype=np.float32)
+        else:
+            matrix = np.empty((0, self.dim), dtype=np.float32)
+        owners = np.repeat(np.arange(len(employee_ids), dtype=np.int32), counts)
+
+        gallery = FaceGallery(matrix, owners, employee_ids)
+        # Rows now live in the compiled matrix
+        for position, employee_id in enumerate(employee_ids):
+            start = gallery.starts[position]
+            self._rows[employee_id] = matrix[start:start + counts[position]]
+        gallery.index = self._index if self._index is not None else self._build_index(gallery)
+
+        self._persist(db, gallery, self._fingerprint())
+        return gallery
+
+    def _build_index(self, gallery: FaceGallery) -> Optional[FaceIndex]:
+        """Index the gallery rows when it is large enough to benefit"""
+        if self.index_type == 'exact' or gallery.size < self.index_min_size:
+            self._index = None
+            return None
+        index = create_face_index(self.index_type, self.dim, **self.index_options)
+        index.build(gallery.matrix, [gallery.employee_ids[owner] for owner in gallery.owners])
+        logger.info(f"Face gallery {self.index_type} index built over {gallery.size} encodings")
+        self._index = index
+        return index
+
+    def get_gallery(self) -> FaceGallery:
+        """Get the current gallery, syncing with the database if it changed"""
+        self._ensure_subscribed()
+        version = db.get_collection_version('employees')
+        gallery = self._gallery
+        if gallery is not None and self._version == version:
+            return gallery
+
+        with self._lock:
+            version = db.get_collection_version('employees')
+            if self._version != version:
+                self._sync(db, version)
+            if self._gallery is None:
+                self._gallery = self._compile(db)
+                logger.info(f"Face gallery built: {len(self._gallery)} employees, {self._gallery.size} encodings")
+            return self._gallery
+
+    def get_employee(self, employee_id: str) -> Optional[Employee]:
+        """Get a recognizable employee by employee ID without scanning the collection"""
+        self.get_gallery()
+        record = self._records.get(employee_id)
+        return Employee.from_dict(_clone_json(record)) if record else None
+
+    def invalidate(self):
+        """Force a full reload on next use"""
+        with self._lock:
+            self._records = {}
+            self._rows = {}
+            self._employee_ids = {}
+            self._gallery = None
+            self._index = None
+            self._version = None
+
+
+# Global instance for the application
+gallery_service = FaceGalleryService()
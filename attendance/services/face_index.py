@@ -0,0 +1,256 @@
+"""
+Nearest-neighbour indexes over face encodings for large galleries
+"""
+
+import threading
+import numpy as np
+from typing import Dict, List, Tuple, Set, Any
+
+
+class FaceIndex:
+    """Nearest-neighbour index over face encodings labelled by employee
+
+    Subclasses keep their storage copy-on-write so searches can run while an
+    enrollment adds or removes encodings.
+    """
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self._lock = threading.Lock()
+
+    def _as_matrix(self, vectors) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+
+    def build(self, vectors, labels: List[Any]):
+        """Index vectors from scratch, labels[i] belongs to vectors[i]"""
+        raise NotImplementedError
+
+    def add(self, vectors, label: Any):
+        """Add encodings for one label"""
+        raise NotImplementedError
+
+    def remove(self, label: Any):
+        """Remove every encoding of label"""
+        raise NotImplementedError
+
+    def search(self, query, k: int = 1) -> List[Tuple[Any, float]]:
+        """Up to k nearest encodings as (label, distance), closest first"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @staticmethod
+    def _top_k(distances: np.ndarray, labels: np.ndarray, k: int) -> List[Tuple[Any, float]]:
+        if len(distances) > k:
+            nearest = np.argpartition(distances, k - 1)[:k]
+            nearest = nearest[np.argsort(distances[nearest], kind='stable')]
+        else:
+            nearest = np.argsort(distances, kind='stable')
+        return [(labels[i], float(distances[i])) for i in nearest]
+
+
+class ExactFaceIndex(FaceIndex):
+    """Brute-force search over one matrix, the reference for recall"""
+
+    def __init__(self, dim: int = 128):
+        super().__init__(dim)
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._labels = np.empty(0, dtype=object)
+
+    def build(self, vectors, labels: List[Any]):
+        vectors = self._as_matrix(vectors)
+        labels_array = np.empty(len(labels), dtype=object)
+        labels_array[:] = labels
+        with self._lock:
+            self._vectors, self._labels = vectors, labels_array
+
+    def add(self, vectors, label: Any):
+        vectors = self._as_matrix(vectors)
+        added = np.empty(len(vectors), dtype=object)
+        added[:] = [label] * len(vectors)
+        with self._lock:
+            self._vectors = np.concatenate([self._vectors, vectors])
+            self._labels = np.concatenate([self._labels, added])
+
+    def remove(self, label: Any):
+        with self._lock:
+            keep = self._labels != label
+            self._vectors, self._labels = self._vectors[keep], self._labels[keep]
+
+    def search(self, query, k: int = 1) -> List[Tuple[Any, float]]:
+        vectors, labels = self._vectors, self._labels
+        if not len(vectors):
+            return []
+        distances = np.linalg.norm(vectors - np.asarray(query, dtype=np.float32), axis=1)
+        return self._top_k(distances, labels, k)
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+
+class IVFFaceIndex(FaceIndex):
+    """Inverted-file index: k-means cells searched n_probe at a time
+
+    Encodings are assigned to their nearest of n_lists centroids and a query
+    only scans the n_probe closest cells, so n_probe trades recall for latency
+    (n_probe == n_lists is exact). New encodings go straight into their cell;
+    the centroids are retrained once the index has grown retrain_growth times
+    past the size it was trained on.
+    """
+
+    def __init__(self, dim: int = 128, n_lists: int = 0, n_probe: int = 8,
+                 kmeans_iterations: int = 10, retrain_growth: float = 4.0,
+                 min_train_size: int = 256, seed: int = 0):
+        super().__init__(dim)
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.kmeans_iterations = kmeans_iterations
+        self.retrain_growth = retrain_growth
+        self.min_train_size = min_train_size
+        self.seed = seed
+        self._centroids = None
+        self._cells: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._label_cells: Dict[Any, Set[int]] = {}
+        self._size = 0
+        self._trained_size = 0
+
+    @staticmethod
+    def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        """Index of the nearest centroid for every vector"""
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            scores = centroid_norms - 2.0 * chunk @ centroids.T
+            assignment[start:start + chunk_size] = np.argmin(scores, axis=1)
+        return assignment
+
+    def _train(self, vectors: np.ndarray) -> np.ndarray:
+        """Lloyd's k-means on a sample of the vectors"""
+        n_lists = self.n_lists or int(np.sqrt(len(vectors)))
+        n_lists = max(1, min(n_lists, len(vectors)))
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), max(n_lists * 32, self.min_train_size))
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(self.kmeans_iterations):
+            assignment = self._nearest_centroid(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    def build(self, vectors, labels: List[Any]):
+        vectors = self._as_matrix(vectors)
+        labels_array = np.empty(len(labels), dtype=object)
+        labels_array[:] = labels
+
+        if len(vectors) < self.min_train_size:
+            centroids = vectors.mean(axis=0, keepdims=True) if len(vectors) else None
+        else:
+            centroids = self._train(vectors)
+
+        cells = []
+        label_cells: Dict[Any, Set[int]] = {}
+        if centroids is not None:
+            assignment = self._nearest_centroid(vectors, centroids)
+            order = np.argsort(assignment, kind='stable')
+            bounds = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+            for cell in range(len(centroids)):
+                members = order[bounds[cell]:bounds[cell + 1]]
+                cells.append((vectors[members], labels_array[members]))
+                for label in set(labels_array[members]):
+                    label_cells.setdefault(label, set()).add(cell)
+
+        with self._lock:
+            self._centroids = centroids
+            self._cells = cells
+            self._label_cells = label_cells
+            self._size = len(vectors)
+            self._trained_size = len(vectors)
+
+    def _all_entries(self) -> Tuple[np.ndarray, List[Any]]:
+        vectors = [cell_vectors for cell_vectors, _ in self._cells]
+        labels = [label for _, cell_labels in self._cells for label in cell_labels]
+        return (np.concatenate(vectors) if vectors else np.empty((0, self.dim), dtype=np.float32)), labels
+
+    def add(self, vectors, label: Any):
+        vectors = self._as_matrix(vectors)
+        if not len(vectors):
+            return
+
+        needs_training = (
+            self._centroids is None
+            or (self._trained_size < self.min_train_size <= self._size + len(vectors))
+            or self._size + len(vectors) > self.retrain_growth * max(self._trained_size, 1)
+        )
+        if needs_training:
+            existing, labels = self._all_entries()
+            self.build(np.concatenate([existing, vectors]), labels + [label] * len(vectors))
+            return
+
+        with self._lock:
+            assignment = self._nearest_centroid(vectors, self._centroids)
+            for cell in np.unique(assignment):
+                members = vectors[assignment == cell]
+                added = np.empty(len(members), dtype=object)
+                added[:] = [label] * len(members)
+                cell_vectors, cell_labels = self._cells[cell]
+                self._cells[cell] = (np.concatenate([cell_vectors, members]),
+                                     np.concatenate([cell_labels, added]))
+                self._label_cells.setdefault(label, set()).add(int(cell))
+            self._size += len(vectors)
+
+    def remove(self, label: Any):
+        with self._lock:
+            for cell in self._label_cells.pop(label, set()):
+                cell_vectors, cell_labels = self._cells[cell]
+                keep = cell_labels != label
+                self._size -= int(len(keep) - keep.sum())
+                self._cells[cell] = (cell_vectors[keep], cell_labels[keep])
+
+    def search(self, query, k: int = 1, n_probe: int = None) -> List[Tuple[Any, float]]:
+        centroids, cells = self._centroids, self._cells
+        if centroids is None:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+
+        n_probe = min(n_probe or self.n_probe, len(centroids))
+        centroid_distances = np.linalg.norm(centroids - query, axis=1)
+        if n_probe < len(centroids):
+            probes = np.argpartition(centroid_distances, n_probe - 1)[:n_probe]
+        else:
+            probes = np.arange(len(centroids))
+
+        distances = []
+        labels = []
+        for cell in probes:
+            cell_vectors, cell_labels = cells[cell]
+            if len(cell_vectors):
+                distances.append(np.linalg.norm(cell_vectors - query, axis=1))
+                labels.append(cell_labels)
+        if not distances:
+            return []
+        return self._top_k(np.concatenate(distances), np.concatenate(labels), k)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+FACE_INDEX_TYPES = {
+    'exact': ExactFaceIndex,
+    'ivf': IVFFaceIndex,
+}
+
+
+def create_face_index(index_type: str = 'exact', dim: int = 128, **options) -> FaceIndex:
+    """Create a face index by name ('exact' or 'ivf')"""
+    try:
+        index_class = FACE_INDEX_TYPES[index_type]
+    except KeyError:
+        raise ValueError(f"Unknown face index type: {index_type}")
+    return index_class(dim, **options)
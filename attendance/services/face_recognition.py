@@ -14,6 +14,8 @@ import logging
 import time
 from pathlib import Path
 
+from .face_gallery import FaceGallery, gallery_service
+
 logger = logging.getLogger(__name__)
 
 class EnhancedFaceRecognitionService:
@@ -34,6 +36,9 @@ class EnhancedFaceRecognitionService:
         self.recognition_cache = {}
         self.cache_timeout = 10  # seconds
         
+        # Gallery of active enrolled employees shared by the whole process
+        self.gallery_service = gallery_service
+        
         logger.info(f"Enhanced Face Recognition Service initialized - Enabled: {self.enabled}")
     
     def init_app(self, app):
@@ -50,6 +55,8 @@ class EnhancedFaceRecognitionService:
             self.quality_threshold = app.config['FACE_QUALITY_THRESHOLD']
         if app.config.get('MULTI_ANGLE_RECOGNITION'):
             self.multi_angle_enabled = app.config['MULTI_ANGLE_RECOGNITION']
+        
+        self.gallery_service.init_app(app)
             
         logger.info(f"Enhanced Face Recognition Service initialized with Flask app - Enabled: {self.enabled}")
     
@@ -262,13 +269,22 @@ class EnhancedFaceRecognitionService:
             logger.error(f"Face encoding error: {e}")
             return []
     
-    def recognize_face(self, image_data: str, known_encodings: Dict[str, List[List[float]]]) -> Tuple[Optional[str], float]:
+    def get_gallery(self) -> FaceGallery:
+        """Get the gallery of active enrolled employees"""
+        return self.gallery_service.get_gallery()
+    
+    def invalidate_gallery(self):
+        """Force the gallery to be reloaded on next use"""
+        self.gallery_service.invalidate()
+    
+    def recognize_face(self, image_data: str, known_encodings: Dict[str, List[List[float]]] = None) -> Tuple[Optional[str], float]:
         """
         Recognize a face from image data against known encodings
         
         Args:
             image_data: Base64 encoded image
-            known_encodings: Dictionary mapping employee_id to list of face encodings
+            known_encodings: Dictionary mapping employee_id to list of face encodings,
+                defaults to the gallery of active enrolled employees
             
         Returns:
             Tuple of (employee_id, confidence) or (None, 0.0) if no match
@@ -277,11 +293,16 @@ class EnhancedFaceRecognitionService:
             logger.warning("Face recognition not enabled")
             return None, 0.0
         
-        if not known_encodings:
-            logger.warning("No known face encodings provided")
-            return None, 0.0
-        
         try:
+            if known_encodings is None:
+                gallery = self.get_gallery()
+            else:
+                gallery = FaceGallery.from_encodings(known_encodings)
+            
+            if not gallery.size:
+                logger.warning("No known face encodings provided")
+                return None, 0.0
+            
             # Extract face encodings from input image
             input_encodings = self.encode_face_from_image_data(image_data)
             
@@ -289,27 +310,8 @@ class EnhancedFaceRecognitionService:
                 logger.warning("No face found in input image")
                 return None, 0.0
             
-            # Use the first face found in the image
-            input_encoding = np.array(input_encodings[0])
-            
-            best_match_id = None
-            best_confidence = 0.0
-            
-            # Compare against all known faces
-            for employee_id, employee_encodings in known_encodings.items():
-                for known_encoding_list in employee_encodings:
-                    known_encoding = np.array(known_encoding_list)
-                    
-                    # Calculate face distance (lower is better)
-                    face_distance = face_recognition.face_distance([known_encoding], input_encoding)[0]
-                    
-                    # Convert distance to confidence (0-1, higher is better)
-                    confidence = 1.0 - face_distance
-                    
-                    # Track best match
-                    if confidence > best_confidence and confidence >= self.confidence_threshold:
-                        best_confidence = confidence
-                        best_match_id = employee_id
+            # Match the first face found in the image against every encoding at once
+            best_match_id, best_confidence = gallery.match(input_encodings[0], self.confidence_threshold)
             
             if best_match_id:
                 logger.info(f"Face recognized: {best_match_id} (confidence: {best_confidence:.3f})")
@@ -322,6 +324,77 @@ class EnhancedFaceRecognitionService:
             logger.error(f"Face recognition error: {e}")
             return None, 0.0
     
+    def _decode_image(self, image_data: str) -> np.ndarray:
+        """Decode base64 image data to an RGB array"""
+        if 'data:image' in image_data:
+            image_data = image_data.split(',')[1]
+        
+        image = Image.open(io.BytesIO(base64.b64decode(image_data)))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return np.array(image)
+    
+    def recognize_faces_batch(self, images: List[Any],
+                              known_encodings: Dict[str, List[List[float]]] = None) -> List[Dict]:
+        """
+        Recognize every face in a batch of images with one gallery match
+        
+        Args:
+            images: Base64 encoded images or RGB numpy frames
+            known_encodings: Dictionary mapping employee_id to list of face encodings,
+                defaults to the gallery of active enrolled employees
+            
+        Returns:
+            One dict per image with 'index', 'faces' (employee_id, confidence and
+            face_location per detected face) and 'error' when the image failed
+        """
+        results = [{'index': i, 'faces': [], 'error': None} for i in range(len(images))]
+        if not self.enabled:
+            for result in results:
+                result['error'] = 'Face recognition not enabled'
+            return results
+        
+        # Detect and encode every image, remembering which image each face came from
+        encodings = []
+        owners = []
+        for i, image in enumerate(images):
+            try:
+                frame = self._decode_image(image) if isinstance(image, str) else image
+                face_locations = face_recognition.face_locations(frame)
+                face_encodings = face_recognition.face_encodings(frame, face_locations)
+            except Exception as e:
+                logger.error(f"Batch face recognition error on image {i}: {e}")
+                results[i]['error'] = f'Image processing error: {str(e)}'
+                continue
+            
+            for face_encoding, face_location in zip(face_encodings, face_locations):
+                encodings.append(face_encoding)
+                owners.append(i)
+                results[i]['faces'].append({'face_location': face_location})
+        
+        if not encodings:
+            return results
+        
+        try:
+            gallery = self.get_gallery() if known_encodings is None else FaceGallery.from_encodings(known_encodings)
+            matches = gallery.match_many(np.asarray(encodings), self.confidence_threshold)
+        except Exception as e:
+            logger.error(f"Batch face matching error: {e}")
+            matches = [(None, 0.0)] * len(encodings)
+        
+        faces = iter(face for result in results for face in result['faces'])
+        for employee_id, confidence in matches:
+            face = next(faces)
+            face.update({
+                'recognized': employee_id is not None,
+                'employee_id': employee_id,
+                'confidence': confidence
+            })
+        
+        logger.info(f"Batch recognition: {len(images)} images, {len(encodings)} faces, "
+                    f"{sum(1 for employee_id, _ in matches if employee_id)} recognized")
+        return results
+    
     def compare_faces(self, encoding1: List[float], encoding2: List[float]) -> float:
         """
         Compare two face encodings and return similarity score
@@ -423,19 +496,16 @@ class EnhancedFaceRecognitionService:
         if not self.enabled or not self.enrollment_service:
             return []
         
-        # Use the advanced enrollment service for recognition
-        recognition_result = self.enrollment_service.recognize_employee(frame, camera_id or 'unknown')
-        
-        if recognition_result:
-            return [{
-                'employee_id': recognition_result['employee_id'],
-                'employee_name': recognition_result['employee_name'],
-                'confidence': recognition_result['confidence'],
-                'face_location': recognition_result['face_location'],
-                'detection_method': 'multi_angle_enhanced'
-            }]
+        # Use the advanced enrollment service for recognition of every face in the frame
+        recognition_results = self.enrollment_service.recognize_employees(frame, camera_id or 'unknown')
         
-        return []
+        return [{
+            'employee_id': recognition_result['employee_id'],
+            'employee_name': recognition_result['employee_name'],
+            'confidence': recognition_result['confidence'],
+            'face_location': recognition_result['face_location'],
+            'detection_method': 'multi_angle_enhanced'
+        } for recognition_result in recognition_results]
     
     def recognize_faces_in_image(self, image_data: str, known_employees: List[Dict] = None) -> List[Dict]:
         """Enhanced face recognition in base64 image with multi-angle support"""
@@ -472,29 +542,21 @@ class EnhancedFaceRecognitionService:
         if not face_encodings:
             return []
         
-        results = []
+        employees = {
+            employee['employee_id']: employee
+            for employee in known_employees if employee.get('face_encodings')
+        }
+        gallery = FaceGallery.from_encodings({
+            employee_id: employee['face_encodings'] for employee_id, employee in employees.items()
+        })
+        matches = gallery.match_many(np.asarray(face_encodings), self.confidence_threshold)
         
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            best_match = None
-            best_distance = float('inf')
-            
-            for employee in known_employees:
-                if not employee.get('face_encodings'):
-                    continue
-                
-                # Compare with all encodings for this employee
-                for encoding in employee['face_encodings']:
-                    distance = face_recognition.face_distance([encoding], face_encoding)[0]
-                    
-                    if distance < best_distance and distance < (1 - self.confidence_threshold):
-                        best_distance = distance
-                        best_match = employee
-            
-            if best_match:
-                confidence = 1 - best_distance
+        results = []
+        for (employee_id, confidence), face_location in zip(matches, face_locations):
+            if employee_id:
                 results.append({
-                    'employee_id': best_match['employee_id'],
-                    'employee_name': best_match.get('name', 'Unknown'),
+                    'employee_id': employee_id,
+                    'employee_name': employees[employee_id].get('name', 'Unknown'),
                     'confidence': confidence,
                     'face_location': face_location,
                     'detection_method': 'standard'
@@ -539,6 +601,7 @@ class EnhancedFaceRecognitionService:
             'confidence_threshold': self.confidence_threshold,
             'quality_threshold': self.quality_threshold,
             'cache_size': cache_size,
+            'gallery_size': self.get_gallery().size,
             'has_enrollment_service': self.enrollment_service is not None
         }
     
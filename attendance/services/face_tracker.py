@@ -0,0 +1,170 @@
+"""
+Face tracking across camera frames
+Carries a recognized identity forward so the same face is not re-encoded every frame
+"""
+
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+# (top, right, bottom, left), like face_recognition locations
+Location = Tuple[int, int, int, int]
+
+def location_iou(a: Location, b: Location) -> float:
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    height = min(a[2], b[2]) - max(a[0], b[0])
+    width = min(a[1], b[1]) - max(a[3], b[3])
+    if height <= 0 or width <= 0:
+        return 0.0
+    intersection = height * width
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+def _centre_distance(a: Location, b: Location) -> float:
+    """Distance between box centres relative to the size of box a"""
+    dy = (a[0] + a[2] - b[0] - b[2]) / 2.0
+    dx = (a[1] + a[3] - b[1] - b[3]) / 2.0
+    size = max(a[2] - a[0], a[1] - a[3], 1)
+    return (dx * dx + dy * dy) ** 0.5 / size
+
+@dataclass
+class FaceTrack:
+    track_id: int
+    location: Location
+    first_seen: float
+    last_seen: float
+    employee_id: Optional[str] = None
+    employee_name: Optional[str] = None
+    confidence: float = 0.0
+    verified_at: float = 0.0
+    detection_characteristics: Optional[Dict] = None
+
+class FaceTracker:
+    """IoU/centroid tracker over the faces found in consecutive frames
+
+    Detections are associated with existing tracks greedily, by box overlap
+    first and by centre distance for faces that moved further. A track whose
+    match reached confirm_confidence is confirmed: while it is followed its
+    identity is carried forward and the face is not encoded again until
+    reverify_interval has passed. Tracks not seen for max_age seconds end,
+    so a person returning later is recognized afresh.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_centre_distance: float = 1.0,
+                 max_age: float = 3.0, reverify_interval: float = 10.0,
+                 confirm_confidence: float = 0.7):
+        self.iou_threshold = iou_threshold
+        self.max_centre_distance = max_centre_distance
+        self.max_age = max_age
+        self.reverify_interval = reverify_interval
+        self.confirm_confidence = confirm_confidence
+
+        self.tracks: Dict[int, FaceTrack] = {}
+        self._track_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {'faces': 0, 'encoded': 0, 'carried': 0, 'tracks_started': 0}
+
+    def _is_confirmed(self, track: FaceTrack, now: float) -> bool:
+        return (track.employee_id is not None
+                and track.confidence >= self.confirm_confidence
+                and now - track.verified_at < self.reverify_interval)
+
+    def confirmed_locations(self, now: float) -> List[Location]:
+        """Last boxes of confirmed tracks; faces found there need no encoding"""
+        with self._lock:
+            return [track.location for track in self.tracks.values()
+                    if self._is_confirmed(track, now) and now - track.last_seen <= self.max_age]
+
+    def _associate(self, locations: List[Location]) -> List[Optional[FaceTrack]]:
+        """Existing track for each location, None for new faces"""
+        pairs = []
+        for index, location in enumerate(locations):
+            for track in self.tracks.values():
+                iou = location_iou(track.location, location)
+                if iou >= self.iou_threshold:
+                    pairs.append((0, -iou, index, track))
+                else:
+                    distance = _centre_distance(track.location, location)
+                    if distance <= self.max_centre_distance:
+                        pairs.append((1, distance, index, track))
+        pairs.sort(key=lambda pair: pair[:2])
+
+        assigned: List[Optional[FaceTrack]] = [None] * len(locations)
+        used = set()
+        for _, _, index, track in pairs:
+            if assigned[index] is None and track.track_id not in used:
+                assigned[index] = track
+                used.add(track.track_id)
+        return assigned
+
+    def process(self, faces: List[Dict], now: float,
+                match_faces: Callable[[List[Dict]], List[Dict]]) -> List[Dict]:
+        """Track analyzed faces and return a match for every identified face
+
+        faces come from AdvancedEnrollmentService.analyze_faces; those without
+        an encoding were skipped because they sat on a confirmed track.
+        match_faces is only called for the faces that were encoded.
+        """
+        with self._lock:
+            return self._process(faces, now, match_faces)
+
+    def _process(self, faces: List[Dict], now: float,
+                 match_faces: Callable[[List[Dict]], List[Dict]]) -> List[Dict]:
+        # End tracks that have not been seen for a while
+        for track_id in [track_id for track_id, track in self.tracks.items()
+                         if now - track.last_seen > self.max_age]:
+            del self.tracks[track_id]
+
+        locations = [tuple(face['face_location']) for face in faces]
+        tracks = self._associate(locations)
+        for index, location in enumerate(locations):
+            if tracks[index] is None:
+                track = FaceTrack(next(self._track_ids), location, now, now)
+                self.tracks[track.track_id] = track
+                tracks[index] = track
+                self.stats['tracks_started'] += 1
+            tracks[index].location = location
+            tracks[index].last_seen = now
+
+        encoded = [face for face in faces if face.get('face_encoding') is not None]
+        self.stats['faces'] += len(faces)
+        self.stats['encoded'] += len(encoded)
+        self.stats['carried'] += len(faces) - len(encoded)
+
+        track_by_location = {location: track for location, track in zip(locations, tracks)}
+        for match in match_faces(encoded) if encoded else []:
+            track = track_by_location.get(tuple(match['face_location']))
+            if track is not None:
+                track.employee_id = match['employee_id']
+                track.employee_name = match['employee_name']
+                track.confidence = match['confidence']
+                track.verified_at = now
+                track.detection_characteristics = match.get('detection_characteristics')
+
+        # An encoded face that no longer matches loses the identity of its track
+        for face, track in zip(faces, tracks):
+            if face.get('face_encoding') is not None and track.verified_at != now:
+                track.employee_id = track.employee_name = None
+                track.confidence = 0.0
+
+        return [
+            {
+                'employee_id': track.employee_id,
+                'employee_name': track.employee_name,
+                'confidence': track.confidence,
+                'face_location': track.location,
+                'detection_characteristics': track.detection_characteristics,
+                'track_id': track.track_id,
+                'tracked': face.get('face_encoding') is None
+            }
+            for face, track in zip(faces, tracks)
+            if track.employee_id is not None
+        ]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['active_tracks'] = len(self.tracks)
+            return stats
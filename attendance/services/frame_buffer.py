@@ -0,0 +1,96 @@
+"""
+Latest-frame ring buffer for camera capture
+Capture decodes into preallocated slots; readers always get the newest frame
+"""
+
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+@dataclass
+class FrameRef:
+    sequence: int
+    timestamp: float
+    frame: np.ndarray
+    slot: int
+
+class FrameRingBuffer:
+    """Fixed set of reusable frame slots where the newest frame wins
+
+    The capture thread asks for a writable slot, decodes straight into it and
+    publishes it with a new sequence number. Readers pin the newest slot and
+    use it without copying; older frames are simply overwritten. The writer
+    never touches the newest slot or a pinned one, so a pinned frame stays
+    intact until it is released. If every slot is pinned, a slot is added.
+    """
+
+    def __init__(self, slots: int = 4):
+        self._frames: List[Optional[np.ndarray]] = [None] * max(slots, 2)
+        self._timestamps = [0.0] * len(self._frames)
+        self._sequences = [0] * len(self._frames)
+        self._pins = [0] * len(self._frames)
+        self._latest = -1
+        self._lock = threading.Lock()
+        self.sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def writable(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Next slot to decode into as (slot, array); array is None until first filled"""
+        with self._lock:
+            count = len(self._frames)
+            for step in range(1, count + 1):
+                slot = (self._latest + step) % count
+                if slot != self._latest and not self._pins[slot]:
+                    return slot, self._frames[slot]
+
+            self._frames.append(None)
+            self._timestamps.append(0.0)
+            self._sequences.append(0)
+            self._pins.append(0)
+            return count, None
+
+    def publish(self, slot: int, frame: np.ndarray, timestamp: float) -> int:
+        """Make a written slot the newest frame and return its sequence number
+
+        frame replaces the slot's array when the decoder had to allocate a new
+        one (first frame or a resolution change).
+        """
+        with self._lock:
+            self.sequence += 1
+            self._frames[slot] = frame
+            self._timestamps[slot] = timestamp
+            self._sequences[slot] = self.sequence
+            self._latest = slot
+            return self.sequence
+
+    def read(self) -> Optional[FrameRef]:
+        """Pin and return the newest frame, None before the first frame
+
+        The frame must not be modified and must be given back with release().
+        """
+        with self._lock:
+            slot = self._latest
+            if slot < 0:
+                return None
+            self._pins[slot] += 1
+            return FrameRef(self._sequences[slot], self._timestamps[slot], self._frames[slot], slot)
+
+    def release(self, ref: FrameRef):
+        """Unpin a frame returned by read()"""
+        with self._lock:
+            self._pins[ref.slot] -= 1
+
+    @contextmanager
+    def latest(self) -> Iterator[Optional[FrameRef]]:
+        """Pin the newest frame for the duration of a with block"""
+        ref = self.read()
+        try:
+            yield ref
+        finally:
+            if ref is not None:
+                self.release(ref)
@@ -0,0 +1,304 @@
+"""
+Shared inference scheduler for camera face detection
+Runs detection for every camera stream on one bounded worker pool
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _worker_context():
+    # Forking the threaded web server can leave a worker holding a copy of a
+    # lock another thread had taken; forkserver starts workers from a clean
+    # process instead, spawn where it is not available
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+def _run_timed(task: Callable, *args) -> Tuple[Any, float]:
+    """Run a task in a worker process, returning its result and the CPU seconds it used"""
+    started = time.process_time()
+    result = task(*args)
+    return result, time.process_time() - started
+
+@dataclass
+class InferenceJob:
+    camera_id: str
+    task: Callable
+    args: Tuple
+    callback: Callable[['InferenceJob', Any, Optional[Exception]], None]
+    context: Dict = field(default_factory=dict)
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    retries: int = 0
+    cpu_seconds: Optional[float] = None  # CPU used in a worker process
+
+class InferenceScheduler:
+    """Runs per-camera inference jobs on a bounded worker pool
+
+    Every camera has a single latest-frame slot: submitting a new job replaces
+    one that is still waiting, so a busy pool drops stale frames instead of
+    queueing them. A dispatcher thread hands waiting slots to the pool in
+    round-robin order, with at most one job in flight per camera and at most
+    `workers` jobs overall. Worker processes sidestep the GIL for dlib
+    detection; tasks must be picklable module-level functions in that mode.
+    Callbacks run on a small result thread pool in this process. Worker
+    processes report the CPU time each job used, totalled in the stats, as
+    it does not show up in this process's own CPU time.
+
+    A worker process that dies (a crash in native code, the OOM killer)
+    breaks the whole process pool; the pool is then replaced and the jobs
+    it took down are run once more.
+    """
+
+    MAX_RETRIES = 1
+
+    def __init__(self, workers: int = 0, use_processes: bool = True):
+        self.workers = workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+
+        self._condition = threading.Condition()
+        self._pending: Dict[str, InferenceJob] = {}
+        self._ready = deque()
+        self._running = set()
+
+        self._executor = None
+        self._result_executor = None
+        self._dispatcher = None
+        self._stopping = False
+
+        self.stats = {
+            'submitted': 0,
+            'dropped': 0,
+            'completed': 0,
+            'failed': 0,
+            'pool_restarts': 0,
+            'worker_cpu_seconds': 0.0,
+            'cameras': {}
+        }
+
+    def init_app(self, app):
+        """Configure pool size and mode from the Flask app"""
+        workers = app.config.get('INFERENCE_WORKERS', 0)
+        use_processes = app.config.get('INFERENCE_USE_PROCESSES', True)
+        if self._executor is not None and (workers or self.workers) == self.workers and use_processes == self.use_processes:
+            return
+        self.stop()
+        self.workers = workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+
+    def start(self):
+        """Start the worker pool and dispatcher"""
+        with self._condition:
+            if self._dispatcher is not None:
+                return
+
+            if self.use_processes:
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_worker_context())
+                except (OSError, NotImplementedError) as e:
+                    logger.warning(f"Process pool unavailable ({e}), using threads for inference")
+                    self.use_processes = False
+            if not self.use_processes:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+            self._result_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='inference-results')
+
+            self._stopping = False
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True, name='InferenceDispatcher')
+            self._dispatcher.start()
+
+        logger.info(f"Inference scheduler started with {self.workers} "
+                    f"{'processes' if self.use_processes else 'threads'}")
+
+    def stop(self):
+        """Stop dispatching and shut the pools down, dropping waiting jobs"""
+        with self._condition:
+            if self._dispatcher is None:
+                return
+            self._stopping = True
+            self._pending.clear()
+            self._ready.clear()
+            self._condition.notify_all()
+            dispatcher = self._dispatcher
+
+        dispatcher.join(timeout=5)
+        self._executor.shutdown(wait=True)
+        self._result_executor.shutdown(wait=True)
+
+        with self._condition:
+            self._dispatcher = None
+            self._executor = None
+            self._result_executor = None
+            self._running.clear()
+
+        logger.info("Inference scheduler stopped")
+
+    def submit(self, camera_id: str, task: Callable, args: Tuple,
+               callback: Callable[[InferenceJob, Any, Optional[Exception]], None],
+               context: Dict = None) -> InferenceJob:
+        """Put a job in the camera's slot, replacing a job that has not started yet"""
+        if self._dispatcher is None:
+            self.start()
+
+        job = InferenceJob(camera_id, task, args, callback, context or {})
+        with self._condition:
+            camera_stats = self.stats['cameras'].setdefault(
+                camera_id, {'submitted': 0, 'dropped': 0, 'completed': 0, 'failed': 0, 'last_latency': 0.0}
+            )
+            self.stats['submitted'] += 1
+            camera_stats['submitted'] += 1
+
+            if camera_id in self._pending:
+                self.stats['dropped'] += 1
+                camera_stats['dropped'] += 1
+            elif camera_id not in self._running:
+                self._ready.append(camera_id)
+            self._pending[camera_id] = job
+            self._condition.notify()
+        return job
+
+    def is_busy(self, camera_id: str) -> bool:
+        """Whether the camera has a job waiting or running"""
+        with self._condition:
+            return camera_id in self._pending or camera_id in self._running
+
+    def get_stats(self) -> Dict:
+        """Get scheduler statistics"""
+        with self._condition:
+            return {
+                'workers': self.workers,
+                'mode': 'processes' if self.use_processes else 'threads',
+                'running': len(self._running),
+                'waiting': len(self._pending),
+                'submitted': self.stats['submitted'],
+                'dropped': self.stats['dropped'],
+                'completed': self.stats['completed'],
+                'failed': self.stats['failed'],
+                'pool_restarts': self.stats['pool_restarts'],
+                'worker_cpu_seconds': self.stats['worker_cpu_seconds'],
+                'cameras': {
+                    camera_id: dict(camera_stats, waiting=int(camera_id in self._pending),
+                                    running=int(camera_id in self._running))
+                    for camera_id, camera_stats in self.stats['cameras'].items()
+                }
+            }
+
+    def _dispatch_loop(self):
+        """Hand waiting jobs to the pool, one camera at a time in turn"""
+        while True:
+            with self._condition:
+                while not self._stopping and (not self._ready or len(self._running) >= self.workers):
+                    self._condition.wait()
+                if self._stopping:
+                    return
+
+                camera_id = self._ready.popleft()
+                job = self._pending.pop(camera_id)
+                self._running.add(camera_id)
+                executor = self._executor
+            job.started_at = time.time()
+
+            try:
+                if isinstance(executor, ProcessPoolExecutor):
+                    future = executor.submit(_run_timed, job.task, *job.args)
+                else:
+                    future = executor.submit(job.task, *job.args)
+            except BrokenProcessPool as e:
+                self._recover_pool(executor, job, e)
+                continue
+            except Exception as e:
+                self._finish(job, None, e)
+                continue
+            future.add_done_callback(lambda future, job=job, executor=executor: self._on_done(job, future, executor))
+
+    def _on_done(self, job: InferenceJob, future, executor):
+        """Collect a finished job and hand its result to the callback"""
+        try:
+            result, error = future.result(), None
+            if isinstance(executor, ProcessPoolExecutor):
+                result, job.cpu_seconds = result
+        except BrokenProcessPool as e:
+            self._recover_pool(executor, job, e)
+            return
+        except Exception as e:
+            result, error = None, e
+        self._finish(job, result, error)
+
+    def _recover_pool(self, executor, job: InferenceJob, error: Exception):
+        """Replace a process pool broken by a dead worker and queue the job again
+
+        Every job in flight on the broken pool ends up here; only the first
+        replaces the pool. A job is retried once, and not at all if a newer
+        frame for its camera is already waiting.
+        """
+        broken = None
+        with self._condition:
+            if self._stopping:
+                retry = False
+            else:
+                if self._executor is executor:
+                    logger.warning(f"Inference worker died ({error}), restarting the process pool")
+                    broken = executor
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_worker_context())
+                    self.stats['pool_restarts'] += 1
+                retry = job.retries < self.MAX_RETRIES and job.camera_id not in self._pending
+                if retry:
+                    job.retries += 1
+                    self._running.discard(job.camera_id)
+                    self._pending[job.camera_id] = job
+                    self._ready.append(job.camera_id)
+                    self._condition.notify()
+
+        if broken is not None:
+            # Called from the pool's own management thread: do not wait for it
+            broken.shutdown(wait=False)
+        if not retry:
+            self._finish(job, None, error)
+
+    def _finish(self, job: InferenceJob, result: Any, error: Optional[Exception]):
+        job.finished_at = time.time()
+        with self._condition:
+            self._running.discard(job.camera_id)
+            if job.camera_id in self._pending:
+                self._ready.append(job.camera_id)
+
+            camera_stats = self.stats['cameras'][job.camera_id]
+            if error is None:
+                self.stats['completed'] += 1
+                camera_stats['completed'] += 1
+            else:
+                self.stats['failed'] += 1
+                camera_stats['failed'] += 1
+            camera_stats['last_latency'] = time.time() - job.submitted_at
+            if job.cpu_seconds is not None:
+                self.stats['worker_cpu_seconds'] += job.cpu_seconds
+            self._condition.notify()
+            result_executor = self._result_executor
+
+        if error is not None:
+            logger.error(f"Inference job failed for camera {job.camera_id}: {error}")
+
+        try:
+            result_executor.submit(self._run_callback, job, result, error)
+        except RuntimeError:
+            pass  # Shutting down
+
+    @staticmethod
+    def _run_callback(job: InferenceJob, result: Any, error: Optional[Exception]):
+        try:
+            job.callback(job, result, error)
+        except Exception as e:
+            logger.error(f"Error in inference callback for camera {job.camera_id}: {e}")
+
+# Global instance shared by all camera services
+inference_scheduler = InferenceScheduler()
@@ -15,9 +15,14 @@ from dataclasses import dataclass
 from datetime import datetime
 
 from .face_recognition import face_service
-from .advanced_enrollment import AdvancedEnrollmentService
+from .advanced_enrollment import AdvancedEnrollmentService, analyze_frame_faces
 from .zone_attendance import ZoneAttendanceService
 from .database import db_service
+from .inference_scheduler import InferenceJob, inference_scheduler
+from .motion_gate import MotionGate
+from .face_tracker import FaceTracker
+from .pipeline_metrics import pipeline_metrics
+from .stream_supervisor import stream_supervisor
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +36,8 @@ class LiveCameraConfig:
     recognition_interval: float = 2.0  # seconds between face recognition attempts
     confidence_threshold: float = 0.7
     frame_skip: int = 5  # process every 5th frame for performance
+    motion_gating: bool = True  # only run face detection on frames with motion
+    detection_scale: float = 1.0  # resize factor for face detection, e.g. 0.5 for 1080p streams
 
 @dataclass
 class RecognitionEvent:
@@ -59,6 +66,21 @@ class LiveCameraRecognitionService:
         # Recognition state
         self.last_recognitions: Dict[str, Dict] = {}  # Prevent duplicate recognitions
         self.recognition_cooldown = 10.0  # seconds before recognizing same person again
+        self.last_recognition_times: Dict[str, float] = {}
+        self.motion_gates: Dict[str, MotionGate] = {}
+        self.face_trackers: Dict[str, FaceTracker] = {}
+        
+        # Stream connections are kept alive by the shared supervisor
+        self.stream_supervisor = stream_supervisor
+        self.stream_stats: Dict[str, Dict] = {}
+        self.max_read_failures = 5  # Consecutive failed reads before reconnecting
+        
+        # Per-stage timings, exported by the metrics endpoints
+        self.metrics = pipeline_metrics
+        self.metrics.add_gauge_source(self._metric_gauges)
+        
+        # Face analysis for every stream runs on the shared inference pool
+        self.inference_scheduler = inference_scheduler
         
         # Event callbacks
         self.recognition_callbacks: List[Callable] = []
@@ -84,7 +106,9 @@ class LiveCameraRecognitionService:
                         enabled=camera_data.get('enabled', True),
                         recognition_interval=camera_data.get('recognition_interval', 2.0),
                         confidence_threshold=camera_data.get('confidence_threshold', 0.7),
-                        frame_skip=camera_data.get('frame_skip', 5)
+                        frame_skip=camera_data.get('frame_skip', 5),
+                        motion_gating=camera_data.get('motion_gating', True),
+                        detection_scale=camera_data.get('detection_scale', 1.0)
                     )
                     
                     # Add to active cameras (without saving to DB again)
@@ -139,6 +163,8 @@ class LiveCameraRecognitionService:
                     'recognition_interval': camera_config.recognition_interval,
                     'confidence_threshold': camera_config.confidence_threshold,
                     'frame_skip': camera_config.frame_skip,
+                    'motion_gating': camera_config.motion_gating,
+                    'detection_scale': camera_config.detection_scale,
                     'created_at': datetime.now().isoformat()
                 }
                 logger.info(f"Attempting to save camera data: {camera_data}")
@@ -416,91 +442,148 @@ class LiveCameraRecognitionService:
         
         logger.info(f"Starting recognition worker for camera {camera_config.name}")
         
-        cap = None
         frame_count = 0
-        last_recognition_time = 0
+        self.last_recognition_times[camera_id] = 0
+        motion_gate = MotionGate() if camera_config.motion_gating else None
+        if motion_gate:
+            self.motion_gates[camera_id] = motion_gate
+        else:
+            self.motion_gates.pop(camera_id, None)
+        face_tracker = self.face_trackers[camera_id] = FaceTracker()
         
-        try:
-            # Try to initialize video capture with primary URL
-            cap = cv2.VideoCapture(camera_config.stream_url)
-            
-            if not cap.isOpened():
-                logger.warning(f"Primary stream URL failed: {camera_config.stream_url}")
-                
-                # If the primary URL looks like a web page, try alternative URLs
-                if camera_config.stream_url.endswith('.html') or '/webcamera.html' in camera_config.stream_url:
-                    logger.info(f"Trying alternative stream URLs for {camera_config.name}")
-                    alternative_urls = self._generate_stream_urls(camera_config.stream_url)
-                    
-                    for alt_url in alternative_urls:
-                        logger.info(f"Attempting stream URL: {alt_url}")
-                        cap = cv2.VideoCapture(alt_url)
-                        
-                        if cap.isOpened():
-                            ret, test_frame = cap.read()
-                            if ret and test_frame is not None:
-                                logger.info(f"Successfully connected using: {alt_url}")
-                                camera_config.stream_url = alt_url  # Update the config
-                                break
-                            else:
-                                cap.release()
-                        else:
-                            cap.release()
-                    
-                    if not cap.isOpened():
-                        logger.error(f"All stream URLs failed for camera: {camera_config.name}")
-                        return
-                else:
-                    logger.error(f"Failed to open camera stream: {camera_config.stream_url}")
-                    return
+        # Pages such as webcamera.html are not streams; probe the usual stream paths of the camera too
+        candidate_urls = [camera_config.stream_url]
+        if camera_config.stream_url.endswith('.html') or '/webcamera.html' in camera_config.stream_url:
+            candidate_urls += self._generate_stream_urls(camera_config.stream_url)
+        stream_stats = self.stream_stats[camera_id] = {'connected': False, 'url': None, 'reconnects': 0, 'stalls': 0}
+        
+        while not stop_flag.is_set():
+            # Retries with backoff until one of the URLs answers or the camera is stopped
+            connection = self.stream_supervisor.connect(f"live_{camera_id}", candidate_urls, stop_flag.is_set)
+            if connection is None:
+                break
+            cap, stream_url = connection
+            
+            if stream_stats['url'] is not None:
+                stream_stats['reconnects'] += 1
+                self.metrics.count('live', camera_id, 'reconnects')
+                if motion_gate:
+                    motion_gate.reset()
+            stream_stats.update(connected=True, url=stream_url)
             
             # Set capture properties for better performance
             cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer size for real-time
             cap.set(cv2.CAP_PROP_FPS, 15)       # Limit FPS for performance
             
-            logger.info(f"Successfully connected to camera stream: {camera_config.name}")
+            logger.info(f"Successfully connected to camera stream: {camera_config.name} ({stream_url})")
             
-            while not stop_flag.is_set():
-                ret, frame = cap.read()
-                if not ret:
-                    logger.warning(f"Failed to read frame from camera {camera_id}")
-                    time.sleep(1)  # Wait before retrying
-                    continue
-                
-                frame_count += 1
-                current_time = time.time()
-                
-                # Skip frames for performance
-                if frame_count % camera_config.frame_skip != 0:
-                    continue
-                
-                # Check recognition interval
-                if current_time - last_recognition_time < camera_config.recognition_interval:
-                    continue
-                
-                # Process frame for face recognition
-                try:
-                    recognition_result = self._process_frame_for_recognition(
-                        frame, camera_config, current_time
-                    )
+            # The watchdog flags the capture as stalled if frames stop arriving
+            watch = self.stream_supervisor.watch(f"live_{camera_id}", cap)
+            read_failures = 0
+            
+            try:
+                while not stop_flag.is_set() and not watch.stalled:
+                    with self.metrics.time('live', camera_id, 'capture'):
+                        ret, frame = cap.read()
+                    if not ret:
+                        logger.warning(f"Failed to read frame from camera {camera_id}")
+                        self.metrics.count('live', camera_id, 'read_errors')
+                        read_failures += 1
+                        if read_failures >= self.max_read_failures:
+                            break
+                        time.sleep(1)  # Wait before retrying
+                        continue
                     
-                    if recognition_result:
-                        self._handle_recognition_event(recognition_result)
-                        last_recognition_time = current_time
-                
-                except Exception as e:
-                    logger.error(f"Error processing frame for camera {camera_id}: {e}")
-                
-                # Small delay to prevent excessive CPU usage
-                time.sleep(0.1)
+                    read_failures = 0
+                    watch.frame_received()
+                    self.metrics.count('live', camera_id, 'frames')
+                    frame_count += 1
+                    current_time = time.time()
+                    
+                    # Skip frames for performance
+                    if frame_count % camera_config.frame_skip != 0:
+                        continue
+                    
+                    # Check recognition interval
+                    if current_time - self.last_recognition_times.get(camera_id, 0) < camera_config.recognition_interval:
+                        continue
+                    
+                    # Skip face detection while nothing in the scene changes
+                    regions = None
+                    if motion_gate:
+                        with self.metrics.time('live', camera_id, 'motion'):
+                            has_motion, regions = motion_gate.check(frame)
+                        if not has_motion:
+                            self.metrics.count('live', camera_id, 'motion_skipped')
+                            continue
+                    
+                    # Queue frame for face recognition; a newer frame replaces it
+                    # if the shared pool has not picked it up yet
+                    if self.enrollment_service:
+                        self.metrics.count('live', camera_id, 'submitted')
+                        self.inference_scheduler.submit(
+                            f"live_{camera_id}",
+                            analyze_frame_faces,
+                            (str(self.enrollment_service.data_dir), frame, camera_id, regions,
+                             camera_config.detection_scale, (0, 0),
+                             face_tracker.confirmed_locations(current_time)),
+                            self._on_frame_analyzed,
+                            context={'camera_config': camera_config, 'timestamp': current_time}
+                        )
+                    
+                    # Small delay to prevent excessive CPU usage
+                    time.sleep(0.1)
+            
+            except Exception as e:
+                logger.error(f"Camera worker error for {camera_id}: {e}")
+            
+            finally:
+                self.stream_supervisor.unwatch(watch)
+                cap.release()
+                stream_stats['connected'] = False
+            
+            if watch.stalled:
+                stream_stats['stalls'] += 1
+                self.metrics.count('live', camera_id, 'stalls')
+            if not stop_flag.is_set():
+                logger.warning(f"Lost stream of camera {camera_config.name}, reconnecting")
         
-        except Exception as e:
-            logger.error(f"Camera worker error for {camera_id}: {e}")
+        logger.info(f"Camera worker stopped for {camera_id}")
+    
+    def _on_frame_analyzed(self, job: InferenceJob, result: Optional[Dict], error: Optional[Exception]):
+        """Match the faces analyzed by the inference pool and handle the event"""
+        if error is not None or not self.enrollment_service:
+            return
         
-        finally:
-            if cap:
-                cap.release()
-            logger.info(f"Camera worker stopped for {camera_id}")
+        camera_config = job.context['camera_config']
+        camera_id = camera_config.camera_id
+        timestamp = job.context['timestamp']
+        try:
+            self.metrics.observe('live', camera_id, 'queue_wait', job.started_at - job.submitted_at)
+            self.metrics.observe('live', camera_id, 'inference', job.finished_at - job.started_at)
+            for stage, seconds in result['timings'].items():
+                self.metrics.observe('live', camera_id, stage, seconds)
+            
+            faces = result['faces']
+            face_tracker = self.face_trackers.get(camera_id)
+            with self.metrics.time('live', camera_id, 'matching'):
+                if face_tracker is not None:
+                    matches = face_tracker.process(faces, timestamp, self.enrollment_service.match_analyzed_faces)
+                    recognition_result = max(matches, key=lambda match: match['confidence']) if matches else None
+                else:
+                    recognition_result = self.enrollment_service.match_analyzed_employee(faces)
+            recognition_event = self._create_recognition_event(recognition_result, camera_config, timestamp)
+            
+            if recognition_event:
+                self.metrics.count('live', camera_id, 'detections')
+                with self.metrics.time('live', camera_id, 'zone_write'):
+                    self._handle_recognition_event(recognition_event)
+                self.last_recognition_times[camera_id] = timestamp
+            
+            self.metrics.observe('live', camera_id, 'end_to_end', time.time() - timestamp)
+        
+        except Exception as e:
+            logger.error(f"Error processing frame for camera {camera_config.camera_id}: {e}")
     
     def _process_frame_for_recognition(self, frame: np.ndarray, 
                                      camera_config: LiveCameraConfig, 
@@ -512,35 +595,7 @@ class LiveCameraRecognitionService:
                 recognition_result = self.enrollment_service.recognize_employee(
                     frame, camera_config.camera_id
                 )
-                
-                if recognition_result and recognition_result['confidence'] >= camera_config.confidence_threshold:
-                    # Check for duplicate recognition (cooldown)
-                    employee_id = recognition_result['employee_id']
-                    last_recognition = self.last_recognitions.get(
-                        f"{camera_config.camera_id}_{employee_id}"
-                    )
-                    
-                    if last_recognition and (timestamp - last_recognition['timestamp']) < self.recognition_cooldown:
-                        return None  # Skip duplicate recognition
-                    
-                    # Create recognition event
-                    event = RecognitionEvent(
-                        camera_id=camera_config.camera_id,
-                        employee_id=employee_id,
-                        employee_name=recognition_result['employee_name'],
-                        confidence=recognition_result['confidence'],
-                        timestamp=datetime.fromtimestamp(timestamp),
-                        zone_id=camera_config.zone_id,
-                        face_location=recognition_result['face_location']
-                    )
-                    
-                    # Update last recognition
-                    self.last_recognitions[f"{camera_config.camera_id}_{employee_id}"] = {
-                        'timestamp': timestamp,
-                        'confidence': recognition_result['confidence']
-                    }
-                    
-                    return event
+                return self._create_recognition_event(recognition_result, camera_config, timestamp)
             
             return None
             
@@ -548,6 +603,41 @@ class LiveCameraRecognitionService:
             logger.error(f"Frame processing error: {e}")
             return None
     
+    def _create_recognition_event(self, recognition_result: Optional[Dict],
+                                  camera_config: LiveCameraConfig,
+                                  timestamp: float) -> Optional[RecognitionEvent]:
+        """Turn a recognition match into an event, applying threshold and cooldown"""
+        if not recognition_result or recognition_result['confidence'] < camera_config.confidence_threshold:
+            return None
+        
+        # Check for duplicate recognition (cooldown)
+        employee_id = recognition_result['employee_id']
+        last_recognition = self.last_recognitions.get(
+            f"{camera_config.camera_id}_{employee_id}"
+        )
+        
+        if last_recognition and (timestamp - last_recognition['timestamp']) < self.recognition_cooldown:
+            return None  # Skip duplicate recognition
+        
+        # Create recognition event
+        event = RecognitionEvent(
+            camera_id=camera_config.camera_id,
+            employee_id=employee_id,
+            employee_name=recognition_result['employee_name'],
+            confidence=recognition_result['confidence'],
+            timestamp=datetime.fromtimestamp(timestamp),
+            zone_id=camera_config.zone_id,
+            face_location=recognition_result['face_location']
+        )
+        
+        # Update last recognition
+        self.last_recognitions[f"{camera_config.camera_id}_{employee_id}"] = {
+            'timestamp': timestamp,
+            'confidence': recognition_result['confidence']
+        }
+        
+        return event
+    
     def _handle_recognition_event(self, event: RecognitionEvent):
         """Handle a recognition event"""
         try:
@@ -582,6 +672,27 @@ class LiveCameraRecognitionService:
         """Add a callback function for recognition events"""
         self.recognition_callbacks.append(callback)
     
+    def _metric_gauges(self):
+        """Queue depths and drop counts per camera for the pipeline metrics"""
+        inference_cameras = self.inference_scheduler.get_stats()['cameras']
+        rows = []
+        for camera_id in list(self.active_cameras):
+            inference = inference_cameras.get(f"live_{camera_id}", {})
+            thread = self.camera_threads.get(camera_id)
+            stream = self.stream_stats.get(camera_id, {})
+            rows.extend([
+                ('live', camera_id, 'running', float(bool(thread and thread.is_alive()))),
+                ('live', camera_id, 'connected', float(bool(stream.get('connected')))),
+                ('live', camera_id, 'inference_waiting', inference.get('waiting', 0)),
+                ('live', camera_id, 'inference_running', inference.get('running', 0)),
+                ('live', camera_id, 'inference_dropped', inference.get('dropped', 0))
+            ])
+        return rows
+    
+    def get_pipeline_metrics(self) -> Dict:
+        """Per-stage latency percentiles, counters and queue depths of the live cameras"""
+        return self.metrics.snapshot().get('live', {})
+    
     def get_camera_status(self) -> Dict[str, Dict]:
         """Get status of all cameras"""
         status = {}
@@ -597,6 +708,12 @@ class LiveCameraRecognitionService:
                 'zone_id': config.zone_id,
                 'last_recognition': self.last_recognitions.get(camera_id, {})
             }
+            if camera_id in self.motion_gates:
+                status[camera_id]['motion'] = self.motion_gates[camera_id].get_stats()
+            if camera_id in self.face_trackers:
+                status[camera_id]['tracking'] = self.face_trackers[camera_id].get_stats()
+            if camera_id in self.stream_stats:
+                status[camera_id]['stream'] = dict(self.stream_stats[camera_id])
         
         return status
     
@@ -0,0 +1,115 @@
+"""
+MJPEG streaming for camera live view
+One JPEG encoder per camera, shared by every viewer of that camera
+"""
+
+import cv2
+import threading
+import time
+import logging
+from typing import Callable, ContextManager, Dict, Iterator, Optional
+
+from .frame_buffer import FrameRef
+
+logger = logging.getLogger(__name__)
+
+class MJPEGBroadcaster:
+    """Encodes a camera's newest frame once and fans it out to all viewers
+
+    The encoder thread starts with the first viewer and stops once nobody has
+    been watching for idle_timeout seconds. It encodes at most max_fps frames
+    a second and only when the camera has produced a new frame, so the cost
+    does not grow with the number of viewers.
+    """
+
+    BOUNDARY = 'frame'
+
+    def __init__(self, read_frame: Callable[[], ContextManager[Optional[FrameRef]]],
+                 quality: int = 80, max_fps: float = 10.0, idle_timeout: float = 10.0):
+        self.read_frame = read_frame
+        self.quality = quality
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+
+        self._condition = threading.Condition()
+        self._jpeg: Optional[bytes] = None
+        self._sequence = 0
+        self._viewers = 0
+        self._last_viewer = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self.encoded_frames = 0
+
+    def get_stats(self) -> Dict:
+        return {
+            'viewers': self._viewers,
+            'encoded_frames': self.encoded_frames,
+            'running': self._thread is not None,
+            'quality': self.quality,
+            'max_fps': self.max_fps
+        }
+
+    def _encode_loop(self):
+        last_frame_sequence = None
+        while True:
+            started = time.time()
+            with self._condition:
+                if not self._viewers and started - self._last_viewer > self.idle_timeout:
+                    self._thread = None
+                    return
+
+            jpeg = None
+            with self.read_frame() as frame_ref:
+                if frame_ref is not None and frame_ref.sequence != last_frame_sequence:
+                    last_frame_sequence = frame_ref.sequence
+                    ok, buffer = cv2.imencode('.jpg', frame_ref.frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                    if ok:
+                        jpeg = buffer.tobytes()
+
+            if jpeg is not None:
+                with self._condition:
+                    self._jpeg = jpeg
+                    self._sequence += 1
+                    self.encoded_frames += 1
+                    self._condition.notify_all()
+
+            remaining = 1.0 / self.max_fps - (time.time() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+    def _add_viewer(self):
+        with self._condition:
+            self._viewers += 1
+            self._last_viewer = time.time()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._encode_loop, daemon=True, name='MJPEGEncoder')
+                self._thread.start()
+
+    def _remove_viewer(self):
+        with self._condition:
+            self._viewers -= 1
+            self._last_viewer = time.time()
+
+    def stream(self) -> Iterator[bytes]:
+        """multipart/x-mixed-replace body for one viewer, ends if the camera stalls"""
+        self._add_viewer()
+        try:
+            sequence = 0
+            idle_waits = 0
+            while True:
+                with self._condition:
+                    if self._sequence == sequence:
+                        self._condition.wait(timeout=5.0)
+                    if self._sequence == sequence:
+                        idle_waits += 1
+                        if idle_waits >= 6:
+                            return  # No frame for 30 seconds
+                        continue
+                    sequence, jpeg = self._sequence, self._jpeg
+                    idle_waits = 0
+
+                yield (b'--' + self.BOUNDARY.encode() + b'\r\n'
+                       b'Content-Type: image/jpeg\r\n'
+                       b'Content-Length: ' + str(len(jpeg)).encode() + b'\r\n\r\n'
+                       + jpeg + b'\r\n')
+        finally:
+            self._remove_viewer()
@@ -0,0 +1,128 @@
+"""
+Motion gating for camera face detection
+Skips face detection on frames where nothing in the scene has changed
+"""
+
+import time
+import cv2
+import numpy as np
+from typing import List, Optional, Tuple
+
+# Face region as (top, right, bottom, left), like face_recognition locations
+Region = Tuple[int, int, int, int]
+
+class MotionGate:
+    """Cheap motion check in front of face detection
+
+    Each checked frame is reduced to a small blurred grayscale image and
+    compared with a running-average background. When the share of changed
+    pixels reaches motion_threshold the frame passes, together with the
+    padded bounding boxes of the changed areas in full-frame coordinates, so
+    detection can look only there. An empty scene costs one tiny resize and
+    difference per check, and checks are spaced at least check_interval
+    seconds apart; frames in between are skipped without being looked at.
+    """
+
+    def __init__(self, width: int = 160, motion_threshold: float = 0.005,
+                 pixel_threshold: int = 25, background_rate: float = 0.05,
+                 region_padding: float = 0.5, max_regions: int = 4,
+                 check_interval: float = 0.2):
+        self.width = width
+        self.motion_threshold = motion_threshold
+        self.pixel_threshold = pixel_threshold
+        self.background_rate = background_rate
+        self.region_padding = region_padding
+        self.max_regions = max_regions
+        self.check_interval = check_interval
+
+        self._background: Optional[np.ndarray] = None
+        self._last_check = 0.0
+        self._mask: Optional[np.ndarray] = None
+        self._small_mask: Optional[np.ndarray] = None
+        self.checked = 0
+        self.skipped = 0
+        self.last_score = 0.0
+
+    @property
+    def skip_rate(self) -> float:
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            'checked': self.checked,
+            'skipped': self.skipped,
+            'skip_rate': self.skip_rate,
+            'last_score': self.last_score
+        }
+
+    def reset(self):
+        """Forget the background, e.g. after a reconnect"""
+        self._background = None
+
+    def set_mask(self, mask: Optional[np.ndarray]):
+        """Only count motion where the full-frame mask is non-zero, None for everywhere"""
+        self._mask = mask
+        self._small_mask = None
+
+    def _small_gray(self, frame: np.ndarray) -> np.ndarray:
+        # Shrink first so the colour conversion and blur only touch a few pixels
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def check(self, frame: np.ndarray) -> Tuple[bool, List[Region]]:
+        """Whether the frame has motion, and the regions that changed"""
+        self.checked += 1
+        now = time.time()
+        if now - self._last_check < self.check_interval:
+            self.skipped += 1
+            return False, []
+        self._last_check = now
+
+        small = self._small_gray(frame)
+
+        if self._background is None or self._background.shape != small.shape:
+            # First frame: nothing to compare against, let it through whole
+            self._background = small.astype(np.float32)
+            self.last_score = 1.0
+            return True, []
+
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(small, self._background, self.background_rate)
+        _, mask = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+
+        area = mask.size
+        if self._mask is not None:
+            if self._small_mask is None or self._small_mask.shape != mask.shape:
+                self._small_mask = cv2.resize(self._mask, (mask.shape[1], mask.shape[0]),
+                                              interpolation=cv2.INTER_NEAREST)
+            mask = cv2.bitwise_and(mask, self._small_mask)
+            area = max(cv2.countNonZero(self._small_mask), 1)
+
+        self.last_score = cv2.countNonZero(mask) / area
+        if self.last_score < self.motion_threshold:
+            self.skipped += 1
+            return False, []
+
+        return True, self._regions(mask, frame.shape[0], frame.shape[1])
+
+    def _regions(self, mask: np.ndarray, frame_height: int, frame_width: int) -> List[Region]:
+        """Padded bounding boxes of the largest changed areas, in frame pixels"""
+        mask = cv2.dilate(mask, None, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours = sorted(contours, key=cv2.contourArea, reverse=True)[:self.max_regions]
+
+        scale_x = frame_width / mask.shape[1]
+        scale_y = frame_height / mask.shape[0]
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            pad_x, pad_y = w * self.region_padding, h * self.region_padding
+            left = max(0, int((x - pad_x) * scale_x))
+            top = max(0, int((y - pad_y) * scale_y))
+            right = min(frame_width, int((x + w + pad_x) * scale_x))
+            bottom = min(frame_height, int((y + h + pad_y) * scale_y))
+            regions.append((top, right, bottom, left))
+        return regions
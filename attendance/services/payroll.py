@@ -0,0 +1,267 @@
+"""
+Payroll period hours
+Regular, overtime, late and early departure figures for every employee over a pay period
+"""
+
+import re
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..models import AttendanceRecord, Shift
+from .database import db
+from .shift_manager import shift_manager
+
+# Timestamps numpy parses exactly like datetime.fromisoformat; anything else
+# (offsets, other separators, out of range fields) takes the scalar path
+_NAIVE_ISO = re.compile(r'\d{4}-\d{2}-\d{2}[T ](?:[01]\d|2[0-3]):[0-5]\d(?::[0-5]\d(?:\.\d{1,6})?)?')
+
+# Shift fields the vectorized passes do arithmetic on
+_SHIFT_NUMBERS = ('overtime_threshold', 'break_duration', 'late_grace_period', 'early_departure_grace_period')
+
+_MINUTE_US = 60 * 1000000
+
+SUMMARY_FIELDS = ['employee_id', 'employee_name', 'department', 'records_count', 'total_regular_hours',
+                  'total_overtime_hours', 'total_hours', 'overtime_days', 'average_daily_hours',
+                  'late_count', 'late_minutes', 'early_departure_count', 'early_departure_minutes']
+
+def _parse_timestamps(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Microseconds since the epoch (wall clock) and a parsed mask"""
+    micros = np.zeros(len(values), dtype=np.int64)
+    parsed = np.zeros(len(values), dtype=bool)
+    rows = [row for row, value in enumerate(values) if isinstance(value, str) and _NAIVE_ISO.fullmatch(value)]
+    if not rows:
+        return micros, parsed
+    try:
+        micros[rows] = np.array([values[row] for row in rows], dtype='datetime64[us]').astype(np.int64)
+        parsed[rows] = True
+    except ValueError:
+        # An impossible date somewhere in the column: parse one by one
+        for row in rows:
+            try:
+                micros[row] = np.datetime64(values[row], 'us').astype(np.int64)
+                parsed[row] = True
+            except ValueError:
+                pass
+    return micros, parsed
+
+def _time_minutes(value: str) -> Optional[int]:
+    """Minutes past midnight of a shift time, as calculate_late_early_status reads it"""
+    try:
+        parsed = datetime.strptime(value, '%H:%M:%S').time()
+    except (TypeError, ValueError):
+        return None
+    return parsed.hour * 60 + parsed.minute
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """round(value, 2) for every element, bit for bit"""
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    # Away from a .5 the product's rounding error cannot change the result;
+    # at one, defer to Python's correctly rounded round()
+    ties = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for row in np.flatnonzero(ties):
+        rounded[row] = round(float(values[row]), 2)
+    return rounded
+
+class PayrollService:
+    """Hours figures for a pay period, computed in bulk
+
+    A period's completed attendance records are loaded into columns (clock
+    in/out as epoch microseconds, break minutes, weekend/holiday flags and
+    the index of each record's shift) and the rules of
+    ShiftManagerService.calculate_work_hours and calculate_late_early_status
+    are applied to all of them in array passes, then summed per employee.
+    Each record is evaluated against its shift with the scheduled start and
+    end stored on the record, which is what it was clocked against.
+
+    Records the arrays cannot represent exactly (timestamps with offsets or
+    in unusual formats, shifts with malformed times or non-numeric settings)
+    go through the scalar methods instead, so summarize_period() returns
+    the same figures with vectorized=False, only slower.
+    """
+
+    def _record_shifts(self, records: List[AttendanceRecord]) -> Tuple[List[Optional[Shift]], np.ndarray]:
+        """Distinct shifts the records were scheduled on and each record's index into them (-1 for none)"""
+        shifts_by_id = {shift.id: shift for shift in db.get_all('shifts')}
+        shifts: List[Optional[Shift]] = []
+        variants: Dict[tuple, int] = {}
+        indexes = np.full(len(records), -1, dtype=np.int64)
+        for row, record in enumerate(records):
+            shift = shifts_by_id.get(record.shift_id) if record.shift_id else None
+            if shift is None:
+                continue
+            key = (shift.id, record.scheduled_start or shift.start_time, record.scheduled_end or shift.end_time)
+            if key not in variants:
+                variant = Shift(**shift.to_dict())
+                variant.start_time, variant.end_time = key[1], key[2]
+                variants[key] = len(shifts)
+                shifts.append(variant)
+            indexes[row] = variants[key]
+        return shifts, indexes
+
+    def _compute_scalar(self, record: AttendanceRecord, shift: Optional[Shift]) -> Tuple[float, float, float, int, int]:
+        """(regular, overtime, total hours, late minutes, early minutes) through the shift manager"""
+        hours = shift_manager.calculate_work_hours(record, shift)
+        status = shift_manager.calculate_late_early_status(record, shift) if shift else {}
+        return (hours['regular_hours'], hours['overtime_hours'], hours['total_hours'],
+                status.get('late_minutes', 0) if status.get('is_late') else -1,
+                status.get('early_departure_minutes', 0) if status.get('is_early_departure') else -1)
+
+    def _compute_vectorized(self, records: List[AttendanceRecord], shifts: List[Optional[Shift]],
+                            shift_index: np.ndarray) -> Dict[str, np.ndarray]:
+        clock_in, in_parsed = _parse_timestamps([record.clock_in_time for record in records])
+        clock_out, out_parsed = _parse_timestamps([record.clock_out_time for record in records])
+        has_in = np.array([bool(record.clock_in_time) for record in records], dtype=bool)
+        has_out = np.array([bool(record.clock_out_time) for record in records], dtype=bool)
+        break_values = [record.break_duration for record in records]
+        own_break = np.array([float(value) if value and isinstance(value, (int, float)) else 0.0
+                              for value in break_values])
+        weekend_or_holiday = np.array([bool(record.is_weekend) or bool(record.is_holiday) for record in records],
+                                      dtype=bool)
+
+        dates = {}
+        for record in records:
+            if record.date not in dates:
+                try:
+                    datetime.fromisoformat(record.date)
+                    dates[record.date] = True
+                except (TypeError, ValueError):
+                    dates[record.date] = False
+        date_ok = np.array([dates[record.date] for record in records], dtype=bool)
+
+        # Settings of each distinct shift; the extra last row is what
+        # shift_index -1 (no shift) picks
+        settings = np.zeros((len(shifts) + 1, 7))
+        settings[-1, 0] = shift_manager.default_overtime_threshold
+        shift_ok = np.ones(len(shifts) + 1, dtype=bool)
+        for index, shift in enumerate(shifts):
+            start, end = _time_minutes(shift.start_time), _time_minutes(shift.end_time)
+            if start is None or end is None or \
+                    not all(isinstance(getattr(shift, name), (int, float)) for name in _SHIFT_NUMBERS):
+                shift_ok[index] = False
+                continue
+            settings[index] = (shift.overtime_threshold, shift.break_duration, not shift.break_paid, start, end,
+                               shift.late_grace_period, shift.early_departure_grace_period)
+        threshold, shift_break, unpaid_break, start, end, late_grace, early_grace = settings[shift_index].T
+        has_shift = shift_index >= 0
+        unpaid_break = unpaid_break > 0
+
+        # Rows the arrays cannot reproduce exactly
+        fallback = ~shift_ok[shift_index]
+        fallback |= has_in & ~in_parsed
+        fallback |= has_out & ~out_parsed
+        fallback |= np.array([bool(value) and not isinstance(value, (int, float)) for value in break_values],
+                             dtype=bool)
+
+        # calculate_work_hours
+        worked = has_in & has_out & date_ok
+        minutes = (clock_out - clock_in) / 1000000 / 60
+        breaks = np.where(has_shift & unpaid_break, np.where(own_break != 0, own_break, shift_break), 0.0)
+        total = (minutes - breaks) / 60
+        total = np.where(total > 0, total, 0.0)
+        regular = np.where(total <= threshold, total, threshold)
+        overtime = np.where(total <= threshold, 0.0, total - threshold)
+        all_overtime = weekend_or_holiday & has_shift
+        overtime = np.where(all_overtime, total, overtime)
+        regular = np.where(all_overtime, 0.0, regular)
+        regular = np.where(worked, _round2(regular), 0.0)
+        overtime = np.where(worked, _round2(overtime), 0.0)
+        total = np.where(worked, _round2(total), 0.0)
+
+        # calculate_late_early_status, on time of day to the minute
+        in_minutes = (clock_in // _MINUTE_US) % 1440
+        out_minutes = (clock_out // _MINUTE_US) % 1440
+        checked = has_shift & has_in
+        late = checked & (in_minutes > start + late_grace)
+        early = checked & has_out & (out_minutes < end - early_grace)
+        late_minutes = np.where(late, in_minutes - start, -1).astype(np.int64)
+        early_minutes = np.where(early, end - out_minutes, -1).astype(np.int64)
+
+        for row in np.flatnonzero(fallback):
+            shift = shifts[shift_index[row]] if shift_index[row] >= 0 else None
+            (regular[row], overtime[row], total[row],
+             late_minutes[row], early_minutes[row]) = self._compute_scalar(records[row], shift)
+
+        return {'regular': regular, 'overtime': overtime, 'total': total,
+                'late_minutes': late_minutes, 'early_minutes': early_minutes}
+
+    def _summaries(self, employee_ids: List[str], codes: np.ndarray, figures: Dict[str, np.ndarray]) -> List[Dict]:
+        count = len(employee_ids)
+        # bincount adds in record order, like a running sum over the records
+        sums = {name: np.bincount(codes, weights=figures[name], minlength=count)
+                for name in ('regular', 'overtime', 'total')}
+        records_count = np.bincount(codes, minlength=count)
+        overtime_days = np.bincount(codes, weights=figures['overtime'] > 0, minlength=count)
+        late = figures['late_minutes'] >= 0
+        early = figures['early_minutes'] >= 0
+        late_count = np.bincount(codes, weights=late, minlength=count)
+        late_minutes = np.bincount(codes, weights=np.where(late, figures['late_minutes'], 0), minlength=count)
+        early_count = np.bincount(codes, weights=early, minlength=count)
+        early_minutes = np.bincount(codes, weights=np.where(early, figures['early_minutes'], 0), minlength=count)
+
+        summaries = []
+        for code, employee_id in enumerate(employee_ids):
+            total_hours = float(sums['total'][code])
+            summaries.append({
+                'employee_id': employee_id,
+                'records_count': int(records_count[code]),
+                'total_regular_hours': round(float(sums['regular'][code]), 2),
+                'total_overtime_hours': round(float(sums['overtime'][code]), 2),
+                'total_hours': round(total_hours, 2),
+                'overtime_days': int(overtime_days[code]),
+                'average_daily_hours': round(total_hours / int(records_count[code]), 2),
+                'late_count': int(late_count[code]),
+                'late_minutes': int(late_minutes[code]),
+                'early_departure_count': int(early_count[code]),
+                'early_departure_minutes': int(early_minutes[code])
+            })
+        return summaries
+
+    def summarize_period(self, start_date: date, end_date: date, employee_ids: Optional[List[str]] = None,
+                         vectorized: bool = True) -> List[Dict[str, Any]]:
+        """Per employee hours, overtime and lateness for completed records from start_date to end_date
+
+        vectorized=False computes every record with the shift manager's
+        scalar methods; the figures are identical.
+        """
+        records = db.get_attendance_records_by_date_range(start_date.isoformat(), end_date.isoformat())
+        wanted = set(employee_ids) if employee_ids is not None else None
+        records = [record for record in records
+                   if record.status == 'completed' and (wanted is None or record.employee_id in wanted)]
+
+        order: Dict[str, int] = {}
+        codes = np.array([order.setdefault(record.employee_id, len(order)) for record in records], dtype=np.int64)
+        shifts, shift_index = self._record_shifts(records)
+
+        if vectorized:
+            figures = self._compute_vectorized(records, shifts, shift_index)
+        else:
+            rows = [self._compute_scalar(record, shifts[index] if index >= 0 else None)
+                    for record, index in zip(records, shift_index)]
+            columns = list(zip(*rows)) or [(), (), (), (), ()]
+            figures = {
+                'regular': np.array(columns[0], dtype=np.float64),
+                'overtime': np.array(columns[1], dtype=np.float64),
+                'total': np.array(columns[2], dtype=np.float64),
+                'late_minutes': np.array(columns[3], dtype=np.int64),
+                'early_minutes': np.array(columns[4], dtype=np.int64)
+            }
+
+        summaries = self._summaries(list(order), codes, figures)
+
+        # Names and departments, whether records carry the employee_id or the employee record id
+        employees = {}
+        for employee in db.get_all('employees'):
+            employees[employee.id] = employee
+            employees[employee.employee_id] = employee
+        for summary in summaries:
+            employee = employees.get(summary['employee_id'])
+            summary['employee_name'] = employee.full_name if employee else 'Unknown Employee'
+            summary['department'] = employee.department if employee else ''
+        summaries.sort(key=lambda summary: summary['employee_id'])
+        return summaries
+
+# Global instance for the application
+payroll_service = PayrollService()
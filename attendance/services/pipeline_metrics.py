@@ -0,0 +1,153 @@
+"""
+Per-stage latency metrics for the camera recognition pipelines
+Rolling percentiles per camera and stage, exported as JSON or Prometheus text
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# (pipeline, camera_id, name, value) rows reported at snapshot time
+GaugeRows = Iterable[Tuple[str, str, str, float]]
+
+class RollingLatency:
+    """Latency samples of one stage: all-time count/sum plus a rolling window for percentiles"""
+
+    def __init__(self, window: int = 1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self) -> Dict:
+        if not self.samples:
+            return {'count': self.count, 'sum': self.total}
+        window = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+        p50, p95, p99 = np.quantile(window, QUANTILES)
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': float(window.mean()),
+            'max': float(window.max()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99)
+        }
+
+class PipelineMetrics:
+    """Stage timings, counters and gauges per (pipeline, camera)
+
+    Stages are observed as they run; counters are bumped by the pipelines;
+    gauges such as queue depths come from callbacks registered with
+    add_gauge_source and are read only when a snapshot is taken.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str, str], RollingLatency] = {}
+        self._counters: Dict[Tuple[str, str, str], float] = defaultdict(float)
+        self._gauge_sources: List[Callable[[], GaugeRows]] = []
+
+    def observe(self, pipeline: str, camera_id: str, stage: str, seconds: float):
+        key = (pipeline, camera_id, stage)
+        with self._lock:
+            latency = self._latencies.get(key)
+            if latency is None:
+                latency = self._latencies[key] = RollingLatency(self.window)
+            latency.observe(seconds)
+
+    @contextmanager
+    def time(self, pipeline: str, camera_id: str, stage: str) -> Iterator[None]:
+        """Observe the duration of a with block"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(pipeline, camera_id, stage, time.perf_counter() - started)
+
+    def count(self, pipeline: str, camera_id: str, counter: str, amount: float = 1):
+        with self._lock:
+            self._counters[(pipeline, camera_id, counter)] += amount
+
+    def add_gauge_source(self, source: Callable[[], GaugeRows]):
+        with self._lock:
+            self._gauge_sources.append(source)
+
+    def _gauges(self) -> List[Tuple[str, str, str, float]]:
+        rows = []
+        for source in list(self._gauge_sources):
+            try:
+                rows.extend(source())
+            except Exception:
+                continue  # A stopped pipeline must not break the export
+        return rows
+
+    def snapshot(self) -> Dict:
+        """{pipeline: {camera_id: {'stages': ..., 'counters': ..., 'gauges': ...}}}"""
+        with self._lock:
+            latencies = {key: latency.summary() for key, latency in self._latencies.items()}
+            counters = dict(self._counters)
+        gauges = self._gauges()
+
+        result: Dict = {}
+        def camera(pipeline, camera_id):
+            return result.setdefault(pipeline, {}).setdefault(
+                camera_id, {'stages': {}, 'counters': {}, 'gauges': {}})
+
+        for (pipeline, camera_id, stage), summary in latencies.items():
+            camera(pipeline, camera_id)['stages'][stage] = summary
+        for (pipeline, camera_id, name), value in counters.items():
+            camera(pipeline, camera_id)['counters'][name] = value
+        for pipeline, camera_id, name, value in gauges:
+            camera(pipeline, camera_id)['gauges'][name] = value
+        return result
+
+    def render_prometheus(self, prefix: str = 'attendance_camera') -> str:
+        """Prometheus text exposition of the snapshot"""
+        snapshot = self.snapshot()
+
+        def labels(pipeline, camera_id, **extra):
+            pairs = [('pipeline', pipeline), ('camera', camera_id)] + list(extra.items())
+            return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                            for name, value in pairs)
+
+        lines = [f'# HELP {prefix}_stage_seconds Camera pipeline stage latency',
+                 f'# TYPE {prefix}_stage_seconds summary']
+        counter_lines: Dict[str, List[str]] = defaultdict(list)
+        gauge_lines: Dict[str, List[str]] = defaultdict(list)
+
+        for pipeline, cameras in sorted(snapshot.items()):
+            for camera_id, data in sorted(cameras.items()):
+                for stage, summary in sorted(data['stages'].items()):
+                    for quantile in QUANTILES:
+                        value = summary.get(f'p{int(quantile * 100)}')
+                        if value is not None:
+                            lines.append(f'{prefix}_stage_seconds{{{labels(pipeline, camera_id, stage=stage, quantile=quantile)}}} {value:.6f}')
+                    lines.append(f'{prefix}_stage_seconds_sum{{{labels(pipeline, camera_id, stage=stage)}}} {summary["sum"]:.6f}')
+                    lines.append(f'{prefix}_stage_seconds_count{{{labels(pipeline, camera_id, stage=stage)}}} {summary["count"]}')
+                for name, value in sorted(data['counters'].items()):
+                    counter_lines[name].append(f'{prefix}_{name}_total{{{labels(pipeline, camera_id)}}} {value:g}')
+                for name, value in sorted(data['gauges'].items()):
+                    gauge_lines[name].append(f'{prefix}_{name}{{{labels(pipeline, camera_id)}}} {value:g}')
+
+        for name, rows in sorted(counter_lines.items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.extend(rows)
+        for name, rows in sorted(gauge_lines.items()):
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.extend(rows)
+        return '\n'.join(lines) + '\n'
+
+# Global instance shared by the CCTV and live camera pipelines
+pipeline_metrics = PipelineMetrics()
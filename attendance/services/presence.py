@@ -0,0 +1,312 @@
+"""
+Live presence roster for the admin dashboard
+Who is on site, late, on break or absent today, kept current from attendance writes
+"""
+
+import logging
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+# Attendance record fields the dashboard shows
+RECORD_FIELDS = ('id', 'employee_id', 'date', 'clock_in_time', 'clock_out_time', 'break_start_time',
+                 'break_end_time', 'is_late', 'scheduled_start', 'clock_in_ip', 'clock_out_ip',
+                 'clock_in_terminal')
+
+STATES = ('present', 'on_break', 'late', 'absent')
+
+
+def _record_view(record) -> Dict:
+    return {field: getattr(record, field, None) for field in RECORD_FIELDS}
+
+
+def _employee_view(employee) -> Dict:
+    return {
+        'id': employee.id,
+        'employee_id': employee.employee_id,
+        'name': employee.full_name,
+        'department': employee.department,
+        'employment_status': employee.employment_status
+    }
+
+
+def _is_open(record: Dict) -> bool:
+    return bool(record.get('clock_in_time')) and not record.get('clock_out_time')
+
+
+class PresenceService:
+    """Today's roster of employees by attendance state
+
+    Built from employees and attendance_records on startup, then kept current
+    through the database write callbacks of both collections: clock-in,
+    clock-out and breaks all arrive as attendance record writes, whichever
+    route made them (terminal, API or zone detection). Zone detections add
+    the zone an employee was last seen in. Each state is a set of employee
+    IDs, so a dashboard read costs O(result) instead of scanning both
+    collections. A new day, a deleted attendance record or a change made
+    outside this process triggers a rebuild on the next read.
+
+    Listeners added with add_listener() get every change as it is applied:
+    an employee whose states or record changed, a zone location, or a
+    rebuild, after which their own copies may be stale.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._employees: Dict[str, Dict] = {}     # employee_id -> employee summary
+        self._employee_ids: Dict[str, str] = {}   # employee record id -> employee_id
+        self._today: Dict[str, Dict] = {}         # employee_id -> today's attendance record
+        self._last: Dict[str, Dict] = {}          # employee_id -> latest attendance record of any day
+        self._states: Dict[str, set] = {state: set() for state in STATES}
+        self._locations: Dict[str, Dict] = {}     # employee_id -> last zone seen in today
+        self._day: Optional[str] = None
+        self._versions = None
+        self._subscribed = False
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def init_app(self, app):
+        """Subscribe to attendance writes and build today's roster"""
+        self._ensure_subscribed()
+        try:
+            self._ensure_current()
+        except Exception as e:
+            logger.warning(f"Could not build presence roster: {e}")
+
+    def _ensure_subscribed(self):
+        if not self._subscribed:
+            with self._lock:
+                if not self._subscribed:
+                    db.add_write_callback('employees', self._on_employee_write)
+                    db.add_write_callback('attendance_records', self._on_attendance_write)
+                    self._subscribed = True
+
+    def add_listener(self, listener: Callable[[Dict], None]):
+        """Call listener(change) for every roster change"""
+        self._listeners.append(listener)
+
+    def _notify(self, change: Optional[Dict]):
+        if change is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(change)
+            except Exception as e:
+                logger.error(f"Presence listener error: {e}")
+
+    def _states_of(self, employee_id: str) -> List[str]:
+        return [state for state in STATES if employee_id in self._states[state]]
+
+    def _change(self, kind: str, employee_id: Optional[str] = None, previous: Optional[List[str]] = None) -> Dict:
+        """Change notification, built under the lock"""
+        change = {'type': kind, 'counts': {state: len(members) for state, members in self._states.items()}}
+        if employee_id is not None:
+            employee = self._employees.get(employee_id)
+            record = self._today.get(employee_id)
+            change.update({
+                'employee_id': employee_id,
+                'employee': dict(employee) if employee else None,
+                'record': dict(record) if record else None,
+                'states': self._states_of(employee_id),
+                'previous_states': previous if previous is not None else self._states_of(employee_id),
+                'location': dict(self._locations[employee_id]) if employee_id in self._locations else None
+            })
+        return change
+
+    def _current_versions(self, db) -> Tuple[int, int]:
+        return db.get_collection_version('employees'), db.get_collection_version('attendance_records')
+
+    def _applied_write(self, db, collection: str):
+        """Note that one write to collection has been applied incrementally
+
+        The write moved the collection's version by one; if it moved further,
+        writes by another instance were picked up on the way without being
+        applied here, so the view is dropped and the next read rebuilds it.
+        """
+        position = 0 if collection == 'employees' else 1
+        version = db.get_collection_version(collection)
+        if version != self._versions[position] + 1:
+            self._versions = None
+            return
+        versions = list(self._versions)
+        versions[position] = version
+        self._versions = tuple(versions)
+
+    def _classify(self, employee_id: str):
+        """Put one employee in the sets matching its current records"""
+        for members in self._states.values():
+            members.discard(employee_id)
+        employee = self._employees.get(employee_id)
+        if employee is None:
+            return
+
+        record = self._today.get(employee_id)
+        if record and record.get('clock_in_time'):
+            if not record.get('clock_out_time'):
+                self._states['present'].add(employee_id)
+                if record.get('break_start_time') and not record.get('break_end_time'):
+                    self._states['on_break'].add(employee_id)
+            if record.get('is_late'):
+                self._states['late'].add(employee_id)
+        elif employee['employment_status'] == 'active':
+            self._states['absent'].add(employee_id)
+
+        if employee_id not in self._states['present']:
+            self._locations.pop(employee_id, None)
+
+    def _put_record(self, record: Dict):
+        employee_id = record['employee_id']
+        last = self._last.get(employee_id)
+        if last is None or last['id'] == record['id'] or (record.get('date') or '') >= (last.get('date') or ''):
+            self._last[employee_id] = record
+
+        if record.get('date') != self._day:
+            return
+        current = self._today.get(employee_id)
+        # Several records on one day (clocked out and in again): an open one
+        # wins, otherwise the latest clock-in
+        if (current is None or current['id'] == record['id'] or _is_open(record)
+                or (not _is_open(current)
+                    and (record.get('clock_in_time') or '') >= (current.get('clock_in_time') or ''))):
+            self._today[employee_id] = record
+
+    def _sync(self, db, versions):
+        """Rebuild the roster from the store"""
+        self._day = date.today().isoformat()
+        self._employees = {}
+        self._employee_ids = {}
+        for employee in db.get_all('employees'):
+            self._employees[employee.employee_id] = _employee_view(employee)
+            self._employee_ids[employee.id] = employee.employee_id
+
+        self._today = {}
+        self._last = {}
+        for record in db.get_all('attendance_records'):
+            self._put_record(_record_view(record))
+
+        self._states = {state: set() for state in STATES}
+        for employee_id in self._employees:
+            self._classify(employee_id)
+        self._versions = versions
+        logger.info(f"Presence roster built for {self._day}: " +
+                    ', '.join(f"{len(members)} {state}" for state, members in self._states.items()))
+
+    def _ensure_current(self):
+        versions = self._current_versions(db)
+        if self._day == date.today().isoformat() and self._versions == versions:
+            return
+        with self._lock:
+            versions = self._current_versions(db)
+            if self._day != date.today().isoformat() or self._versions != versions:
+                self._sync(db, versions)
+                change = self._change('rebuild')
+            else:
+                change = None
+        self._notify(change)
+
+    def _on_employee_write(self, collection: str, record_id: str, model):
+        """Apply a single employee create, update or delete"""
+        changes = []
+        with self._lock:
+            if self._versions is None:
+                return  # Not built yet, the first read loads everything
+
+            previous = self._employee_ids.pop(record_id, None)
+            if previous is not None:
+                previous_states = self._states_of(previous)
+                self._employees.pop(previous, None)
+                self._classify(previous)
+                if model is None or model.employee_id != previous:
+                    changes.append(self._change('employee', previous, previous_states))
+            if model is not None:
+                previous_states = self._states_of(model.employee_id)
+                self._employees[model.employee_id] = _employee_view(model)
+                self._employee_ids[record_id] = model.employee_id
+                self._classify(model.employee_id)
+                changes.append(self._change('employee', model.employee_id, previous_states))
+            self._applied_write(db, collection)
+        for change in changes:
+            self._notify(change)
+
+    def _on_attendance_write(self, collection: str, record_id: str, model):
+        """Apply a clock-in, clock-out or break change"""
+        with self._lock:
+            if self._versions is None:
+                return
+            if model is None:
+                # Which record takes a deleted one's place is only known from the store
+                self._versions = None
+                return
+
+            record = _record_view(model)
+            employee_id = record['employee_id']
+            previous_states = self._states_of(employee_id)
+            self._put_record(record)
+            self._classify(employee_id)
+            self._applied_write(db, collection)
+            change = self._change('attendance', employee_id, previous_states) if record.get('date') == self._day else None
+        self._notify(change)
+
+    def update_location(self, employee_id: str, zone_id: str, zone_name: str, camera_id: str, timestamp: float):
+        """Record the zone a camera last saw an employee in"""
+        with self._lock:
+            previous = self._locations.get(employee_id)
+            self._locations[employee_id] = {
+                'zone_id': zone_id,
+                'zone_name': zone_name,
+                'camera_id': camera_id,
+                'timestamp': timestamp
+            }
+            # Only a move to another zone is news to listeners
+            moved = previous is None or previous['zone_id'] != zone_id
+            change = self._change('location', employee_id) if moved else None
+        self._notify(change)
+
+    def _entries(self, state: str, records_attr: str) -> List[Tuple[Dict, Optional[Dict]]]:
+        self._ensure_subscribed()
+        self._ensure_current()
+        with self._lock:
+            records = getattr(self, records_attr)  # After the rebuild, which replaces the dicts
+            entries = [(dict(self._employees[employee_id]),
+                        dict(records[employee_id]) if employee_id in records else None)
+                       for employee_id in self._states[state]]
+        entries.sort(key=lambda entry: ((entry[1] or {}).get('clock_in_time') or '', entry[0]['name']))
+        return entries
+
+    def get_present(self) -> List[Tuple[Dict, Dict]]:
+        """(employee, today's record) of everyone clocked in and not out, breaks included"""
+        return self._entries('present', '_today')
+
+    def get_on_break(self) -> List[Tuple[Dict, Dict]]:
+        return self._entries('on_break', '_today')
+
+    def get_late(self) -> List[Tuple[Dict, Dict]]:
+        """(employee, today's record) of everyone who clocked in late today"""
+        return self._entries('late', '_today')
+
+    def get_absent(self) -> List[Tuple[Dict, Optional[Dict]]]:
+        """(employee, latest record of any day or None) of active employees not clocked in today"""
+        return self._entries('absent', '_last')
+
+    def get_location(self, employee_id: str) -> Optional[Dict]:
+        with self._lock:
+            location = self._locations.get(employee_id)
+            return dict(location) if location else None
+
+    def get_counts(self) -> Dict[str, int]:
+        self._ensure_subscribed()
+        self._ensure_current()
+        with self._lock:
+            return {state: len(members) for state, members in self._states.items()}
+
+    def invalidate(self):
+        """Force a rebuild on next use"""
+        with self._lock:
+            self._versions = None
+
+
+# Global instance for the application
+presence_service = PresenceService()
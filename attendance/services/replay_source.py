@@ -0,0 +1,121 @@
+"""
+Replay of recorded video as a fake camera
+Lets the camera pipelines run against MP4 files or image sequences instead of live cameras
+"""
+
+import glob
+import os
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+SCHEME = 'replay://'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def replay_url(path: str, fps: float = 15.0, loop: bool = True) -> str:
+    """replay:// URL for a video file, image directory or image glob"""
+    return f"{SCHEME}{os.path.abspath(path)}?fps={fps:g}&loop={int(loop)}"
+
+def is_replay_url(source) -> bool:
+    return isinstance(source, str) and source.startswith(SCHEME)
+
+class ReplayCapture:
+    """cv2.VideoCapture stand-in that replays a recording in real time
+
+    Frames are delivered at the requested fps, grab() waiting for the next
+    frame time like a live camera would, and the recording loops unless
+    loop=0. Video files are decoded as they play; image sequences are kept
+    as encoded bytes and decoded on retrieve(), so decode cost is still paid
+    per frame. Only the calls the pipelines use are implemented.
+    """
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        options = parse_qs(parsed.query)
+        self.path = url[len(SCHEME):].split('?', 1)[0]
+        self.fps = float(options.get('fps', ['15'])[0])
+        self.loop = options.get('loop', ['1'])[0] != '0'
+
+        self._video: Optional[cv2.VideoCapture] = None
+        self._images: List[bytes] = []
+        self._index = 0
+        self._next_frame_time = 0.0
+        self._grabbed = False
+        self._opened = self._open()
+
+    def _open(self) -> bool:
+        if os.path.isdir(self.path):
+            files = sorted(os.path.join(self.path, name) for name in os.listdir(self.path))
+        elif any(char in self.path for char in '*?['):
+            files = sorted(glob.glob(self.path))
+        else:
+            self._video = cv2.VideoCapture(self.path)
+            return self._video.isOpened()
+
+        for file_path in files:
+            if file_path.lower().endswith(IMAGE_EXTENSIONS):
+                with open(file_path, 'rb') as image_file:
+                    self._images.append(image_file.read())
+        return bool(self._images)
+
+    def isOpened(self) -> bool:
+        return self._opened
+
+    def set(self, prop_id: int, value) -> bool:
+        return False  # Rate and resolution are fixed by the URL and the recording
+
+    def get(self, prop_id: int) -> float:
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if self._video is not None:
+            return self._video.get(prop_id)
+        return 0.0
+
+    def grab(self) -> bool:
+        if not self._opened:
+            return False
+
+        # Pace to the replay rate
+        now = time.time()
+        if self._next_frame_time > now:
+            time.sleep(self._next_frame_time - now)
+        self._next_frame_time = max(now, self._next_frame_time) + 1.0 / self.fps
+
+        if self._video is not None:
+            self._grabbed = self._video.grab()
+            if not self._grabbed and self.loop:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                self._grabbed = self._video.grab()
+        else:
+            if self._index >= len(self._images) and self.loop:
+                self._index = 0
+            self._grabbed = self._index < len(self._images)
+            self._index += 1
+        return self._grabbed
+
+    def retrieve(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self._grabbed:
+            return False, None
+        if self._video is not None:
+            return self._video.retrieve(image) if image is not None else self._video.retrieve()
+
+        encoded = np.frombuffer(self._images[self._index - 1], dtype=np.uint8)
+        frame = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+        if image is not None and image.shape == frame.shape:
+            image[:] = frame
+            return True, image
+        return True, frame
+
+    def read(self, image: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+        self._images = []
+        self._opened = False
@@ -6,19 +6,64 @@ Handles shift scheduling, overtime calculation, and time tracking
 
 from datetime import datetime, time, timedelta, date
 from typing import List, Optional, Dict, Any, Tuple
+from dataclasses import dataclass
+from bisect import bisect_right
 import calendar
+import threading
 
 from .database import db
 from ..models import Shift, ShiftAssignment, Employee, AttendanceRecord
 
+@dataclass
+class CompiledAssignment:
+    """An active shift assignment resolved against its shift"""
+    start: int                 # First day, as a date ordinal
+    end: Optional[int]         # Last day (inclusive), None while ongoing
+    priority: int
+    weekdays: int              # Bit mask of working weekdays, bit 0 = Monday
+    shift: Optional[Dict]      # Shift with custom times applied, None if missing or inactive
+
+@dataclass
+class EmployeeSchedule:
+    """Non-overlapping date intervals with the assignment in force on each
+
+    Interval i runs from starts[i] up to the day before starts[i + 1]; the
+    last one is open ended. Days before starts[0] have no assignment.
+    """
+    starts: List[int]
+    assignments: List[Optional[CompiledAssignment]]
+
+    def at(self, ordinal: int) -> Optional[CompiledAssignment]:
+        index = bisect_right(self.starts, ordinal) - 1
+        return self.assignments[index] if index >= 0 else None
+
+def _ordinal(value: str) -> int:
+    return date.fromisoformat(value[:10]).toordinal()
+
+def _shift_on(assignment: Optional[CompiledAssignment], weekday: int) -> Optional[Shift]:
+    if assignment is None or assignment.shift is None or not assignment.weekdays & (1 << weekday):
+        return None
+    return Shift(**assignment.shift)
+
 class ShiftManagerService:
-    """Service for managing shifts and calculating work hours"""
+    """Service for managing shifts and calculating work hours
+    
+    Shift lookups use schedules compiled from shift_assignments and shifts:
+    per employee, the dates on which the winning assignment changes, so the
+    shift for a day is a binary search and a date range is one walk over
+    the intervals it spans. The schedules are rebuilt when either
+    collection's version changes, whoever wrote it.
+    """
     
     def __init__(self):
         self.default_overtime_threshold = 8.0
         self.default_overtime_rate = 1.5
         self.default_break_duration = 60  # minutes
         
+        self._lock = threading.RLock()
+        self._schedules: Dict[str, EmployeeSchedule] = {}
+        self._versions = None
+        
     def init_app(self, app):
         """Initialize with Flask app configuration"""
         self.default_overtime_threshold = app.config.get('OVERTIME_THRESHOLD', 8.0)
@@ -27,58 +72,125 @@ class ShiftManagerService:
         
         print("Shift Manager Service initialized")
     
+    # Compiled schedules
+    def _compile_assignment(self, assignment: ShiftAssignment, shifts: Dict[str, Shift]) -> CompiledAssignment:
+        """Resolve an assignment against its shift
+        
+        An empty start date means the assignment has applied since the
+        beginning; a malformed date raises ValueError.
+        """
+        shift = shifts.get(assignment.shift_id)
+        shift_data = None
+        weekdays = 0
+        if shift and shift.is_active:
+            # Apply custom times if specified
+            if assignment.custom_start_time or assignment.custom_end_time:
+                shift = Shift(**shift.to_dict())
+                if assignment.custom_start_time:
+                    shift.start_time = assignment.custom_start_time
+                if assignment.custom_end_time:
+                    shift.end_time = assignment.custom_end_time
+            shift_data = shift.to_dict()
+            for day in assignment.custom_days or shift.days_of_week:
+                weekdays |= 1 << day
+        
+        return CompiledAssignment(
+            start=_ordinal(assignment.start_date) if assignment.start_date else date.min.toordinal(),
+            end=_ordinal(assignment.end_date) if assignment.end_date else None,
+            priority=int(assignment.priority or 0),
+            weekdays=weekdays,
+            shift=shift_data
+        )
+    
+    def _build_schedule(self, assignments: List[CompiledAssignment]) -> EmployeeSchedule:
+        """Split an employee's assignments into intervals with one winner each"""
+        # Highest priority wins; on a tie the assignment created first
+        ranked = sorted(assignments, key=lambda assignment: -assignment.priority)
+        
+        boundaries = set()
+        for assignment in assignments:
+            boundaries.add(assignment.start)
+            if assignment.end is not None:
+                boundaries.add(assignment.end + 1)
+        
+        schedule = EmployeeSchedule(starts=[], assignments=[])
+        for boundary in sorted(boundaries):
+            winner = next((assignment for assignment in ranked
+                           if assignment.start <= boundary and (assignment.end is None or assignment.end >= boundary)),
+                          None)
+            if schedule.assignments and schedule.assignments[-1] is winner:
+                continue
+            schedule.starts.append(boundary)
+            schedule.assignments.append(winner)
+        return schedule
+    
+    def _compile(self):
+        shifts = {shift.id: shift for shift in db.get_all('shifts')}
+        by_employee: Dict[str, List[CompiledAssignment]] = {}
+        for assignment in db.get_all('shift_assignments'):
+            if not assignment.is_active:
+                continue
+            try:
+                compiled = self._compile_assignment(assignment, shifts)
+            except (TypeError, ValueError) as e:
+                print(f"Skipping shift assignment {assignment.id}: {e}")
+                continue
+            by_employee.setdefault(assignment.employee_id, []).append(compiled)
+        
+        self._schedules = {employee_id: self._build_schedule(assignments)
+                           for employee_id, assignments in by_employee.items()}
+    
+    def _get_schedules(self) -> Dict[str, EmployeeSchedule]:
+        """Compiled schedules by employee ID, rebuilt after assignment or shift changes"""
+        versions = (db.get_collection_version('shift_assignments'), db.get_collection_version('shifts'))
+        if self._versions == versions:
+            return self._schedules
+        with self._lock:
+            versions = (db.get_collection_version('shift_assignments'), db.get_collection_version('shifts'))
+            if self._versions != versions:
+                self._compile()
+                self._versions = versions
+            return self._schedules
+    
+    def invalidate(self):
+        """Recompile the schedules on next use"""
+        with self._lock:
+            self._versions = None
+    
     def get_employee_shift_for_date(self, employee_id: str, target_date: date) -> Optional[Shift]:
         """Get the shift assigned to an employee for a specific date"""
         try:
-            # Get current shift assignments for employee
-            assignments = db.find('shift_assignments', {
-                'employee_id': employee_id,
-                'is_active': True
-            })
-            
-            if not assignments:
-                return None
-            
-            # Find the most appropriate assignment for the date
-            target_date_str = target_date.isoformat()
-            target_weekday = target_date.weekday()  # 0=Monday, 6=Sunday
-            
-            best_assignment = None
-            for assignment in assignments:
-                # Check date range
-                if assignment.start_date <= target_date_str:
-                    if not assignment.end_date or assignment.end_date >= target_date_str:
-                        if not best_assignment or assignment.priority > best_assignment.priority:
-                            best_assignment = assignment
-            
-            if not best_assignment:
-                return None
-            
-            # Get the shift details
-            shift = db.get_by_id('shifts', best_assignment.shift_id)
-            if not shift or not shift.is_active:
+            schedule = self._get_schedules().get(employee_id)
+            if schedule is None:
                 return None
-            
-            # Check if shift applies to this day of week
-            shift_days = best_assignment.custom_days or shift.days_of_week
-            if target_weekday not in shift_days:
-                return None
-            
-            # Apply custom times if specified
-            if best_assignment.custom_start_time or best_assignment.custom_end_time:
-                custom_shift = Shift(**shift.to_dict())
-                if best_assignment.custom_start_time:
-                    custom_shift.start_time = best_assignment.custom_start_time
-                if best_assignment.custom_end_time:
-                    custom_shift.end_time = best_assignment.custom_end_time
-                return custom_shift
-            
-            return shift
+            return _shift_on(schedule.at(target_date.toordinal()), target_date.weekday())
             
         except Exception as e:
             print(f"Error getting employee shift: {e}")
             return None
     
+    def get_employee_shifts(self, employee_id: str, start_date: date, end_date: date) -> List[Tuple[date, Optional[Shift]]]:
+        """(date, shift or None) for every day from start_date to end_date"""
+        schedule = self._get_schedules().get(employee_id)
+        days = []
+        current_date = start_date
+        if schedule is None:
+            while current_date <= end_date:
+                days.append((current_date, None))
+                current_date += timedelta(days=1)
+            return days
+        
+        # Walk the intervals alongside the days instead of searching per day
+        index = bisect_right(schedule.starts, start_date.toordinal()) - 1
+        while current_date <= end_date:
+            ordinal = current_date.toordinal()
+            while index + 1 < len(schedule.starts) and schedule.starts[index + 1] <= ordinal:
+                index += 1
+            assignment = schedule.assignments[index] if index >= 0 else None
+            days.append((current_date, _shift_on(assignment, current_date.weekday())))
+            current_date += timedelta(days=1)
+        return days
+    
     def calculate_late_early_status(self, attendance: AttendanceRecord, shift: Shift) -> Dict[str, Any]:
         """Calculate if employee is late or left early"""
         try:
@@ -185,11 +297,8 @@ class ShiftManagerService:
     def get_employee_schedule(self, employee_id: str, start_date: date, end_date: date) -> List[Dict[str, Any]]:
         """Get employee schedule for date range"""
         schedule = []
-        current_date = start_date
         
-        while current_date <= end_date:
-            shift = self.get_employee_shift_for_date(employee_id, current_date)
-            
+        for current_date, shift in self.get_employee_shifts(employee_id, start_date, end_date):
             schedule_entry = {
                 'date': current_date.isoformat(),
                 'weekday': current_date.strftime('%A'),
@@ -200,7 +309,6 @@ class ShiftManagerService:
             }
             
             schedule.append(schedule_entry)
-            current_date += timedelta(days=1)
         
         return schedule
     
@@ -264,7 +372,9 @@ class ShiftManagerService:
                 assignment_data.update(custom_times)
             
             assignment = ShiftAssignment(**assignment_data)
-            return db.create('shift_assignments', assignment)
+            assignment = db.create('shift_assignments', assignment)
+            self.invalidate()
+            return assignment
             
         except Exception as e:
             print(f"Error assigning shift: {e}")
@@ -273,7 +383,9 @@ class ShiftManagerService:
     def remove_shift_assignment(self, assignment_id: str) -> bool:
         """Remove or deactivate a shift assignment"""
         try:
-            return db.update('shift_assignments', assignment_id, {'is_active': False})
+            updated = db.update('shift_assignments', assignment_id, {'is_active': False})
+            self.invalidate()
+            return updated
         except Exception as e:
             print(f"Error removing shift assignment: {e}")
             return False
@@ -293,7 +405,7 @@ class ShiftManagerService:
     def get_overtime_summary(self, employee_id: str, start_date: date, end_date: date) -> Dict[str, Any]:
         """Get overtime summary for employee in date range"""
         try:
-            # Get attendance records
+            # The employee's completed records come from the (employee_id, status) index
             records = db.find('attendance_records', {
                 'employee_id': employee_id,
                 'status': 'completed'
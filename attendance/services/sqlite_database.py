@@ -0,0 +1,431 @@
+"""
+SQLite-backed database service for Time Attendance System
+
+Drop-in replacement for the JSON-file DatabaseService. Every collection is a
+table holding the full record as a JSON document plus plain columns for the
+fields covered by DatabaseService.HASH_INDEXES / SORTED_INDEXES, which carry
+SQL indexes. The database runs in WAL mode so the HTTP and HTTPS server
+processes can share it safely.
+"""
+
+import json
+import re
+import sqlite3
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+from ..models.base import BaseModel
+from .database import DatabaseService, WriteBatch, _clone_json
+
+
+class SQLiteDatabaseService(DatabaseService):
+    """SQLite implementation of the DatabaseService interface"""
+
+    def __init__(self, data_dir: str = 'attendance_data', db_path: str = None):
+        self.db_path = Path(db_path) if db_path else Path(data_dir) / 'attendance.db'
+        self._local = threading.local()
+        self._tables: Dict[str, List[str]] = {}
+
+        # JSON cache and change log do not apply; SQLite handles both
+        super().__init__(data_dir, cache_enabled=False)
+        self.log_collections = set()
+        self.partitioned_collections = set()
+
+    # Connection handling
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in one write transaction (taken up front to avoid upgrade deadlocks)"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+
+    # Schema
+    def _init_default_data(self):
+        """Create tables for every model collection"""
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS collection_versions '
+            '(collection TEXT PRIMARY KEY, version INTEGER NOT NULL)'
+        )
+        for collection in self.models.keys():
+            self._ensure_table(collection)
+
+    def _indexed_fields(self, collection: str) -> List[str]:
+        """Fields stored as real columns for a collection"""
+        fields = []
+        for field_tuple in self.hash_indexes.get(collection, []):
+            for field in field_tuple:
+                if field not in fields:
+                    fields.append(field)
+        for field in self.sorted_indexes.get(collection, []):
+            if field not in fields:
+                fields.append(field)
+        return fields
+
+    def _ensure_table(self, collection: str) -> List[str]:
+        """Create or extend a collection table, returning its indexed columns"""
+        columns = self._tables.get(collection)
+        if columns is not None:
+            return columns
+
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', collection):
+            raise ValueError(f"Invalid collection name: {collection}")
+
+        fields = [f for f in self._indexed_fields(collection) if re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', f)]
+        conn = self._connect()
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{collection}" '
+            f'(id TEXT PRIMARY KEY, doc TEXT NOT NULL)'
+        )
+        existing = {row[1] for row in conn.execute(f'PRAGMA table_info("{collection}")')}
+
+        added = [field for field in fields if field not in existing]
+        if added:
+            with self._transaction() as tx:
+                for field in added:
+                    tx.execute(f'ALTER TABLE "{collection}" ADD COLUMN "{field}"')
+                # Backfill new columns from the stored documents
+                for record_id, doc in tx.execute(f'SELECT id, doc FROM "{collection}"').fetchall():
+                    record = json.loads(doc)
+                    tx.execute(
+                        f'UPDATE "{collection}" SET ' + ', '.join(f'"{field}" = ?' for field in added) + ' WHERE id = ?',
+                        [self._column_value(record.get(field)) for field in added] + [record_id]
+                    )
+
+        index_sets = [t for t in self.hash_indexes.get(collection, [])]
+        index_sets += [(field,) for field in self.sorted_indexes.get(collection, [])]
+        for field_tuple in index_sets:
+            if all(field in fields for field in field_tuple):
+                name = f'idx_{collection}_' + '_'.join(field_tuple)
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{name}" ON "{collection}" '
+                    f'(' + ', '.join(f'"{field}"' for field in field_tuple) + ')'
+                )
+
+        self._tables[collection] = fields
+        return fields
+
+    def declare_index(self, collection: str, *fields: str, sorted_index: bool = False):
+        """Declare an index; the backing column and SQL index are created on next use"""
+        super().declare_index(collection, *fields, sorted_index=sorted_index)
+        self._tables.pop(collection, None)
+
+    @staticmethod
+    def _column_value(value: Any) -> Any:
+        """Value stored in an indexed column (NULL for non-scalar values)"""
+        if isinstance(value, (str, int, float)) or value is None:
+            return value
+        return None
+
+    def _row_values(self, collection: str, record: Dict) -> List[Any]:
+        """Column values for a record in table column order"""
+        fields = self._ensure_table(collection)
+        return [record.get('id'), json.dumps(record, default=str)] + \
+            [self._column_value(record.get(field)) for field in fields]
+
+    def _insert_sql(self, collection: str, replace: bool = False) -> str:
+        fields = self._ensure_table(collection)
+        columns = ['id', 'doc'] + fields
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT'
+        return (f'{verb} INTO "{collection}" (' + ', '.join(f'"{c}"' for c in columns) + ') '
+                f'VALUES (' + ', '.join('?' for _ in columns) + ')')
+
+    def _update_sql(self, collection: str) -> str:
+        fields = self._ensure_table(collection)
+        return (f'UPDATE "{collection}" SET doc = ?' + ''.join(f', "{f}" = ?' for f in fields) +
+                ' WHERE id = ?')
+
+    def _bump_version(self, conn: sqlite3.Connection, collection: str):
+        conn.execute(
+            'INSERT INTO collection_versions (collection, version) VALUES (?, 1) '
+            'ON CONFLICT(collection) DO UPDATE SET version = version + 1',
+            (collection,)
+        )
+
+    def get_collection_version(self, collection: str) -> int:
+        """Get a counter that changes whenever the collection is written (by any process)"""
+        row = self._connect().execute(
+            'SELECT version FROM collection_versions WHERE collection = ?', (collection,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def invalidate_cache(self, collection: str = None):
+        """Nothing is cached outside SQLite"""
+        pass
+
+    # Storage primitives used by the inherited query methods
+    def _load_collection(self, collection: str) -> List[Dict]:
+        """Load all documents of a collection in insertion order"""
+        self._ensure_table(collection)
+        rows = self._connect().execute(f'SELECT doc FROM "{collection}" ORDER BY rowid')
+        return [json.loads(doc) for (doc,) in rows]
+
+    def _save_collection(self, collection: str, data: List[Dict],
+                         changes: List[tuple] = None, base: List[Dict] = None):
+        """Replace a whole collection"""
+        insert_sql = self._insert_sql(collection, replace=True)
+        with self._transaction() as conn:
+            conn.execute(f'DELETE FROM "{collection}"')
+            for record in data:
+                if not record.get('id'):
+                    record = dict(record, id=str(uuid.uuid4()))
+                conn.execute(insert_sql, self._row_values(collection, record))
+            self._bump_version(conn, collection)
+
+    def _match_records(self, collection: str, filters: Dict[str, Any]) -> List[Dict]:
+        """Records matching all equality filters, narrowed by indexed columns in SQL"""
+        fields = self._ensure_table(collection)
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            # NULL/non-scalar values keep Python equality semantics below
+            if key in fields and isinstance(value, (str, int, float)):
+                clauses.append(f'"{key}" = ?')
+                params.append(value)
+
+        sql = f'SELECT doc FROM "{collection}"'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY rowid'
+        records = [json.loads(doc) for (doc,) in self._connect().execute(sql, params)]
+
+        if not filters:
+            return records
+        return [
+            record for record in records
+            if all(key in record and record[key] == value for key, value in filters.items())
+        ]
+
+    def find_range(self, collection: str, field: str, start: str, end: str) -> List[BaseModel]:
+        """Find records with start <= field <= end (string comparison)"""
+        model_class = self.models.get(collection)
+        if not model_class:
+            return []
+
+        fields = self._ensure_table(collection)
+        if field not in fields:
+            return super().find_range(collection, field, start, end)
+
+        rows = self._connect().execute(
+            f'SELECT doc FROM "{collection}" WHERE "{field}" >= ? AND "{field}" <= ? '
+            f'AND typeof("{field}") = \'text\' ORDER BY "{field}", rowid',
+            (start, end)
+        )
+        return [model_class.from_dict(json.loads(doc)) for (doc,) in rows]
+
+    # CRUD Operations
+    def create(self, collection: str, model: BaseModel) -> BaseModel:
+        """Create a new record"""
+        if not model.validate():
+            raise ValueError("Model validation failed")
+
+        insert_sql = self._insert_sql(collection)
+        with self._transaction() as conn:
+            if not model.id or conn.execute(
+                    f'SELECT 1 FROM "{collection}" WHERE id = ?', (model.id,)).fetchone():
+                model.id = str(uuid.uuid4())
+            conn.execute(insert_sql, self._row_values(collection, _clone_json(model.to_dict())))
+            self._bump_version(conn, collection)
+
+        self._notify_write(collection, model.id, model)
+        return model
+
+    def get_by_id(self, collection: str, record_id: str) -> Optional[BaseModel]:
+        """Get record by ID"""
+        model_class = self.models.get(collection)
+        if not model_class:
+            return None
+
+        self._ensure_table(collection)
+        row = self._connect().execute(
+            f'SELECT doc FROM "{collection}" WHERE id = ?', (record_id,)
+        ).fetchone()
+        return model_class.from_dict(json.loads(row[0])) if row else None
+
+    def update(self, collection: str, record_id: str, updates: Dict[str, Any]) -> Optional[BaseModel]:
+        """Update record by ID"""
+        model_class = self.models.get(collection)
+        if not model_class:
+            return None
+
+        update_sql = self._update_sql(collection)
+        with self._transaction() as conn:
+            row = conn.execute(f'SELECT doc FROM "{collection}" WHERE id = ?', (record_id,)).fetchone()
+            if not row:
+                return None
+
+            record = json.loads(row[0])
+            record.update(updates)
+            record['updated_at'] = datetime.now().isoformat()
+
+            model = model_class.from_dict(record)
+            if not model.validate():
+                raise ValueError("Updated model validation failed")
+
+            values = self._row_values(collection, _clone_json(model.to_dict()))
+            conn.execute(update_sql, values[1:] + [record_id])
+            self._bump_version(conn, collection)
+
+        self._notify_write(collection, record_id, model)
+        return model
+
+    def commit_batch(self, write_batch: WriteBatch) -> List[BaseModel]:
+        """Commit a batch in one transaction, returns the created/updated models in order"""
+        # Table changes run their own transaction, so settle them first
+        for write in write_batch.writes:
+            self._ensure_table(write[1])
+
+        models = []
+        with self._transaction() as conn:
+            for write in write_batch.writes:
+                collection = write[1]
+                if write[0] == 'create':
+                    model = write[2]
+                    if not model.validate():
+                        raise ValueError("Model validation failed")
+                    if not model.id or conn.execute(
+                            f'SELECT 1 FROM "{collection}" WHERE id = ?', (model.id,)).fetchone():
+                        model.id = str(uuid.uuid4())
+                    conn.execute(self._insert_sql(collection),
+                                 self._row_values(collection, _clone_json(model.to_dict())))
+                else:
+                    _, _, record_id, updates = write
+                    model_class = self.models.get(collection)
+                    row = conn.execute(f'SELECT doc FROM "{collection}" WHERE id = ?', (record_id,)).fetchone()
+                    if not row or model_class is None:
+                        raise KeyError(f"{collection} record {record_id} not found")
+                    
+                    record = json.loads(row[0])
+                    record.update(updates)
+                    record['updated_at'] = datetime.now().isoformat()
+                    model = model_class.from_dict(record)
+                    if not model.validate():
+                        raise ValueError("Updated model validation failed")
+                    values = self._row_values(collection, _clone_json(model.to_dict()))
+                    conn.execute(self._update_sql(collection), values[1:] + [record_id])
+                self._bump_version(conn, collection)
+                models.append((collection, model))
+
+        for collection, model in models:
+            self._notify_write(collection, model.id, model)
+        return [model for _, model in models]
+
+    def delete(self, collection: str, record_id: str) -> bool:
+        """Delete record by ID"""
+        self._ensure_table(collection)
+        with self._transaction() as conn:
+            deleted = conn.execute(f'DELETE FROM "{collection}" WHERE id = ?', (record_id,)).rowcount
+            if deleted:
+                self._bump_version(conn, collection)
+        if deleted:
+            self._notify_write(collection, record_id, None)
+        return bool(deleted)
+
+    def count(self, collection: str, filters: Dict[str, Any] = None) -> int:
+        """Count records in collection"""
+        if not filters:
+            self._ensure_table(collection)
+            return self._connect().execute(f'SELECT COUNT(*) FROM "{collection}"').fetchone()[0]
+        return len(self._match_records(collection, filters))
+
+    # Backup and restore
+    def backup_database(self, backup_type: str = 'daily'):
+        """Create database backup using SQLite's online backup API"""
+        backup_dir = self.daily_backup_dir if backup_type == 'daily' else self.weekly_backup_dir
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        backup_subdir = backup_dir / f"backup_{timestamp}"
+        backup_subdir.mkdir(exist_ok=True)
+
+        target = sqlite3.connect(str(backup_subdir / self.db_path.name))
+        try:
+            self._connect().backup(target)
+        finally:
+            target.close()
+
+        print(f"Database backup created: {backup_subdir}")
+
+        # Clean old backups
+        self._clean_old_backups(backup_dir, max_backups=30 if backup_type == 'daily' else 12)
+
+    def restore_from_backup(self, backup_path: str):
+        """Restore database from backup"""
+        backup_file = Path(backup_path) / self.db_path.name
+        if not backup_file.exists():
+            raise FileNotFoundError(f"Backup database not found: {backup_file}")
+
+        # Create current backup before restore
+        self.backup_database('restore_backup')
+
+        source = sqlite3.connect(str(backup_file))
+        try:
+            source.backup(self._connect())
+        finally:
+            source.close()
+        self._tables.clear()
+
+        print(f"Database restored from backup: {backup_path}")
+
+    # Migration
+    def migrate_from_json(self, json_dir: str, overwrite: bool = False) -> Dict[str, int]:
+        """One-shot import of <collection>.json files (and change logs) into SQLite
+
+        Collections that already hold rows are skipped unless overwrite is set.
+        Returns the number of records imported per collection.
+        """
+        source = DatabaseService(json_dir, cache_enabled=False)
+        imported = {}
+
+        for collection in self.models.keys():
+            if not overwrite and self.count(collection) > 0:
+                continue
+
+            records = source._load_collection(collection)
+            if not records and not overwrite:
+                continue
+
+            self._save_collection(collection, records)
+            imported[collection] = len(records)
+            self.logger.info(f"Migrated {len(records)} {collection} records to {self.db_path}")
+
+        return imported
+
+
+def migrate_json_to_sqlite(json_dir: str, db_path: str = None, overwrite: bool = False) -> Dict[str, int]:
+    """Migrate an existing attendance_data directory into a SQLite database"""
+    service = SQLiteDatabaseService(json_dir, db_path)
+    return service.migrate_from_json(json_dir, overwrite=overwrite)
+
+
+if __name__ == '__main__':
+    # python -m attendance.services.sqlite_database <data_dir> [db_path] [--overwrite]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print("Usage: python -m attendance.services.sqlite_database <data_dir> [db_path] [--overwrite]")
+        sys.exit(1)
+
+    results = migrate_json_to_sqlite(args[0], args[1] if len(args) > 1 else None,
+                                     overwrite='--overwrite' in sys.argv)
+    for name, total in results.items():
+        print(f"{name}: {total} records")
@@ -0,0 +1,205 @@
+"""
+Stream supervisor for IP and local cameras
+Keeps capture connections alive: concurrent URL probing, backoff with jitter, stall watchdog
+"""
+
+import cv2
+import queue
+import random
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from .replay_source import ReplayCapture, is_replay_url
+
+logger = logging.getLogger(__name__)
+
+Source = Union[str, int]
+
+class StreamWatch:
+    """Frame-timestamp watch on one open capture"""
+
+    def __init__(self, camera_id: str, cap, stall_timeout: float):
+        self.camera_id = camera_id
+        self.cap = cap
+        self.stall_timeout = stall_timeout
+        self.last_frame = time.time()
+        self.stalled = False
+
+    def frame_received(self):
+        self.last_frame = time.time()
+
+class StreamSupervisor:
+    """Opens camera streams and notices when they stop delivering frames
+
+    connect() retries until a source opens or the caller stops, waiting an
+    exponentially growing, jittered delay between rounds so many cameras
+    coming back after an outage do not reconnect in lockstep. Candidate URLs
+    are probed concurrently, each with probe_timeout, and the URL that
+    worked is remembered per camera and tried alone first next time.
+
+    A watchdog thread checks the time of the last frame of every watched
+    capture. A capture that has delivered nothing for stall_timeout is marked
+    stalled; the thread reading it sees the flag, leaves its loop and
+    releases the capture itself, since releasing it from the watchdog while
+    grab()/read() is running is unsafe. Stream captures are opened with a
+    read timeout of stall_timeout so a read cannot block for much longer; a
+    decoder process stuck regardless stops beating and is restarted by its
+    parent.
+    """
+
+    def __init__(self, base_delay: float = 1.0, max_delay: float = 60.0,
+                 probe_timeout: float = 10.0, stall_timeout: float = 15.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.probe_timeout = probe_timeout
+        self.stall_timeout = stall_timeout
+
+        self._working_sources: Dict[str, Source] = {}
+        self._connected_at: Dict[str, float] = {}
+        self._flaps: Dict[str, int] = {}
+        self._watches: Dict[int, StreamWatch] = {}
+        self._lock = threading.Lock()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Delay before reconnect attempt n: half fixed, half random"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _open_capture(self, source: Source):
+        """VideoCapture with open/read timeouts where this OpenCV build supports them"""
+        if is_replay_url(source):
+            return ReplayCapture(source)
+        if isinstance(source, str) and hasattr(cv2, 'CAP_PROP_OPEN_TIMEOUT_MSEC'):
+            return cv2.VideoCapture(source, cv2.CAP_ANY, [
+                cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.probe_timeout * 1000),
+                cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(min(self.probe_timeout, self.stall_timeout) * 1000)
+            ])
+        return cv2.VideoCapture(source)
+
+    def _probe(self, source: Source, results: queue.Queue, claimed: threading.Event):
+        cap = None
+        try:
+            cap = self._open_capture(source)
+            if cap.isOpened():
+                ret, frame = cap.read()
+                if ret and frame is not None:
+                    results.put((source, cap))
+                    if claimed.is_set():
+                        cap.release()  # Another source won or the caller gave up
+                    return
+        except Exception as e:
+            logger.debug(f"Probe of {source} failed: {e}")
+        if cap is not None:
+            cap.release()
+        results.put((source, None))
+
+    def probe(self, sources: List[Source]) -> Optional[Tuple[object, Source]]:
+        """Open all sources concurrently and return (cap, source) of the first that delivers a frame"""
+        results: queue.Queue = queue.Queue()
+        claimed = threading.Event()
+        for source in sources:
+            threading.Thread(target=self._probe, args=(source, results, claimed),
+                             daemon=True, name='StreamProbe').start()
+
+        deadline = time.time() + self.probe_timeout
+        remaining = len(sources)
+        winner = None
+        while remaining and winner is None:
+            try:
+                source, cap = results.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                break
+            remaining -= 1
+            if cap is not None:
+                winner = (cap, source)
+        claimed.set()
+
+        # Release captures that opened after the winner but before claimed was set
+        while True:
+            try:
+                _, cap = results.get_nowait()
+            except queue.Empty:
+                break
+            if cap is not None:
+                cap.release()
+        return winner
+
+    def connect(self, camera_id: str, sources: List[Source],
+                should_stop: Callable[[], bool]) -> Optional[Tuple[object, Source]]:
+        """Retry with backoff until a source opens, None if should_stop() turns true first"""
+        # A stream that dropped soon after opening keeps its backoff, so a
+        # camera that accepts connections but fails right away is not hammered
+        attempt = 0
+        connected_at = self._connected_at.get(camera_id)
+        if connected_at is not None and time.time() - connected_at < self.stall_timeout:
+            attempt = self._flaps[camera_id] = self._flaps.get(camera_id, 0) + 1
+        else:
+            self._flaps.pop(camera_id, None)
+
+        while not should_stop():
+            if attempt:
+                delay = self.backoff_delay(attempt - 1)
+                logger.warning(f"Camera {camera_id} unavailable, retrying in {delay:.1f}s (attempt {attempt})")
+                stop_at = time.time() + delay
+                while time.time() < stop_at and not should_stop():
+                    time.sleep(min(0.5, stop_at - time.time()))
+                if should_stop():
+                    break
+
+            cached = self._working_sources.get(camera_id)
+            result = None
+            if cached is not None and cached in sources:
+                result = self.probe([cached])
+            if result is None:
+                result = self.probe(sources)
+
+            if result is not None:
+                self._working_sources[camera_id] = result[1]
+                self._connected_at[camera_id] = time.time()
+                if attempt:
+                    logger.info(f"Camera {camera_id} reconnected after {attempt} retries")
+                return result
+            attempt += 1
+        return None
+
+    def watch(self, camera_id: str, cap) -> StreamWatch:
+        """Start watching an open capture for stalls"""
+        stream_watch = StreamWatch(camera_id, cap, self.stall_timeout)
+        with self._lock:
+            self._watches[id(stream_watch)] = stream_watch
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watchdog_loop, daemon=True, name='StreamWatchdog')
+                self._watchdog.start()
+        return stream_watch
+
+    def unwatch(self, stream_watch: StreamWatch):
+        with self._lock:
+            self._watches.pop(id(stream_watch), None)
+
+    def forget(self, camera_id: str):
+        """Drop the remembered state of a camera"""
+        self._working_sources.pop(camera_id, None)
+        self._connected_at.pop(camera_id, None)
+        self._flaps.pop(camera_id, None)
+
+    def _watchdog_loop(self):
+        while True:
+            time.sleep(1.0)
+            now = time.time()
+            with self._lock:
+                stalled = [stream_watch for stream_watch in self._watches.values()
+                           if not stream_watch.stalled and now - stream_watch.last_frame > stream_watch.stall_timeout]
+                for stream_watch in stalled:
+                    stream_watch.stalled = True
+                    self._watches.pop(id(stream_watch), None)
+
+            for stream_watch in stalled:
+                # The reading thread owns the capture and releases it
+                logger.warning(f"Camera {stream_watch.camera_id} stalled, no frame for "
+                               f"{now - stream_watch.last_frame:.0f}s; reconnecting")
+
+# Global instance shared by the camera services
+stream_supervisor = StreamSupervisor()
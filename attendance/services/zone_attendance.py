@@ -12,6 +12,8 @@ from collections import defaultdict, deque
 from datetime import datetime, date
 import logging
 
+from .presence import presence_service
+
 class AttendanceAction(Enum):
     CLOCK_IN = "clock_in"
     CLOCK_OUT = "clock_out"
@@ -63,6 +65,7 @@ class ZoneAttendanceService:
         # Threading
         self.running = False
         self.processing_thread = None
+        self.stop_event = threading.Event()
         
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
@@ -185,6 +188,7 @@ class ZoneAttendanceService:
                 'timestamp': detection_time,
                 'confidence': confidence
             }
+            presence_service.update_location(employee_id, zone_id, zone.name, camera_id, detection_time)
             
             # Add to movement history
             self.movement_history[employee_id].append(movement)
@@ -422,6 +426,7 @@ class ZoneAttendanceService:
             return
         
         self.running = True
+        self.stop_event.clear()
         self.processing_thread = threading.Thread(target=self._cleanup_loop, daemon=True)
         self.processing_thread.start()
         
@@ -430,6 +435,7 @@ class ZoneAttendanceService:
     def stop_zone_tracking(self):
         """Stop zone-based attendance tracking"""
         self.running = False
+        self.stop_event.set()
         if self.processing_thread:
             self.processing_thread.join()
         
@@ -459,11 +465,11 @@ class ZoneAttendanceService:
                     if not self.zone_dwell_timers[employee_id]:
                         del self.zone_dwell_timers[employee_id]
                 
-                time.sleep(60)  # Cleanup every minute
+                self.stop_event.wait(60)  # Cleanup every minute
                 
             except Exception as e:
                 self.logger.error(f"Error in cleanup loop: {e}")
-                time.sleep(60)
+                self.stop_event.wait(60)
     
     def get_zone_status(self) -> Dict:
         """Get current status of all zones"""
@@ -566,6 +572,16 @@ class ZoneAttendanceService:
             }
             self.logger.info(f"Set coordinates for zone {zone_id}: {len(coordinates)} points")
     
+    def get_camera_roi(self, camera_id: str) -> Optional[List[List[Tuple[int, int]]]]:
+        """Zone polygons drawn on a camera's view, None if any of its zones covers the whole view"""
+        polygons = []
+        for zone_id in self.camera_zone_mapping.get(camera_id, []):
+            zone = self.zones.get(zone_id)
+            if not zone or not zone.coordinates or zone.coordinates.get('type') != 'polygon':
+                return None
+            polygons.append(zone.coordinates['polygon'])
+        return polygons or None
+    
     def is_point_in_zone(self, zone_id: str, x: int, y: int) -> bool:
         """Check if a point (face center) is within a zone's defined area"""
         if zone_id not in self.zones:
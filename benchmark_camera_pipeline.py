@@ -0,0 +1,247 @@
+"""
+Benchmark the camera recognition pipelines on replayed video
+
+Usage:
+    python benchmark_camera_pipeline.py [--pipeline cctv|live] [--source clip.mp4|frames_dir]
+                                        [--streams 1,4,16,32] [--fps 15] [--duration 30]
+                                        [--workers 0] [--detection-interval 2.0]
+                                        [--baseline benchmark_results/camera_pipeline.json]
+                                        [--save-baseline] [--tolerance 0.2]
+
+Every simulated camera replays --source at --fps through the real pipeline:
+capture, motion gate, the shared inference pool and matching against the
+enrollment data in --data-dir. Attendance the pipelines record goes to a
+throwaway database in a temporary directory. Without --source a synthetic clip with a
+moving block is generated; it exercises capture, motion gating and face
+detection but contains no faces, so use a recording of people walking past a
+camera for recognition numbers.
+
+Reported per stream count: frames/sec per camera, frames analyzed per second
+in total, recognition latency from capture to result (mean of the per-camera
+p50, worst per-camera p95) and CPU seconds per camera per second, including
+the inference worker processes. --save-baseline stores the results by
+pipeline and stream count; later runs compare against the baseline and exit
+with status 1 when a figure is worse by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from attendance.services.advanced_enrollment import AdvancedEnrollmentService
+from attendance.services.cctv_integration import CameraConfig, CCTVIntegrationService
+from attendance.services.database import DatabaseService
+from attendance.services.inference_scheduler import InferenceScheduler
+from attendance.services.live_camera_recognition import LiveCameraConfig, LiveCameraRecognitionService
+from attendance.services.pipeline_metrics import PipelineMetrics
+from attendance.services.replay_source import replay_url
+from attendance.services.zone_attendance import ZoneAttendanceService
+
+# (figure, True if higher is better) compared against the baseline
+COMPARED = [('fps_per_camera', True), ('analyzed_per_sec', True),
+            ('latency_p95', False), ('cpu_per_camera', False)]
+
+
+def make_clip(path: str, fps: float, seconds: int = 10, size=(1280, 720)):
+    """Synthetic clip: a block crossing a noisy background"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+    rng = np.random.default_rng(0)
+    background = rng.integers(60, 120, (size[1], size[0], 3), dtype=np.uint8)
+    for index in range(int(fps * seconds)):
+        frame = background.copy()
+        x = int(index * 8) % (size[0] - 200)
+        frame[size[1] // 3:size[1] // 3 + 240, x:x + 160] = (200, 180, 160)
+        writer.write(frame)
+    writer.release()
+
+
+def cpu_seconds() -> float:
+    """CPU time of this process and its finished children
+
+    Inference worker processes are started by the forkserver rather than
+    this process, so their CPU time comes from the scheduler's stats instead.
+    """
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def start_cctv(database, enrollment, url, streams, fps, resolution, scheduler, metrics, detection_interval):
+    service = CCTVIntegrationService(database, enrollment, ZoneAttendanceService(database, enrollment))
+    service.metrics = metrics
+    metrics.add_gauge_source(service._metric_gauges)
+    service.inference_scheduler = scheduler
+    if detection_interval is not None:
+        service.detection_interval = detection_interval
+
+    service.cameras = {}
+    for index in range(streams):
+        camera_id = f"bench_{index:02d}"
+        service.cameras[camera_id] = CameraConfig(
+            camera_id=camera_id, name=f"Benchmark {index}", url=url, location=camera_id,
+            fps=int(fps), resolution=resolution
+        )
+    service.start_camera_monitoring()
+    return service.stop_camera_monitoring
+
+
+def start_live(database, enrollment, url, streams, fps, resolution, scheduler, metrics, detection_interval):
+    service = LiveCameraRecognitionService(enrollment_service=enrollment)
+    service.db_service = database
+    service.metrics = metrics
+    metrics.add_gauge_source(service._metric_gauges)
+    service.inference_scheduler = scheduler
+
+    service.active_cameras = {}
+    for index in range(streams):
+        camera_id = f"bench_{index:02d}"
+        config = LiveCameraConfig(camera_id=camera_id, name=f"Benchmark {index}", stream_url=url, zone_id='benchmark')
+        if detection_interval is not None:
+            config.recognition_interval = detection_interval
+        service.active_cameras[camera_id] = config
+        service.start_camera_recognition(camera_id)
+
+    def stop():
+        for camera_id in list(service.active_cameras):
+            service.stop_camera_recognition(camera_id)
+    return stop
+
+
+def run(pipeline: str, streams: int, url: str, args, database, enrollment) -> dict:
+    metrics = PipelineMetrics()
+    scheduler = InferenceScheduler(args.workers or os.cpu_count() or 1, use_processes=not args.threads)
+    start = start_cctv if pipeline == 'cctv' else start_live
+
+    cpu_start = cpu_seconds()
+    started = time.time()
+    stop = start(database, enrollment, url, streams, args.fps, tuple(args.resolution), scheduler, metrics,
+                 args.detection_interval)
+    time.sleep(args.duration)
+    snapshot = metrics.snapshot().get(pipeline, {})
+    elapsed = time.time() - started
+    stop()
+    scheduler.stop()
+    cpu = cpu_seconds() - cpu_start + scheduler.get_stats()['worker_cpu_seconds']
+
+    cameras = [snapshot.get(f"bench_{index:02d}", {}) for index in range(streams)]
+    frames = sum(camera.get('counters', {}).get('frames', 0) for camera in cameras)
+    analyzed = sum(camera.get('stages', {}).get('inference', {}).get('count', 0) for camera in cameras)
+    latencies = [camera['stages']['end_to_end'] for camera in cameras
+                 if camera.get('stages', {}).get('end_to_end', {}).get('p50') is not None]
+
+    return {
+        'streams': streams,
+        'fps_per_camera': frames / streams / elapsed,
+        'analyzed_per_sec': analyzed / elapsed,
+        'latency_p50': float(np.mean([latency['p50'] for latency in latencies])) if latencies else None,
+        'latency_p95': max(latency['p95'] for latency in latencies) if latencies else None,
+        'cpu_per_camera': cpu / streams / elapsed,
+        'dropped': scheduler.get_stats()['dropped']
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """Figures worse than the baseline by more than tolerance"""
+    regressions = []
+    for name, higher_is_better in COMPARED:
+        value, reference = result.get(name), baseline.get(name)
+        if value is None or not reference:
+            continue
+        change = (value - reference) / reference
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{name} {reference:.4g} -> {value:.4g} ({change:+.0%})")
+    return regressions
+
+
+def format_ms(seconds) -> str:
+    return f"{seconds * 1000:.1f}" if seconds is not None else '-'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark camera pipeline throughput on replayed video')
+    parser.add_argument('--pipeline', choices=['cctv', 'live'], default='cctv', help='Pipeline to run')
+    parser.add_argument('--source', help='Video file, image directory or image glob to replay')
+    parser.add_argument('--streams', default='1,4,16,32', help='Comma separated simulated camera counts')
+    parser.add_argument('--fps', type=float, default=15, help='Replay rate per camera')
+    parser.add_argument('--resolution', type=int, nargs=2, default=[1280, 720], metavar=('W', 'H'),
+                        help='Configured camera resolution')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds per stream count')
+    parser.add_argument('--workers', type=int, default=0, help='Inference workers, 0 = one per CPU core')
+    parser.add_argument('--threads', action='store_true', help='Run inference in threads instead of processes')
+    parser.add_argument('--detection-interval', type=float, help='Seconds between analyzed frames per camera')
+    parser.add_argument('--data-dir', default='enrollment_data', help='Enrollment data to match against')
+    parser.add_argument('--baseline', default='benchmark_results/camera_pipeline.json', help='Baseline file')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression')
+    args = parser.parse_args()
+
+    source = args.source
+    if not source:
+        source = os.path.join(tempfile.gettempdir(), 'benchmark_camera_clip.avi')
+        if not os.path.exists(source):
+            make_clip(source, args.fps, size=tuple(args.resolution))
+    url = replay_url(source, args.fps)
+    enrollment = AdvancedEnrollmentService(args.data_dir)
+    database_dir = tempfile.TemporaryDirectory(prefix='benchmark_db_')
+    database = DatabaseService(data_dir=database_dir.name)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baselines = json.load(baseline_file)
+
+    print(f"{args.pipeline} pipeline, {os.path.basename(source)} at {args.fps:g} fps, "
+          f"{args.duration:g}s per run, {os.cpu_count()} CPUs")
+    print(f"{'streams':>8}{'fps/cam':>10}{'analyzed/s':>12}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'cpu/cam':>10}{'dropped':>10}")
+
+    results = {}
+    regressions = []
+    compared = 0
+    for streams in [int(s) for s in args.streams.split(',') if s]:
+        result = run(args.pipeline, streams, url, args, database, enrollment)
+        results[str(streams)] = result
+        print(f"{streams:>8}{result['fps_per_camera']:>10.2f}{result['analyzed_per_sec']:>12.2f}"
+              f"{format_ms(result['latency_p50']):>10}{format_ms(result['latency_p95']):>10}"
+              f"{result['cpu_per_camera']:>10.3f}{result['dropped']:>10}")
+
+        baseline = baselines.get(args.pipeline, {}).get('results', {}).get(str(streams))
+        if baseline and not args.save_baseline:
+            compared += 1
+            for regression in compare(result, baseline, args.tolerance):
+                regressions.append(f"{streams} streams: {regression}")
+
+    if args.save_baseline:
+        baselines[args.pipeline] = {
+            'saved_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'machine': {'platform': platform.platform(), 'cpus': os.cpu_count()},
+            'settings': {'source': os.path.basename(source), 'fps': args.fps, 'duration': args.duration,
+                         'resolution': args.resolution, 'workers': args.workers,
+                         'detection_interval': args.detection_interval},
+            'results': results
+        }
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(baselines, baseline_file, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\nRegressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    elif compared:
+        print(f"\nNo regressions against {args.baseline}")
+    else:
+        print(f"\nNo baseline for these stream counts in {args.baseline}, run with --save-baseline to store one")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark approximate face search against exact search on synthetic galleries
+
+Usage:
+    python benchmark_face_index.py [--sizes 1000,10000,100000] [--per-identity 2]
+                                   [--queries 200] [--probes 1,4,8,16]
+
+Each identity gets a random 128-d centre and --per-identity noisy encodings
+around it, spaced like real face encodings (same person ~0.3 apart, different
+people ~1.0 apart). Queries are fresh noisy samples of random identities.
+Recall is the share of queries where the index returns the same identity as
+exact search.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from attendance.services.face_index import create_face_index
+
+DIM = 128
+
+
+def make_gallery(identities: int, per_identity: int, rng):
+    """Synthetic (vectors, labels, centres)"""
+    centres = rng.normal(0, 0.06, (identities, DIM)).astype(np.float32)
+    labels = np.repeat(np.arange(identities), per_identity)
+    vectors = centres[labels] + rng.normal(0, 0.014, (len(labels), DIM)).astype(np.float32)
+    return vectors, labels.tolist(), centres
+
+
+def time_queries(index, queries, **search_options):
+    """Return (labels found, per-query latencies in ms)"""
+    found = []
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        result = index.search(query, k=1, **search_options)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(result[0][0] if result else None)
+    return found, np.array(latencies)
+
+
+def run(identities: int, per_identity: int, query_count: int, probes):
+    rng = np.random.default_rng(identities)
+    vectors, labels, centres = make_gallery(identities, per_identity, rng)
+    truth = rng.integers(0, identities, query_count)
+    queries = centres[truth] + rng.normal(0, 0.014, (query_count, DIM)).astype(np.float32)
+
+    print(f"\n{identities:,} identities, {len(vectors):,} encodings, {query_count} queries")
+    print(f"{'index':<16}{'build s':>10}{'mean ms':>10}{'p95 ms':>10}{'recall':>10}{'accuracy':>10}")
+
+    exact = create_face_index('exact', DIM)
+    start = time.perf_counter()
+    exact.build(vectors, labels)
+    build_time = time.perf_counter() - start
+    exact_found, latencies = time_queries(exact, queries)
+    accuracy = np.mean(np.array(exact_found) == truth)
+    print(f"{'exact':<16}{build_time:>10.2f}{latencies.mean():>10.3f}"
+          f"{np.percentile(latencies, 95):>10.3f}{1.0:>10.3f}{accuracy:>10.3f}")
+
+    ivf = create_face_index('ivf', DIM)
+    start = time.perf_counter()
+    ivf.build(vectors, labels)
+    build_time = time.perf_counter() - start
+    for n_probe in probes:
+        found, latencies = time_queries(ivf, queries, n_probe=n_probe)
+        recall = np.mean([a == b for a, b in zip(found, exact_found)])
+        accuracy = np.mean(np.array(found, dtype=object) == truth)
+        print(f"{f'ivf probe={n_probe}':<16}{build_time:>10.2f}{latencies.mean():>10.3f}"
+              f"{np.percentile(latencies, 95):>10.3f}{recall:>10.3f}{accuracy:>10.3f}")
+
+    # Incremental insertion, as done on enrollment
+    new_identity = rng.normal(0, 0.06, DIM).astype(np.float32)
+    start = time.perf_counter()
+    ivf.add(new_identity + rng.normal(0, 0.014, (per_identity, DIM)).astype(np.float32), identities)
+    insert_ms = (time.perf_counter() - start) * 1000
+    hit = ivf.search(new_identity, k=1)[0][0] == identities
+    print(f"incremental insert: {insert_ms:.2f} ms, new identity found: {hit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark face index recall and latency')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma separated identity counts')
+    parser.add_argument('--per-identity', type=int, default=2, help='Encodings per identity')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per gallery size')
+    parser.add_argument('--probes', default='1,4,8,16', help='Comma separated IVF probe counts')
+    args = parser.parse_args()
+
+    probes = [int(p) for p in args.probes.split(',') if p]
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        run(size, args.per_identity, args.queries, probes)
+
+
+if __name__ == '__main__':
+    main()
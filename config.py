@@ -24,6 +24,19 @@ class Config:
     # Face recognition settings
     FACE_RECOGNITION_ENABLED = True
     FACE_CONFIDENCE_THRESHOLD = float(os.environ.get('FACE_THRESHOLD', 0.6))
+    # Nearest-neighbour index for large face galleries: 'exact' (brute force) or
+    # 'ivf' (k-means cells, FACE_IVF_PROBES cells scanned per query; more probes =
+    # better recall, slower). Only used once the gallery reaches FACE_INDEX_MIN_SIZE encodings.
+    FACE_INDEX_TYPE = os.environ.get('FACE_INDEX_TYPE', 'exact').lower()
+    FACE_INDEX_MIN_SIZE = int(os.environ.get('FACE_INDEX_MIN_SIZE', 20000))
+    FACE_IVF_LISTS = int(os.environ.get('FACE_IVF_LISTS', 0))  # 0 = sqrt(gallery size)
+    FACE_IVF_PROBES = int(os.environ.get('FACE_IVF_PROBES', 8))
+    FACE_BATCH_MAX_IMAGES = int(os.environ.get('FACE_BATCH_MAX_IMAGES', 32))  # per /api/face_recognition/recognize_batch call
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 0))  # 0 = one per CPU core, shared by all camera streams
+    INFERENCE_USE_PROCESSES = os.environ.get('INFERENCE_USE_PROCESSES', 'true').lower() == 'true'
+    MJPEG_QUALITY = int(os.environ.get('MJPEG_QUALITY', 80))  # JPEG quality of /api/advanced/cameras/mjpeg streams
+    MJPEG_MAX_FPS = float(os.environ.get('MJPEG_MAX_FPS', 10))  # Encoded frames per second per camera, shared by all viewers
+    CAMERA_DECODE_PROCESS = os.environ.get('CAMERA_DECODE_PROCESS', 'false').lower() == 'true'  # Decode CCTV streams in separate processes
     CAMERA_TIMEOUT = int(os.environ.get('CAMERA_TIMEOUT', 30))    # Data storage
     DATA_DIR = Path(os.environ.get('ATTENDANCE_DATA_DIR', 'data'))
     DATABASE_URI = str(DATA_DIR)  # For compatibility with tests
@@ -45,6 +58,24 @@ class Config:
     # Performance settings
     RECOGNITION_TIMEOUT = int(os.environ.get('RECOGNITION_TIMEOUT', 5))  # seconds
     CACHE_DURATION = int(os.environ.get('CACHE_DURATION', 300))  # 5 minutes
+    DB_CACHE_ENABLED = os.environ.get('DB_CACHE_ENABLED', 'true').lower() == 'true'  # Keep JSON collections parsed in memory
+    
+    # Storage backend: 'json' (files in DATA_DIR) or 'sqlite' (WAL-mode database,
+    # migrated from the JSON files on first start)
+    DB_BACKEND = os.environ.get('DB_BACKEND', 'json').lower()
+    DB_SQLITE_PATH = os.environ.get('DB_SQLITE_PATH', str(DATA_DIR / 'attendance.db'))
+    
+    # Append-only change log storage (snapshot + JSONL log per collection); the
+    # terminal clock-in/out batch writes all three of these
+    DB_LOG_COLLECTIONS = [c.strip() for c in os.environ.get('DB_LOG_COLLECTIONS', 'attendance_records,audit_logs,employees').split(',') if c.strip()]
+    DB_LOG_FSYNC = os.environ.get('DB_LOG_FSYNC', 'true').lower() == 'true'
+    DB_COMPACT_INTERVAL = int(os.environ.get('DB_COMPACT_INTERVAL', 300))  # seconds
+    DB_COMPACT_MIN_ENTRIES = int(os.environ.get('DB_COMPACT_MIN_ENTRIES', 1000))
+    
+    # Monthly partition files (<collection>/YYYY-MM.json) for date-bounded queries;
+    # a partitioned collection does not also use the change log
+    DB_PARTITIONED_COLLECTIONS = [c.strip() for c in os.environ.get('DB_PARTITIONED_COLLECTIONS', '').split(',') if c.strip()]
+    DB_ARCHIVE_AFTER_MONTHS = int(os.environ.get('DB_ARCHIVE_AFTER_MONTHS', 12))  # gzip older partitions, 0 disables
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -285,37 +285,31 @@ def delete_message():
 def get_employees_list():
     """Get list of employees for sending messages"""
     try:
-        # Load employees directly from JSON file to bypass any model issues
-        import json
-        from pathlib import Path
+        # Read through the database service: employees may be stored as a
+        # snapshot plus change log, so employees.json alone can be stale
+        from attendance.services.database import db
         
-        employees_file = Path('attendance_data/employees.json')
         employee_list = []
+        raw_employees = [employee.to_dict() for employee in db.get_all('employees')]
         
-        if employees_file.exists():
-            with open(employees_file, 'r') as f:
-                raw_employees = json.load(f)
-            
-            print(f"Loaded {len(raw_employees)} employees from JSON")  # Debug output
-            
-            for emp in raw_employees:
-                # Check if employee is active
-                if emp.get('employment_status') == 'active':
-                    first_name = emp.get('first_name', '')
-                    last_name = emp.get('last_name', '')
-                    full_name = f"{first_name} {last_name}".strip()
-                    
-                    employee_list.append({
-                        'id': emp.get('employee_id', ''),
-                        'name': full_name,
-                        'department': emp.get('department', 'N/A'),
-                        'active': True
-                    })
-                    print(f"  Added active employee: {emp.get('employee_id')} - {full_name}")
-            
-            print(f"Filtered to {len(employee_list)} active employees")  # Debug output
-        else:
-            print("WARNING: employees.json file not found")
+        print(f"Loaded {len(raw_employees)} employees")  # Debug output
+        
+        for emp in raw_employees:
+            # Check if employee is active
+            if emp.get('employment_status') == 'active':
+                first_name = emp.get('first_name', '')
+                last_name = emp.get('last_name', '')
+                full_name = f"{first_name} {last_name}".strip()
+                
+                employee_list.append({
+                    'id': emp.get('employee_id', ''),
+                    'name': full_name,
+                    'department': emp.get('department', 'N/A'),
+                    'active': True
+                })
+                print(f"  Added active employee: {emp.get('employee_id')} - {full_name}")
+        
+        print(f"Filtered to {len(employee_list)} active employees")  # Debug output
         
         return jsonify({
             'success': True,
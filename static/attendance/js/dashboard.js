@@ -90,15 +90,140 @@ function updateTimeDisplay() {
     }
 }
 
+// List currently shown in the activity card: 'activity', 'present', 'late' or 'absent'
+let currentView = 'activity';
+let viewRefreshTimer = null;
+
 function startRealTimeUpdates() {
     // Update time every second
     setInterval(updateTimeDisplay, 1000);
     
-    // Refresh activity every 30 seconds
-    setInterval(refreshTodayActivity, 30000);
+    // Activity, counts and status are pushed by the server as they change
+    if (window.EventSource) {
+        connectEventStream();
+    } else {
+        pollEvents(null);
+    }
+}
+
+function connectEventStream() {
+    // EventSource reconnects by itself and resumes from the last event id
+    const source = new EventSource('/admin/api/events');
+    ['snapshot', 'presence', 'resync', 'recognition', 'terminal'].forEach(type => {
+        source.addEventListener(type, event => handleDashboardEvent(type, JSON.parse(event.data)));
+    });
+    source.onerror = () => console.warn('Dashboard event stream interrupted, reconnecting...');
+}
+
+function pollEvents(lastId) {
+    // Long-poll fallback for browsers without EventSource
+    const url = '/admin/api/events/poll' + (lastId !== null ? `?last_id=${lastId}` : '');
+    fetch(url)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) throw new Error(data.error);
+            data.events.forEach(event => handleDashboardEvent(event.type, event.data));
+            pollEvents(data.last_id);
+        })
+        .catch(error => {
+            console.error('Error polling dashboard events:', error);
+            setTimeout(() => pollEvents(lastId), 5000);
+        });
+}
+
+function handleDashboardEvent(type, data) {
+    switch (type) {
+        case 'snapshot':
+            updateCounts(data.counts);
+            updateStatusIndicators(data.status);
+            break;
+        case 'presence':
+            updateCounts(data.counts);
+            if (currentView === 'activity') {
+                if (data.action === 'clock_in' || data.action === 'clock_out') {
+                    prependActivityRow(data);
+                }
+            } else if (data.states.includes(currentView) || data.previous_states.includes(currentView)) {
+                scheduleViewRefresh();
+            }
+            break;
+        case 'resync':
+            if (data.counts) updateCounts(data.counts);
+            scheduleViewRefresh();
+            break;
+        case 'recognition':
+        case 'terminal':
+            console.log(`Dashboard event: ${type}`, data);
+            break;
+    }
+}
+
+function updateCounts(counts) {
+    if (!counts) return;
+    const cards = {presentTodayCard: counts.present, lateTodayCard: counts.late, absentTodayCard: counts.absent};
+    Object.entries(cards).forEach(([cardId, count]) => {
+        const value = document.querySelector(`#${cardId} .h2`);
+        if (value && count !== undefined) value.textContent = count;
+    });
+}
+
+function scheduleViewRefresh() {
+    // Several changes in quick succession reload the open list once
+    clearTimeout(viewRefreshTimer);
+    viewRefreshTimer = setTimeout(() => {
+        const refresh = {
+            activity: refreshTodayActivity,
+            present: showPresentEmployees,
+            late: showLateEmployees,
+            absent: showAbsentEmployees
+        }[currentView];
+        refresh();
+    }, 1000);
+}
+
+function prependActivityRow(data) {
+    const tbody = document.getElementById('todayActivity');
+    if (!tbody) return;
+    
+    const clockIn = data.action === 'clock_in';
+    const timestamp = clockIn ? data.clock_in_time : data.clock_out_time;
+    const statusBadge = data.is_late ? 
+        '<span class="badge bg-warning">Late</span>' : 
+        '<span class="badge bg-success">On Time</span>';
+    
+    // Drop the "No activity" placeholder
+    if (tbody.querySelector('td[colspan]')) {
+        tbody.innerHTML = '';
+    }
     
-    // Check system status every 5 minutes
-    setInterval(updateSystemStatus, 300000);
+    tbody.insertAdjacentHTML('afterbegin', `
+        <tr>
+            <td>
+                <div class="d-flex align-items-center">
+                    <div class="avatar me-2"><i class="fas fa-user-circle fa-2x text-muted"></i></div>
+                    <div>
+                        <div class="fw-bold">${data.employee.name}</div>
+                        <small class="text-muted">${data.employee.employee_id}</small>
+                    </div>
+                </div>
+            </td>
+            <td>
+                <span class="badge bg-${clockIn ? 'success' : 'danger'}">
+                    <i class="fas fa-${clockIn ? 'sign-in-alt' : 'sign-out-alt'} me-1"></i>
+                    ${clockIn ? 'Clock In' : 'Clock Out'}
+                </span>
+            </td>
+            <td>${timestamp ? formatTime(timestamp) : ''}</td>
+            <td>
+                <small class="text-muted">${data.ip_address || 'Unknown'}</small>
+            </td>
+            <td>${statusBadge}</td>
+        </tr>`);
+    
+    // Keep the same 20 rows the server sends
+    while (tbody.rows.length > 20) {
+        tbody.deleteRow(-1);
+    }
 }
 
 function refreshTodayActivity() {
@@ -141,6 +266,7 @@ function refreshTodayActivity() {
 function updateActivityTable(activities) {
     const tbody = document.getElementById('todayActivity');
     if (!tbody) return;
+    currentView = 'activity';
     
     // Reset the activity header title if it was changed
     const cardTitle = tbody.closest('.card').querySelector('.card-title');
@@ -412,6 +538,7 @@ function showNotification(message, type = 'info') {
 
 function showPresentEmployees() {
     console.log('Present Today card clicked - showing detailed employee list');
+    currentView = 'present';
     
     // Add visual feedback to the card
     const card = document.getElementById('presentTodayCard');
@@ -544,6 +671,7 @@ function displayPresentEmployees(employees) {
 
 function showLateEmployees() {
     console.log('Late Today card clicked - showing detailed late employee list');
+    currentView = 'late';
     
     // Add visual feedback to the card
     const card = document.getElementById('lateTodayCard');
@@ -692,6 +820,7 @@ function formatDate(timestamp) {
 
 function showAbsentEmployees() {
     console.log('Absent Today card clicked - showing detailed absent employee list');
+    currentView = 'absent';
     
     // Add visual feedback to the card
     const card = document.getElementById('absentTodayCard');
@@ -0,0 +1,34 @@
+"""
+Shared fixtures for the test suite
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance.services import database
+
+
+@pytest.fixture
+def configure_db(tmp_path):
+    """Configure the module-level database service on an empty data directory
+
+    configure_db(DB_LOG_COLLECTIONS=[...]) takes the app config keys and
+    returns the (same) service object.
+    """
+    data_dir = tmp_path / 'data'
+
+    def configure(**config):
+        config.setdefault('DB_LOG_COLLECTIONS', [])
+        return database.configure_database_service(database.db, dict(config, DATA_DIR=str(data_dir)))
+
+    return configure
+
+
+@pytest.fixture
+def shared_db(configure_db):
+    """The module-level database service with single-file JSON collections"""
+    return configure_db()
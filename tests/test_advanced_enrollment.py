@@ -0,0 +1,73 @@
+"""
+Matching analyzed faces against enrolled profiles
+"""
+
+import numpy as np
+import pytest
+
+from attendance.services.advanced_enrollment import AdvancedEnrollmentService, EmployeeEmbeddingProfile
+from attendance.services.face_gallery import gallery_service
+
+DIM = 128
+
+
+def noise(rng, scale, count=1):
+    return rng.normal(0, scale / np.sqrt(DIM), (count, DIM)).astype(np.float32)
+
+
+@pytest.fixture
+def enrollment(tmp_path):
+    rng = np.random.default_rng(3)
+    service = AdvancedEnrollmentService(str(tmp_path))
+    centers = {}
+    for index in range(200):
+        employee_id = f'E{index:03d}'
+        center = rng.normal(0, 0.7 / np.sqrt(DIM), DIM).astype(np.float32)
+        centers[employee_id] = center
+        profile = EmployeeEmbeddingProfile(employee_id=employee_id, name=f'Employee {index}',
+                                           enrollment_complete=True)
+        profile.primary_embeddings = list(center + noise(rng, 0.15, 3))
+        for set_key in ('angle_front', 'lighting_dim', 'lighting_normal', 'distance_medium'):
+            if index % 4:  # Some employees lack the variation sets
+                profile.variation_embeddings[set_key] = list(center + noise(rng, 0.2, 2))
+        service.employee_profiles[employee_id] = profile
+
+    # Faces of enrolled employees at varying distances, and strangers
+    faces = []
+    for index, employee_id in enumerate(sorted(centers)[:80]):
+        faces.append(centers[employee_id] + noise(rng, 0.05 + 0.005 * index)[0])
+    faces.extend(noise(rng, 0.7, 20))
+    service.test_faces = [
+        {'face_location': (0, 10, 10, 0), 'face_encoding': encoding,
+         'detection_characteristics': {'angle': 'front', 'lighting': 'dim' if i % 2 else 'normal',
+                                       'distance': 'medium'}}
+        for i, encoding in enumerate(faces)
+    ]
+    return service
+
+
+def test_indexed_matching_equals_full_scan(enrollment, monkeypatch):
+    expected = enrollment.match_analyzed_faces(enrollment.test_faces)
+    assert enrollment.get_embedding_matrix().index is None
+    assert len(expected) > 40
+
+    monkeypatch.setattr(gallery_service, 'index_type', 'ivf')
+    monkeypatch.setattr(gallery_service, 'index_min_size', 100)
+    monkeypatch.setattr(gallery_service, 'index_options', {'n_lists': 8, 'n_probe': 8})
+    enrollment._embedding_matrix = None
+    assert enrollment.get_embedding_matrix().index is not None
+
+    matches = enrollment.match_analyzed_faces(enrollment.test_faces)
+    assert [match['employee_id'] for match in matches] == [match['employee_id'] for match in expected]
+    assert [match['confidence'] for match in matches] == pytest.approx([match['confidence'] for match in expected])
+
+
+def test_crowded_shortlist_falls_back_to_full_scan(enrollment, monkeypatch):
+    monkeypatch.setattr(gallery_service, 'index_type', 'ivf')
+    monkeypatch.setattr(gallery_service, 'index_min_size', 100)
+    monkeypatch.setattr(gallery_service, 'index_options', {'n_lists': 8, 'n_probe': 8})
+    embedding_matrix = enrollment.get_embedding_matrix()
+
+    encoding = enrollment.test_faces[0]['face_encoding']
+    assert embedding_matrix.candidates(encoding, radius=10.0, k=5) is None
+    assert embedding_matrix.candidates(encoding, radius=0.4) == [0]
@@ -0,0 +1,63 @@
+"""
+Camera threads stop with their camera, not only with monitoring
+"""
+
+import pytest
+
+from attendance.services.cctv_integration import CameraConfig, CCTVIntegrationService
+from attendance.services.decode_process import DecoderProcess
+from attendance.services.stream_supervisor import StreamSupervisor
+
+
+class UnreachableSupervisor(StreamSupervisor):
+    def probe(self, sources):
+        return None
+
+
+@pytest.fixture
+def service():
+    service = CCTVIntegrationService(None, None, None)
+    service.cameras.clear()
+    service.stream_supervisor = UnreachableSupervisor()
+    service.running = True
+    yield service
+    service.running = False
+    for camera_id in list(service.camera_threads):
+        service._stop_camera_thread(camera_id)
+
+
+def camera(camera_id='cam1'):
+    return CameraConfig(camera_id=camera_id, name=camera_id, url='rtsp://camera/stream', location='entrance')
+
+
+def test_removed_camera_stops_reconnecting(service):
+    service.configure_camera(camera('cam1'))
+    service.configure_camera(camera('cam2'))
+    service._start_camera_thread(service.cameras['cam1'])
+    service._start_camera_thread(service.cameras['cam2'])
+    thread = service.camera_threads['cam1']
+
+    service.remove_camera('cam1')
+
+    assert not thread.is_alive()
+    assert service.camera_threads['cam2'].is_alive()
+
+
+def test_reconfigured_camera_runs_one_thread(service):
+    service.configure_camera(camera())
+    service._start_camera_thread(service.cameras['cam1'])
+    old_thread = service.camera_threads['cam1']
+
+    service.configure_camera(camera())
+
+    assert not old_thread.is_alive()
+    assert service.camera_threads['cam1'].is_alive()
+
+
+def test_stopped_decoder_is_not_restarted():
+    decoder = DecoderProcess('cam1', 'rtsp://camera/stream', (64, 48), fps=5)
+    decoder.stop()
+
+    assert not decoder.restart()
+    assert not decoder.is_alive()
+    assert decoder.restarts == 0
@@ -0,0 +1,126 @@
+"""
+Clocking in and out through the terminal blueprint, and batch commits
+"""
+
+import json
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from attendance.models import AttendanceRecord, AuditLog, Employee, Shift
+from attendance.routes import terminal
+from attendance.services.database import DatabaseService
+
+LOGGED = ['attendance_records', 'audit_logs', 'employees']
+
+
+def make_employee(employee_id='E1'):
+    return Employee(employee_id=employee_id, first_name='Ada', last_name='Lovelace',
+                    email=f'{employee_id.lower()}@example.com', department='Engineering')
+
+
+@pytest.fixture
+def logged_db(configure_db):
+    return configure_db(DB_LOG_COLLECTIONS=LOGGED)
+
+
+@pytest.fixture
+def client(logged_db):
+    app = Flask(__name__)
+    app.register_blueprint(terminal.bp, url_prefix='/terminal')
+    return app.test_client()
+
+
+def test_clock_in_and_out_through_blueprint(client, logged_db):
+    employee = logged_db.create('employees', make_employee())
+    payload = {'employee_id': 'E1', 'terminal_id': 'T1', 'auth_method': 'pin'}
+
+    response = client.post('/terminal/api/clock_in', json=payload)
+    assert response.status_code == 200
+    assert response.get_json()['success']
+    assert logged_db.get_active_attendance_record('E1') is not None
+    assert logged_db.get_by_id('employees', employee.id).last_clock_in
+
+    response = client.post('/terminal/api/clock_out', json=payload)
+    assert response.status_code == 200
+    assert response.get_json()['success']
+    assert logged_db.get_active_attendance_record('E1') is None
+    assert logged_db.get_by_id('employees', employee.id).last_clock_out
+
+    events = [log.event_type for log in logged_db.get_all('audit_logs')]
+    assert events.count('clock_in') == 1
+    assert events.count('clock_out') == 1
+
+
+
+@pytest.mark.parametrize('endpoint, payload, flagged', [
+    ('/terminal/api/clock_out', {'employee_id': 'E1', 'terminal_id': 'T1', 'auth_method': 'pin'}, True),
+    ('/terminal/api/clock_action', {'employee_id': 'E1', 'terminal_id': 'T1', 'action': 'clock_out'}, False),
+])
+def test_early_departure_is_flagged_by_the_clock_out_endpoint_only(client, logged_db, endpoint, payload, flagged):
+    logged_db.create('employees', make_employee())
+    shift = logged_db.create('shifts', Shift(name='All day', start_time='00:00:00', end_time='23:59:59',
+                                             early_departure_grace_period=0))
+    record = logged_db.create('attendance_records', AttendanceRecord(
+        employee_id='E1', date=date.today().isoformat(), shift_id=shift.id, status='active',
+        clock_in_time=(datetime.now() - timedelta(minutes=1)).isoformat()))
+
+    response = client.post(endpoint, json=payload)
+    assert response.get_json()['success']
+    assert logged_db.get_by_id('attendance_records', record.id).is_early_departure is flagged
+
+
+def test_failed_batch_writes_nothing(logged_db):
+    employee = logged_db.create('employees', make_employee())
+    record = AttendanceRecord(employee_id='E1', date='2026-01-05', clock_in_time='2026-01-05T09:00:00')
+
+    with pytest.raises(KeyError):
+        with logged_db.batch() as batch:
+            batch.create('attendance_records', record)
+            batch.update('employees', employee.id, {'last_clock_in': record.clock_in_time})
+            batch.update('employees', 'missing', {'last_clock_in': record.clock_in_time})
+
+    assert logged_db.get_all('attendance_records') == []
+    assert not logged_db.get_by_id('employees', employee.id).last_clock_in
+
+
+def test_interrupted_batch_is_recovered_once(tmp_path, logged_db):
+    employee = logged_db.create('employees', make_employee())
+    record = AttendanceRecord(employee_id='E1', date='2026-01-05', clock_in_time='2026-01-05T09:00:00')
+    with logged_db.batch() as batch:
+        batch.create('attendance_records', record)
+        batch.update('employees', employee.id, {'last_clock_in': record.clock_in_time})
+        batch.create('audit_logs', AuditLog(event_type='clock_in', user_id='E1'))
+
+    # Crash after the journal line was written but before the attendance
+    # log was appended: drop the batch's entries from that log
+    data_dir = tmp_path / 'data'
+    log_path = data_dir / f'attendance_records{DatabaseService.LOG_SUFFIX}'
+    lines = log_path.read_bytes().splitlines(keepends=True)
+    log_path.write_bytes(b''.join(line for line in lines if b'"batch"' not in line))
+    journal_path = data_dir / DatabaseService.BATCH_JOURNAL
+    assert journal_path.read_bytes()
+
+    recovered = DatabaseService(data_dir, log_collections=LOGGED)
+    assert [r.employee_id for r in recovered.get_all('attendance_records')] == ['E1']
+    assert recovered.get_by_id('employees', employee.id).last_clock_in == record.clock_in_time
+    assert len(recovered.get_all('audit_logs')) == 1
+    assert not journal_path.read_bytes()
+
+    # A second start has nothing left to re-apply
+    again = DatabaseService(data_dir, log_collections=LOGGED)
+    assert len(again.get_all('attendance_records')) == 1
+    assert len(again.get_all('audit_logs')) == 1
+
+
+def test_torn_journal_line_is_not_applied(tmp_path, logged_db):
+    data_dir = tmp_path / 'data'
+    record = AttendanceRecord(employee_id='E1', date='2026-01-05').to_dict()
+    line = json.dumps({'batch': 'torn', 'collections': {
+        'attendance_records': [{'op': 'put', 'id': record['id'], 'record': record, 'batch': 'torn'}]
+    }}).encode('utf-8')
+    (data_dir / DatabaseService.BATCH_JOURNAL).write_bytes(line[:-10])
+
+    recovered = DatabaseService(data_dir, log_collections=LOGGED)
+    assert recovered.get_all('attendance_records') == []
@@ -0,0 +1,83 @@
+"""
+Secondary indexes stay consistent with the data after writes that change indexed fields
+"""
+
+import pytest
+
+from attendance.models import AttendanceRecord
+from attendance.services.database import DatabaseService
+
+STORAGE = {
+    'json': {},
+    'log': {'log_collections': ['attendance_records']},
+    'partitioned': {'partitioned_collections': ['attendance_records']},
+}
+
+
+@pytest.fixture(params=sorted(STORAGE))
+def db(request, tmp_path):
+    return DatabaseService(tmp_path, **STORAGE[request.param])
+
+
+def ids(models):
+    return sorted(model.id for model in models)
+
+
+def scan(db, **filters):
+    return [record for record in db.get_all('attendance_records')
+            if all(getattr(record, key) == value for key, value in filters.items())]
+
+
+def assert_consistent(db):
+    for employee_id in ('E1', 'E2', 'E3'):
+        assert ids(db.find('attendance_records', {'employee_id': employee_id})) == \
+            ids(scan(db, employee_id=employee_id))
+        for status in ('active', 'completed'):
+            assert ids(db.find('attendance_records', {'employee_id': employee_id, 'status': status})) == \
+                ids(scan(db, employee_id=employee_id, status=status))
+    for day in ('2026-01-05', '2026-01-06', '2026-02-02'):
+        assert ids(db.find('attendance_records', {'date': day})) == ids(scan(db, date=day))
+    in_range = db.get_attendance_records_by_date_range('2026-01-01', '2026-01-31')
+    assert ids(in_range) == ids(record for record in db.get_all('attendance_records')
+                                if '2026-01-01' <= record.date <= '2026-01-31')
+    assert [record.date for record in in_range] == sorted(record.date for record in in_range)
+
+
+def test_index_follows_key_changing_updates(db):
+    first = db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-01-05'))
+    second = db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-01-06'))
+    third = db.create('attendance_records', AttendanceRecord(employee_id='E2', date='2026-01-06'))
+    assert_consistent(db)  # Builds the indexes
+
+    db.update('attendance_records', first.id, {'employee_id': 'E3'})
+    db.update('attendance_records', second.id, {'status': 'completed'})
+    db.update('attendance_records', third.id, {'date': '2026-02-02'})
+    assert_consistent(db)
+    assert ids(db.find('attendance_records', {'employee_id': 'E1'})) == [second.id]
+    assert db.find('attendance_records', {'employee_id': 'E1', 'status': 'active'}) == []
+
+    db.delete('attendance_records', second.id)
+    assert_consistent(db)
+    assert db.find('attendance_records', {'employee_id': 'E1'}) == []
+
+
+def test_index_follows_batch_updates(db):
+    record = db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-01-05'))
+    assert_consistent(db)
+
+    with db.batch() as batch:
+        batch.update('attendance_records', record.id, {'employee_id': 'E2', 'status': 'completed'})
+        batch.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-01-06'))
+    assert_consistent(db)
+    assert ids(db.find('attendance_records', {'employee_id': 'E2', 'status': 'completed'})) == [record.id]
+
+
+def test_index_follows_writes_by_another_instance(db, tmp_path):
+    record = db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-01-05'))
+    assert_consistent(db)
+
+    other = DatabaseService(tmp_path, log_collections=sorted(db.log_collections),
+                            partitioned_collections=sorted(db.partitioned_collections))
+    other.update('attendance_records', record.id, {'employee_id': 'E2', 'date': '2026-01-06'})
+    assert_consistent(db)
+    assert ids(db.find('attendance_records', {'employee_id': 'E2'})) == [record.id]
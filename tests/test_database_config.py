@@ -0,0 +1,49 @@
+"""
+Database backend configuration through init_app
+"""
+
+from flask import Flask
+
+from attendance.models import Employee
+from attendance.services import database
+from attendance.services.database import DatabaseService
+
+
+def make_app(tmp_path, **config):
+    app = Flask(__name__)
+    app.config.update(dict({'DATA_DIR': str(tmp_path / 'data'), 'BACKUP_ENABLED': False, 'DB_LOG_COLLECTIONS': []},
+                           **config))
+    return app
+
+
+def test_init_app_configures_the_imported_instance(tmp_path):
+    imported = database.db
+    database.init_app(make_app(tmp_path, DB_LOG_COLLECTIONS=['attendance_records'], DB_CACHE_ENABLED=False))
+
+    assert database.db is imported
+    assert database.db_service is imported
+    assert imported.data_dir == tmp_path / 'data'
+    assert imported.log_collections == {'attendance_records'}
+    assert not imported.cache_enabled
+
+
+def test_init_app_selects_sqlite_backend(tmp_path):
+    from attendance.services.sqlite_database import SQLiteDatabaseService
+
+    imported = database.db
+    database.init_app(make_app(tmp_path, DB_BACKEND='sqlite'))
+
+    assert database.db is imported
+    assert isinstance(imported, SQLiteDatabaseService)
+    imported.create('employees', Employee(employee_id='E1', first_name='A', last_name='B',
+                                          email='a@example.com', department='D'))
+    assert imported.get_employee_by_employee_id('E1') is not None
+    assert (tmp_path / 'data' / 'attendance.db').exists()
+
+
+def test_reconfigure_back_to_json(tmp_path, configure_db):
+    configure_db(DB_BACKEND='sqlite')
+    service = configure_db(DB_BACKEND='json')
+
+    assert service is database.db
+    assert type(service) is DatabaseService
@@ -0,0 +1,105 @@
+"""
+Append-only change log storage: replay, compaction and concurrent writers
+"""
+
+import json
+import multiprocessing
+
+from attendance.models import AuditLog
+from attendance.services.database import DatabaseService
+
+LOGGED = ['audit_logs']
+
+
+def open_db(data_dir):
+    return DatabaseService(data_dir, log_collections=LOGGED, log_fsync=False)
+
+
+def event_types(db):
+    return sorted(log.event_type for log in db.get_all('audit_logs'))
+
+
+def append_events(data_dir, prefix, count):
+    db = open_db(data_dir)
+    for index in range(count):
+        db.create('audit_logs', AuditLog(event_type=f'{prefix}{index:04d}'))
+
+
+def test_log_replays_creates_updates_and_deletes(tmp_path):
+    db = open_db(tmp_path)
+    kept = db.create('audit_logs', AuditLog(event_type='kept'))
+    removed = db.create('audit_logs', AuditLog(event_type='removed'))
+    db.update('audit_logs', kept.id, {'event_type': 'updated'})
+    db.delete('audit_logs', removed.id)
+
+    assert json.loads((tmp_path / 'audit_logs.json').read_text()) == []
+    assert event_types(open_db(tmp_path)) == ['updated']
+
+
+def test_torn_log_tail_is_ignored(tmp_path):
+    db = open_db(tmp_path)
+    db.create('audit_logs', AuditLog(event_type='complete'))
+    with open(tmp_path / f'audit_logs{DatabaseService.LOG_SUFFIX}', 'ab') as f:
+        f.write(b'{"op":"put","id":"torn","record":{"id":"to')
+
+    assert event_types(open_db(tmp_path)) == ['complete']
+
+
+def test_compaction_folds_log_into_snapshot(tmp_path):
+    db = open_db(tmp_path)
+    for index in range(3):
+        db.create('audit_logs', AuditLog(event_type=f'e{index}'))
+
+    assert db.compact_collection('audit_logs')
+    assert len(json.loads((tmp_path / 'audit_logs.json').read_text())) == 3
+    assert (tmp_path / f'audit_logs{DatabaseService.LOG_SUFFIX}').read_bytes() == b''
+    assert event_types(open_db(tmp_path)) == ['e0', 'e1', 'e2']
+
+
+def test_append_by_another_instance_during_compaction_is_kept(tmp_path):
+    db = open_db(tmp_path)
+    other = open_db(tmp_path)
+    db.create('audit_logs', AuditLog(event_type='before'))
+
+    write_temp_snapshot = db._write_temp_snapshot
+
+    def append_while_serializing(file_path, data):
+        other.create('audit_logs', AuditLog(event_type='during'))
+        return write_temp_snapshot(file_path, data)
+
+    db._write_temp_snapshot = append_while_serializing
+    assert db.compact_collection('audit_logs')
+
+    assert event_types(db) == ['before', 'during']
+    assert event_types(open_db(tmp_path)) == ['before', 'during']
+
+
+def test_compaction_by_another_instance_is_not_overwritten(tmp_path):
+    db = open_db(tmp_path)
+    other = open_db(tmp_path)
+    db.create('audit_logs', AuditLog(event_type='first'))
+
+    write_temp_snapshot = db._write_temp_snapshot
+
+    def compact_elsewhere(file_path, data):
+        other.create('audit_logs', AuditLog(event_type='second'))
+        other.compact_collection('audit_logs')
+        return write_temp_snapshot(file_path, data)
+
+    db._write_temp_snapshot = compact_elsewhere
+    assert not db.compact_collection('audit_logs')
+    assert event_types(open_db(tmp_path)) == ['first', 'second']
+
+
+def test_appends_from_another_process_survive_compaction(tmp_path):
+    db = open_db(tmp_path)
+    writer = multiprocessing.get_context('spawn').Process(target=append_events, args=(tmp_path, 'p', 300))
+    writer.start()
+    while writer.is_alive():
+        db.create('audit_logs', AuditLog(event_type='local'))
+        db.compact_collection('audit_logs')
+    writer.join()
+    assert writer.exitcode == 0
+
+    events = event_types(open_db(tmp_path))
+    assert [event for event in events if event.startswith('p')] == [f'p{index:04d}' for index in range(300)]
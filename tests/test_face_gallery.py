@@ -0,0 +1,61 @@
+"""
+Face gallery kept in sync with the shared database service
+"""
+
+import numpy as np
+
+from attendance.models import Employee
+from attendance.services.database import DatabaseService
+from attendance.services.face_gallery import FaceGalleryService
+
+
+def make_employee(employee_id, encoding):
+    return Employee(employee_id=employee_id, first_name='Test', last_name=employee_id,
+                    email=f'{employee_id.lower()}@example.com', department='QA',
+                    face_encodings=[list(map(float, encoding))])
+
+
+def unit(seed):
+    vector = np.random.default_rng(seed).normal(size=128)
+    return vector / np.linalg.norm(vector) * 0.5
+
+
+def test_gallery_follows_writes_through_the_shared_instance(shared_db):
+    gallery = FaceGalleryService()
+    gallery.invalidate()
+    shared_db.create('employees', make_employee('E1', unit(1)))
+    assert gallery.get_gallery().match(unit(1), 0.5)[0] == 'E1'
+
+    employee = shared_db.create('employees', make_employee('E2', unit(2)))
+    assert gallery.get_gallery().match(unit(2), 0.5)[0] == 'E2'
+
+    shared_db.update('employees', employee.id, {'face_recognition_enabled': False})
+    assert gallery.get_gallery().match(unit(2), 0.5)[0] is None
+    assert gallery.get_employee('E1').employee_id == 'E1'
+
+
+def test_other_instances_do_not_reach_the_gallery(shared_db, tmp_path):
+    gallery = FaceGalleryService()
+    gallery.invalidate()
+    shared_db.create('employees', make_employee('E1', unit(1)))
+    assert len(gallery.get_gallery()) == 1
+
+    other = DatabaseService(str(tmp_path / 'other'))
+    other.create('employees', make_employee('X1', unit(3)))
+
+    assert gallery.get_gallery().match(unit(3), 0.5)[0] is None
+    assert gallery.get_employee('X1') is None
+
+
+def test_local_write_does_not_hide_writes_by_another_instance(shared_db):
+    gallery = FaceGalleryService()
+    gallery.invalidate()
+    shared_db.create('employees', make_employee('E1', unit(1)))
+    assert len(gallery.get_gallery()) == 1
+
+    other = DatabaseService(str(shared_db.data_dir))
+    other.create('employees', make_employee('X1', unit(3)))
+    shared_db.create('employees', make_employee('E2', unit(2)))
+
+    assert gallery.get_gallery().match(unit(3), 0.5)[0] == 'X1'
+    assert gallery.get_gallery().match(unit(2), 0.5)[0] == 'E2'
@@ -0,0 +1,75 @@
+"""
+Inference scheduler worker pool
+"""
+
+import os
+import threading
+import time
+
+from attendance.services.inference_scheduler import InferenceScheduler
+
+
+def exit_once(marker):
+    """Kill the worker process the first time it runs"""
+    if not os.path.exists(marker):
+        open(marker, 'w').close()
+        os._exit(1)
+    return 'done'
+
+
+def always_exit():
+    os._exit(1)
+
+
+def busy(seconds):
+    """Burn CPU for about the given time"""
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+    return 'done'
+
+
+def run_job(scheduler, task, args):
+    finished = threading.Event()
+    outcome = {}
+
+    def callback(job, result, error):
+        outcome.update(result=result, error=error, retries=job.retries)
+        finished.set()
+
+    scheduler.submit('cam', task, args, callback)
+    assert finished.wait(60)
+    return outcome
+
+
+def test_pool_is_replaced_after_a_worker_dies(tmp_path):
+    scheduler = InferenceScheduler(workers=1)
+    try:
+        outcome = run_job(scheduler, exit_once, (str(tmp_path / 'crashed'),))
+        assert outcome == {'result': 'done', 'error': None, 'retries': 1}
+        assert scheduler.get_stats()['pool_restarts'] == 1
+
+        # The replacement pool keeps serving jobs
+        assert run_job(scheduler, exit_once, (str(tmp_path / 'crashed'),))['result'] == 'done'
+    finally:
+        scheduler.stop()
+
+
+def test_job_that_keeps_killing_workers_fails(tmp_path):
+    scheduler = InferenceScheduler(workers=1)
+    try:
+        outcome = run_job(scheduler, always_exit, ())
+        assert outcome['error'] is not None
+        assert outcome['retries'] == 1
+        assert scheduler.get_stats()['failed'] == 1
+    finally:
+        scheduler.stop()
+
+
+def test_worker_cpu_time_is_reported():
+    scheduler = InferenceScheduler(workers=1)
+    try:
+        assert run_job(scheduler, busy, (0.2,))['result'] == 'done'
+        assert scheduler.get_stats()['worker_cpu_seconds'] >= 0.15
+    finally:
+        scheduler.stop()
@@ -0,0 +1,26 @@
+"""
+Live camera management endpoints
+"""
+
+import pytest
+from flask import Flask
+
+from attendance.routes.live_camera_routes import live_camera_bp
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(live_camera_bp)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('detection_scale', [0, -0.5, 1.5, 'half', None, 'nan'])
+def test_add_camera_rejects_invalid_detection_scale(client, detection_scale):
+    response = client.post('/api/live-camera/cameras', json={
+        'camera_id': 'cam1', 'name': 'Entrance', 'stream_url': 'rtsp://camera/stream', 'zone_id': 'entrance',
+        'detection_scale': detection_scale
+    })
+
+    assert response.status_code == 400
+    assert 'detection_scale' in response.get_json()['error']
@@ -0,0 +1,64 @@
+"""
+Date-partitioned storage
+"""
+
+from attendance.models import AttendanceRecord
+from attendance.services.database import DatabaseService
+
+PARTITIONED = ['attendance_records']
+
+
+def open_db(data_dir):
+    return DatabaseService(data_dir, partitioned_collections=PARTITIONED)
+
+
+def test_create_only_touches_its_own_partition(tmp_path):
+    db = open_db(tmp_path)
+    old = db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2024-01-10'))
+    db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-01-10'))
+    assert db.archive_partitions('attendance_records', keep_months=12) == ['2024-01']
+
+    db = open_db(tmp_path)
+    db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-02-03'))
+    with db.batch() as batch:
+        batch.create('attendance_records', AttendanceRecord(employee_id='E2', date='2026-02-04'))
+    assert sorted(db._partition_state['attendance_records']['partitions']) == ['2026-02']
+
+    # A clashing id within the target partition still gets a fresh one
+    clash = db.create('attendance_records', AttendanceRecord(id=old.id, employee_id='E3', date='2024-01-11'))
+    assert clash.id != old.id
+
+    dates = [record.date for record in open_db(tmp_path).get_all('attendance_records')]
+    assert sorted(dates) == ['2024-01-10', '2024-01-11', '2026-01-10', '2026-02-03', '2026-02-04']
+
+
+
+def test_lookups_skip_partitions_that_cannot_match(tmp_path):
+    db = open_db(tmp_path)
+    db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2024-01-10', status='completed'))
+    db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-01-10'))
+    db.archive_partitions('attendance_records', keep_months=12)
+
+    db = open_db(tmp_path)
+    assert [r.date for r in db.find('attendance_records', {'date': '2026-01-10', 'employee_id': 'E1'})] == \
+        ['2026-01-10']
+    assert db.get_active_attendance_record('E1').date == '2026-01-10'
+    assert [r.date for r in db.get_attendance_records_by_date_range('2026-01-01', '2026-01-31')] == ['2026-01-10']
+    # The archived partition only holds completed records and is never read
+    assert sorted(db._partition_state['attendance_records']['partitions']) == ['2026-01']
+
+    # Writes keep the per-partition indexes and summaries in step
+    db.create('attendance_records', AttendanceRecord(employee_id='E1', date='2026-02-02'))
+    db.update('attendance_records', db.get_active_attendance_record('E1').id, {'date': '2026-03-01'})
+    db.update('attendance_records', db.find('attendance_records', {'date': '2026-01-10'})[0].id,
+              {'status': 'completed'})
+    assert [r.date for r in db.find('attendance_records', {'employee_id': 'E1', 'status': 'active'})] == \
+        ['2026-03-01']
+    assert [r.date for r in db.get_attendance_records_by_date_range('2026-02-01', '2026-03-31')] == ['2026-03-01']
+    assert db.find('attendance_records', {'date': '2026-02-02'}) == []
+
+    other = open_db(tmp_path)
+    assert other.get_active_attendance_record('E1').date == '2026-03-01'
+    assert '2024-01' not in other._partition_state['attendance_records']['partitions']
+    assert sorted(r.date for r in other.find('attendance_records', {'employee_id': 'E1'})) == \
+        ['2024-01-10', '2026-01-10', '2026-03-01']
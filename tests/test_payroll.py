@@ -0,0 +1,99 @@
+"""
+Vectorized payroll figures against the shift manager's scalar methods
+"""
+
+import json
+import random
+from datetime import date, datetime, timedelta
+
+from attendance.models import AttendanceRecord, Employee, Shift
+from attendance.services.payroll import payroll_service
+
+
+def write_records(db, records):
+    """Store records as-is, including values model validation would reject"""
+    path = db.data_dir / 'attendance_records.json'
+    path.write_text(json.dumps([record.to_dict() for record in records]))
+    db.invalidate_cache('attendance_records')
+
+
+def random_records(shift_ids, count=400, seed=7):
+    rng = random.Random(seed)
+    records = []
+    for row in range(count):
+        day = date(2026, 3, 1) + timedelta(days=rng.randrange(31))
+        clock_in = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=rng.randrange(5, 23), minutes=rng.randrange(60), seconds=rng.randrange(60),
+            microseconds=rng.choice([0, 0, 500000, 123456]))
+        clock_out = clock_in + timedelta(minutes=rng.randrange(0, 14 * 60))
+        record = AttendanceRecord(
+            employee_id=f'E{rng.randrange(6)}',
+            date=day.isoformat(),
+            clock_in_time=clock_in.isoformat(),
+            clock_out_time=clock_out.isoformat(sep=rng.choice('T ')),
+            shift_id=rng.choice(shift_ids + ['', 'missing']),
+            break_duration=rng.choice([0, 0.0, 15, 30.5, 45, None, '30']),
+            is_weekend=day.weekday() >= 5,
+            is_holiday=rng.random() < 0.05,
+            status=rng.choice(['completed', 'completed', 'completed', 'active'])
+        )
+        if rng.random() < 0.2:
+            record.scheduled_start = rng.choice(['08:00:00', '22:00:00', '8:00', ''])
+            record.scheduled_end = rng.choice(['16:00:00', '06:00:00', ''])
+        records.append(record)
+    return records
+
+
+def edge_records(shift_id):
+    return [
+        # Offsets and unusual separators take the scalar path
+        AttendanceRecord(employee_id='E0', date='2026-03-02', clock_in_time='2026-03-02T09:00:00+02:00',
+                         clock_out_time='2026-03-02T17:30:00+02:00', shift_id=shift_id, status='completed'),
+        # Impossible date in an otherwise well formed column
+        AttendanceRecord(employee_id='E1', date='2026-03-03', clock_in_time='2026-02-30T09:00:00',
+                         clock_out_time='2026-03-03T17:00:00', shift_id=shift_id, status='completed'),
+        # Missing clock out, clock out before clock in
+        AttendanceRecord(employee_id='E2', date='2026-03-04', clock_in_time='2026-03-04T09:00:00',
+                         clock_out_time='', shift_id=shift_id, status='completed'),
+        AttendanceRecord(employee_id='E2', date='2026-03-05', clock_in_time='2026-03-05T17:00:00',
+                         clock_out_time='2026-03-05T09:00:00', shift_id=shift_id, status='completed'),
+        # Rounding ties
+        AttendanceRecord(employee_id='E3', date='2026-03-06', clock_in_time='2026-03-06T09:00:00',
+                         clock_out_time='2026-03-06T17:00:18', shift_id=shift_id, status='completed'),
+    ]
+
+
+def test_vectorized_matches_scalar(shared_db):
+    shifts = [
+        shared_db.create('shifts', Shift(name='Day')),
+        shared_db.create('shifts', Shift(name='Night', start_time='22:00:00', end_time='06:00:00',
+                                         overtime_threshold=7.5, break_duration=30, break_paid=False)),
+        shared_db.create('shifts', Shift(name='Lenient', late_grace_period=0, early_departure_grace_period=45)),
+    ]
+    broken = Shift(name='Broken', start_time='nine', overtime_threshold='8')
+    (shared_db.data_dir / 'shifts.json').write_text(
+        json.dumps([shift.to_dict() for shift in shifts] + [broken.to_dict()]))
+    shared_db.invalidate_cache('shifts')
+    for index in range(4):
+        shared_db.create('employees', Employee(employee_id=f'E{index}', first_name='First', last_name=f'L{index}',
+                                               email=f'e{index}@example.com', department='Ops'))
+
+    shift_ids = [shift.id for shift in shifts] + [broken.id]
+    write_records(shared_db, random_records(shift_ids) + edge_records(shifts[0].id))
+
+    start, end = date(2026, 3, 1), date(2026, 3, 31)
+    vectorized = payroll_service.summarize_period(start, end)
+    scalar = payroll_service.summarize_period(start, end, vectorized=False)
+
+    assert vectorized == scalar
+    assert {summary['employee_id'] for summary in vectorized} >= {'E0', 'E1', 'E2', 'E3', 'E4', 'E5'}
+    assert next(s for s in vectorized if s['employee_id'] == 'E5')['employee_name'] == 'Unknown Employee'
+
+
+def test_employee_filter_and_empty_period(shared_db):
+    write_records(shared_db, random_records([], count=50))
+
+    subset = payroll_service.summarize_period(date(2026, 3, 1), date(2026, 3, 31), employee_ids=['E1'])
+    assert [summary['employee_id'] for summary in subset] == ['E1']
+    assert payroll_service.summarize_period(date(2025, 1, 1), date(2025, 1, 31)) == []
+    assert payroll_service.summarize_period(date(2025, 1, 1), date(2025, 1, 31), vectorized=False) == []
@@ -0,0 +1,72 @@
+"""
+Presence roster built from the database the routes write to
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from attendance.models import AttendanceRecord, Employee
+from attendance.services.presence import presence_service
+
+
+@pytest.fixture
+def client(shared_db):
+    from attendance.routes.admin_dashboard import bp_dashboard
+
+    presence_service.invalidate()
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(bp_dashboard, url_prefix='/admin')
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_id'] = 'admin'
+    return client
+
+
+def add_employee(db, employee_id):
+    return db.create('employees', Employee(employee_id=employee_id, first_name='Test', last_name=employee_id,
+                                           email=f'{employee_id.lower()}@example.com', department='QA'))
+
+
+def test_absent_employees_come_from_the_shared_instance(shared_db, client):
+    add_employee(shared_db, 'E1')
+    add_employee(shared_db, 'E2')
+    shared_db.create('attendance_records', AttendanceRecord(
+        employee_id='E1', date=date.today().isoformat(),
+        clock_in_time=(datetime.now() - timedelta(hours=1)).isoformat()))
+
+    absent = client.get('/admin/api/absent-employees').get_json()
+    assert [entry['employee']['employee_id'] for entry in absent['absent_employees']] == ['E2']
+    assert [employee['employee_id'] for employee, _ in presence_service.get_present()] == ['E1']
+
+
+def test_roster_follows_later_writes(shared_db, client):
+    add_employee(shared_db, 'E1')
+    assert [employee['employee_id'] for employee, _ in presence_service.get_absent()] == ['E1']
+
+    record = shared_db.create('attendance_records', AttendanceRecord(
+        employee_id='E1', date=date.today().isoformat(),
+        clock_in_time=(datetime.now() - timedelta(hours=2)).isoformat()))
+    assert presence_service.get_counts()['present'] == 1
+
+    shared_db.update('attendance_records', record.id, {'clock_out_time': datetime.now().isoformat()})
+    assert presence_service.get_counts()['present'] == 0
+
+
+def test_local_write_does_not_hide_writes_by_another_instance(shared_db, client):
+    from attendance.services.database import DatabaseService
+
+    add_employee(shared_db, 'E0')
+    add_employee(shared_db, 'E1')
+    assert presence_service.get_counts()['present'] == 0
+
+    clock_in = (datetime.now() - timedelta(hours=1)).isoformat()
+    other = DatabaseService(str(shared_db.data_dir))
+    other.create('attendance_records', AttendanceRecord(employee_id='E0', date=date.today().isoformat(),
+                                                        clock_in_time=clock_in))
+    shared_db.create('attendance_records', AttendanceRecord(employee_id='E1', date=date.today().isoformat(),
+                                                            clock_in_time=clock_in))
+
+    assert sorted(employee['employee_id'] for employee, _ in presence_service.get_present()) == ['E0', 'E1']
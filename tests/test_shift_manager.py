@@ -0,0 +1,62 @@
+"""
+Shift lookups through the compiled schedules
+"""
+
+import json
+from datetime import date
+
+import pytest
+
+from attendance.models import AttendanceRecord, Shift, ShiftAssignment
+from attendance.services.shift_manager import shift_manager
+
+
+@pytest.fixture
+def shifts(shared_db):
+    shift_manager.invalidate()
+    return shared_db.create('shifts', Shift(name='Day', start_time='09:00:00', end_time='17:00:00'))
+
+
+def write_assignments(db, *assignments):
+    """Store assignments as-is, bypassing model validation like legacy data files"""
+    path = db.data_dir / 'shift_assignments.json'
+    path.write_text(json.dumps([assignment.to_dict() for assignment in assignments]))
+    db.invalidate_cache('shift_assignments')
+
+
+def test_shift_follows_assignment_dates(shared_db, shifts):
+    shared_db.create('shift_assignments', ShiftAssignment(employee_id='E1', shift_id=shifts.id,
+                                                          start_date='2026-01-05', end_date='2026-01-09'))
+
+    assert shift_manager.get_employee_shift_for_date('E1', date(2026, 1, 2)) is None
+    assert shift_manager.get_employee_shift_for_date('E1', date(2026, 1, 5)).name == 'Day'
+    assert shift_manager.get_employee_shift_for_date('E1', date(2026, 1, 10)) is None  # Saturday
+    assert shift_manager.get_employee_shift_for_date('E1', date(2026, 1, 12)) is None  # After end
+
+
+def test_empty_start_date_applies_from_the_beginning(shared_db, shifts):
+    write_assignments(shared_db,
+                      ShiftAssignment(employee_id='E1', shift_id=shifts.id, start_date='', end_date='2026-01-09'),
+                      ShiftAssignment(employee_id='E2', shift_id=shifts.id, start_date='not a date'))
+
+    assert shift_manager.get_employee_shift_for_date('E1', date(2020, 3, 2)).name == 'Day'
+    assert shift_manager.get_employee_shift_for_date('E1', date(2026, 1, 9)).name == 'Day'
+    assert shift_manager.get_employee_shift_for_date('E1', date(2026, 1, 12)) is None
+    assert shift_manager.get_employee_shift_for_date('E2', date(2026, 1, 12)) is None
+
+
+def test_overtime_summary_covers_the_employee_and_range(shared_db):
+    def record(employee_id, day, status='completed', overtime=1.0):
+        return AttendanceRecord(employee_id=employee_id, date=day, status=status,
+                                regular_hours=8.0, overtime_hours=overtime, total_hours=8.0 + overtime)
+
+    for model in (record('E1', '2026-01-05'), record('E1', '2026-01-06', overtime=0.0),
+                  record('E1', '2026-01-07', status='active'), record('E1', '2026-02-02'),
+                  record('E2', '2026-01-05')):
+        shared_db.create('attendance_records', model)
+
+    summary = shift_manager.get_overtime_summary('E1', date(2026, 1, 1), date(2026, 1, 31))
+    assert summary['records_count'] == 2
+    assert summary['total_overtime_hours'] == 1.0
+    assert summary['total_hours'] == 17.0
+    assert summary['overtime_days'] == 1
@@ -0,0 +1,33 @@
+"""
+Stream supervisor stall watchdog
+"""
+
+import time
+
+from attendance.services.stream_supervisor import StreamSupervisor
+
+
+class FakeCapture:
+    def __init__(self):
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+def test_watchdog_flags_stalls_without_releasing():
+    supervisor = StreamSupervisor(stall_timeout=0.2)
+    stalled_cap, live_cap = FakeCapture(), FakeCapture()
+    stalled = supervisor.watch('stalled', stalled_cap)
+    live = supervisor.watch('live', live_cap)
+
+    deadline = time.time() + 5
+    while not stalled.stalled and time.time() < deadline:
+        live.frame_received()
+        time.sleep(0.05)
+
+    assert stalled.stalled
+    assert not live.stalled
+    # Only the thread reading the capture may release it
+    assert not stalled_cap.released
+    supervisor.unwatch(live)